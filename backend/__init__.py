@@ -1,3 +1,7 @@
+# Green async modes must patch the stdlib before flask/socketio are imported
+from backend.async_mode import monkey_patch
+monkey_patch()
+
 from flask_socketio import SocketIO
 
 socketio = SocketIO(cors_allowed_origins="*")
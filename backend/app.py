@@ -12,7 +12,7 @@
 # This file is the central app bootstrap.
 
 import os                          # Used for filesystem path operations
-from flask import Flask            # Core Flask class
+from flask import Flask, request   # Core Flask class, current request
 from dotenv import load_dotenv     # Loads environment variables from .env file
 
 # -------------------------------
@@ -71,8 +71,12 @@ def create_app():
     )
     
     # Initialize SocketIO
+    # A message queue (SOCKETIO_MESSAGE_QUEUE) lets several workers share fan-out;
+    # SOCKETIO_ASYNC_MODE picks threading (default), gevent or eventlet
     from backend import socketio
-    socketio.init_app(app, async_mode='threading')
+    from backend.async_mode import ASYNC_MODE
+    from backend.chat.pubsub import get_queue_options
+    socketio.init_app(app, async_mode=ASYNC_MODE, **get_queue_options())
     
     # Register Socket Events
     import backend.socket_events
@@ -122,8 +126,6 @@ def create_app():
     from backend.routes.common_routes import common_bp
     app.register_blueprint(common_bp)
 
-    # Context Processor for Notifications
-    from flask import session
     # Context Processor for Notifications & Settings
     from flask import session
     @app.context_processor
@@ -178,8 +180,30 @@ def create_app():
             
         return data
 
+    # AI assistant models are heavy; load them off the request path if configured
+    from backend.config.settings import BRAIN_WARMUP_ON_START
+    if BRAIN_WARMUP_ON_START:
+        from backend.brain.orchestrator import brain
+        brain.warm_up()
+
+    # Image variants: {{ user.profile_pic|variant('avatar_md') }}
+    from backend.services.image_service import avatar_variant
+    app.add_template_filter(avatar_variant, 'variant')
+
+    # Uploads never change in place (content-addressed blobs, timestamped
+    # avatars, derived variants), so browsers may cache them for a long time
+    from backend.config.settings import UPLOAD_CACHE_MAX_AGE
+
+    @app.after_request
+    def cache_uploads(response):
+        if request.path.startswith('/static/uploads/') and response.status_code == 200:
+            response.cache_control.public = True
+            response.cache_control.max_age = UPLOAD_CACHE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
     # Maintenance Mode Hook
-    from flask import request, render_template
+    from flask import render_template
     from backend.services.settings_service import is_maintenance_mode
 
     @app.before_request
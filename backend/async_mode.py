@@ -0,0 +1,44 @@
+"""
+async_mode.py
+-------------
+Selects the Socket.IO concurrency model from SOCKETIO_ASYNC_MODE:
+
+- threading (default): one OS thread per connection/request
+- gevent / eventlet:  cooperative greenlets; thousands of idle WebSockets
+                      cost a few KB each instead of a thread
+
+Green modes only work if the standard library is monkey-patched before
+anything creates sockets, locks or threads. backend/__init__.py imports this
+module first and calls monkey_patch(); gunicorn's gevent/eventlet workers
+patch even earlier, and patching twice is harmless.
+
+This module deliberately reads os.environ only (no dotenv/settings import):
+set SOCKETIO_ASYNC_MODE in the process environment or gunicorn.conf.py.
+"""
+
+import os
+
+SUPPORTED_MODES = ('threading', 'gevent', 'eventlet')
+
+ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading').strip().lower() or 'threading'
+if ASYNC_MODE not in SUPPORTED_MODES:
+    raise ValueError(f"SOCKETIO_ASYNC_MODE must be one of {SUPPORTED_MODES}, got {ASYNC_MODE!r}")
+
+_patched = False
+
+
+def is_green():
+    return ASYNC_MODE != 'threading'
+
+def monkey_patch():
+    """Patches socket/ssl/threading/time/select for the selected green library."""
+    global _patched
+    if _patched or not is_green():
+        return
+    if ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    else:
+        import eventlet
+        eventlet.monkey_patch()
+    _patched = True
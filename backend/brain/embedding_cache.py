@@ -0,0 +1,182 @@
+"""
+embedding_cache.py
+------------------
+Two tiers in front of the sentence encoder:
+
+- QueryEmbeddingCache: in-memory LRU of query embeddings keyed by the
+  normalized query text (MiniLM is uncased, so case and extra whitespace do
+  not change the embedding). Repeated chat prompts and vibe queries skip the
+  encoder.
+- DocumentEmbeddingStore: on-disk store of document embeddings keyed by
+  content hash (rag.content_hash, which covers the text and the model).
+  Vectors live in a memory-mapped float16 file, row i belonging to the i-th
+  hash in an append-only index file, so re-indexing unchanged books costs a
+  hash lookup and a row copy. Rows are appended under an exclusive file lock
+  and other processes pick them up when their lookup misses.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+_HASH_BYTES = 41  # 40 hex chars + newline
+
+
+def normalize_query(text):
+    return " ".join((text or "").lower().split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        if self.max_entries <= 0:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._items), 'max_entries': self.max_entries,
+            'hits': self.hits, 'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
+
+
+class DocumentEmbeddingStore:
+    """
+    <path>/meta.json      {"dim": 384}
+    <path>/hashes.idx     one 40-char hex hash per line; line i -> row i
+    <path>/vectors.f16    rows x dim float16, memory-mapped
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dim = None
+        self._rows = {}          # hash -> row
+        self._index_bytes = 0    # how much of hashes.idx has been read
+        self._vectors = None     # np.memmap, reopened when the file grows
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self, dim):
+        if self.dim is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        meta_file = self._file('meta.json')
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                stored_dim = json.load(f)['dim']
+            if stored_dim != dim:
+                raise ValueError(f"Embedding store at {self.path} holds dim {stored_dim}, got {dim}")
+        else:
+            with open(meta_file, 'w') as f:
+                json.dump({'dim': dim}, f)
+        self.dim = dim
+        self._refresh()
+
+    def _refresh(self):
+        """Reads index lines appended (by any process) since the last refresh."""
+        index_file = self._file('hashes.idx')
+        if not os.path.exists(index_file) or os.path.getsize(index_file) == self._index_bytes:
+            return
+        with open(index_file, 'rb') as f:
+            f.seek(self._index_bytes)
+            data = f.read()
+        complete = len(data) - len(data) % _HASH_BYTES  # ignore a half-written tail
+        start_row = self._index_bytes // _HASH_BYTES
+        for i in range(0, complete, _HASH_BYTES):
+            self._rows[data[i:i + 40].decode('ascii')] = start_row + i // _HASH_BYTES
+        self._index_bytes += complete
+        self._vectors = None
+
+    def _matrix(self):
+        rows = self._index_bytes // _HASH_BYTES
+        if self._vectors is None or self._vectors.shape[0] != rows:
+            self._vectors = np.memmap(self._file('vectors.f16'), dtype=np.float16, mode='r', shape=(rows, self.dim)) if rows else None
+        return self._vectors
+
+    def get_many(self, hashes, dim):
+        """Returns ({position: float32 vector} for stored hashes, [positions missing])."""
+        with self._lock:
+            self._open(dim)
+            if any(h not in self._rows for h in hashes):
+                self._refresh()
+            found, missing = {}, []
+            matrix = self._matrix()
+            for pos, h in enumerate(hashes):
+                row = self._rows.get(h)
+                if row is None:
+                    missing.append(pos)
+                else:
+                    found[pos] = np.asarray(matrix[row], dtype=np.float32)
+            self.hits += len(found)
+            self.misses += len(missing)
+            return found, missing
+
+    def put_many(self, hashes, vectors):
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            self._open(vectors.shape[1])
+            with open(self._file('hashes.idx'), 'ab') as index:
+                if fcntl:
+                    fcntl.flock(index, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    new = list({h: v for h, v in zip(hashes, vectors) if h not in self._rows}.items())
+                    if not new:
+                        return
+                    # Index rows and vector rows must stay aligned: cut torn tails left by a crash
+                    index.truncate(self._index_bytes)
+                    rows = self._index_bytes // _HASH_BYTES
+                    with open(self._file('vectors.f16'), 'ab') as data:
+                        data.truncate(rows * self.dim * 2)
+                        data.seek(0, os.SEEK_END)
+                        data.write(np.stack([v for _, v in new]).tobytes())
+                    index.write("".join(f"{h}\n" for h, _ in new).encode('ascii'))
+                    index.flush()
+                    self._refresh()
+                finally:
+                    if fcntl:
+                        fcntl.flock(index, fcntl.LOCK_UN)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'rows': len(self._rows), 'path': self.path,
+            'hits': self.hits, 'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
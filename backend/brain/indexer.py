@@ -0,0 +1,154 @@
+"""
+indexer.py
+----------
+Keeps the RAG book collection in sync with the `books` table.
+
+- Full sync (sync_catalog, scripts/migrations/ingest_books.py): streams the
+  catalog in book_id order one page at a time, re-embeds only books whose
+  content hash differs from the one stored with their vector (in large
+  encoder batches, one bulk upsert per page) and drops vectors of books that
+  no longer exist.
+- Incremental: book write paths call index_books / unindex_books. That only
+  records the ids; a background thread coalesces them for
+  BRAIN_INDEX_FLUSH_MS and applies them once this worker's RAG engine has
+  loaded (the indexer never loads the models itself). Anything a worker
+  never got to is picked up by the next full sync.
+"""
+
+import threading
+import time
+
+from backend.brain.rag import rag, book_document, content_hash
+from backend.brain.retriever import retriever
+from backend.brain.warmup import run_native
+from backend.config.settings import BRAIN_INDEX_BATCH_SIZE, BRAIN_INDEX_FLUSH_MS
+from backend.repository.db_access import fetch_all
+
+_BOOK_SQL = """
+    SELECT b.book_id, b.title, b.category, b.description, a.name AS author
+    FROM books b
+    LEFT JOIN authors a ON b.author_id = a.author_id
+"""
+
+
+def _fetch_page(after_id, limit):
+    return fetch_all(_BOOK_SQL + " WHERE b.book_id > %s ORDER BY b.book_id LIMIT %s", (after_id, limit))
+
+def _fetch_ids(book_ids):
+    marks = ", ".join(["%s"] * len(book_ids))
+    return fetch_all(_BOOK_SQL + f" WHERE b.book_id IN ({marks})", tuple(book_ids))
+
+def _hash(book):
+    return content_hash(book_document(book['title'], book['author'], book['description'], book['category']))
+
+
+def sync_catalog(batch_size=BRAIN_INDEX_BATCH_SIZE, rebuild=False, progress=None):
+    """
+    Brings the vector store up to date with `books`. rebuild=True re-embeds
+    every book. Returns {scanned, embedded, unchanged, removed, seconds}.
+    """
+    start = time.perf_counter()
+    stored = rag.get_book_hashes()
+    seen = set()
+    stats = {'scanned': 0, 'embedded': 0, 'unchanged': 0, 'removed': 0}
+
+    last_id = 0
+    while True:
+        rows = _fetch_page(last_id, batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]['book_id']
+        changed = []
+        for book in rows:
+            seen.add(book['book_id'])
+            if rebuild or stored.get(book['book_id']) != _hash(book):
+                changed.append(book)
+        stats['embedded'] += run_native(rag.upsert_books, changed)
+        stats['scanned'] += len(rows)
+        stats['unchanged'] += len(rows) - len(changed)
+        if progress:
+            progress(stats)
+
+    removed = [book_id for book_id in stored if book_id not in seen]
+    for i in range(0, len(removed), batch_size):
+        rag.remove_books(removed[i:i + batch_size])
+    stats['removed'] = len(removed)
+    stats['seconds'] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+class CatalogIndexer:
+    """Coalesces book ids from the write paths and embeds them in batches."""
+
+    def __init__(self, flush_ms=BRAIN_INDEX_FLUSH_MS, batch_size=BRAIN_INDEX_BATCH_SIZE):
+        self.flush_sec = flush_ms / 1000.0
+        self.batch_size = batch_size
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._started = False
+
+    def enqueue(self, book_ids):
+        with self._lock:
+            self._pending.update(int(b) for b in book_ids)
+        self._ensure_started()
+        self._wake.set()
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="catalog-indexer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.flush_sec)  # let a burst (CSV import, edit + enrichment) coalesce
+            if not rag.warmup.done:
+                continue  # keep the ids; retried after the next flush interval
+            if not rag.is_ready():
+                with self._lock:
+                    dropped, self._pending = len(self._pending), set()
+                    self._wake.clear()
+                print(f"[INDEX] RAG engine unavailable, dropped {dropped} pending book updates")
+                continue
+            with self._lock:
+                ids = sorted(self._pending)[:self.batch_size]
+                self._pending.difference_update(ids)
+                if not self._pending:
+                    self._wake.clear()
+            if not ids:
+                continue
+            try:
+                self.apply(ids)
+            except Exception as e:
+                print(f"[INDEX] Catalog index batch failed ({len(ids)} books): {e}")
+
+    def apply(self, book_ids):
+        """Re-embeds the given books if their text changed, or removes deleted ones."""
+        rows = _fetch_ids(book_ids)
+        found = {row['book_id'] for row in rows}
+        stored = rag.get_book_hashes(book_ids)
+        run_native(rag.upsert_books, [row for row in rows if stored.get(row['book_id']) != _hash(row)])
+        rag.remove_books([b for b in book_ids if b not in found and b in stored])
+
+
+catalog_indexer = CatalogIndexer()
+
+
+# ===============================
+# WRITE-PATH HOOKS
+# ===============================
+
+def index_books(book_ids):
+    """Hot-path hook: records the ids, embedding happens in the background."""
+    if book_ids:
+        retriever.invalidate()
+        catalog_indexer.enqueue(book_ids)
+
+def unindex_books(book_ids):
+    # apply() removes ids that no longer exist in `books`
+    index_books(book_ids)
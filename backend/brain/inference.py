@@ -0,0 +1,197 @@
+"""
+inference.py
+------------
+Admission control and micro-batching for local model inference.
+
+Local generation is CPU-bound: a few concurrent AI chats would otherwise
+take every core away from the catalog and issue endpoints.
+
+- InferenceExecutor: at most BRAIN_INFERENCE_CONCURRENCY generations run at
+  once per worker. Further requests wait in a bounded queue
+  (BRAIN_INFERENCE_QUEUE_SIZE) for at most BRAIN_INFERENCE_QUEUE_TIMEOUT_SEC;
+  a full queue, a timeout, or a user already holding
+  BRAIN_INFERENCE_PER_USER requests raises InferenceBusy, which routes turn
+  into HTTP 429. Freed slots go to waiting users round-robin, so one user
+  cannot starve the others.
+- MicroBatcher: prompts admitted at the same time are merged into a single
+  pipeline call (one padded forward pass per decoding step) of up to
+  BRAIN_LOCAL_BATCH_SIZE prompts. Whoever holds the run lock executes
+  everything pending, so batches form naturally while the previous one runs.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+from backend.config.settings import (
+    BRAIN_INFERENCE_CONCURRENCY,
+    BRAIN_INFERENCE_QUEUE_SIZE,
+    BRAIN_INFERENCE_QUEUE_TIMEOUT_SEC,
+    BRAIN_INFERENCE_PER_USER,
+    BRAIN_LOCAL_BATCH_SIZE,
+    BRAIN_LOCAL_BATCH_WAIT_MS,
+)
+
+
+class InferenceBusy(Exception):
+    """No inference capacity for this request; retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A granted inference slot; release() is idempotent."""
+
+    def __init__(self, executor, user_id):
+        self._executor = executor
+        self.user_id = user_id
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._executor._release(self.user_id)
+
+
+class InferenceExecutor:
+    def __init__(self, max_concurrent=BRAIN_INFERENCE_CONCURRENCY, max_queue=BRAIN_INFERENCE_QUEUE_SIZE,
+                 queue_timeout=BRAIN_INFERENCE_QUEUE_TIMEOUT_SEC, per_user=BRAIN_INFERENCE_PER_USER):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_user = per_user
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = OrderedDict()  # user -> deque of Events, served round-robin
+        self._queued = 0
+        self._per_user = Counter()     # running + queued, per user
+        self._counts = Counter()
+
+    def acquire(self, user_id=None):
+        """Waits for a slot (fairly) and returns it, or raises InferenceBusy."""
+        with self._lock:
+            if user_id is not None and self._per_user[user_id] >= self.per_user:
+                self._counts['rejected_user'] += 1
+                raise InferenceBusy("You already have a request in progress. Please wait for it to finish.")
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                self._per_user[user_id] += 1
+                self._counts['admitted'] += 1
+                return Slot(self, user_id)
+            if self._queued >= self.max_queue:
+                self._counts['rejected_full'] += 1
+                raise InferenceBusy("The assistant is busy right now. Please try again shortly.")
+            granted = threading.Event()
+            self._waiting.setdefault(user_id, deque()).append(granted)
+            self._queued += 1
+            self._per_user[user_id] += 1
+
+        start = time.monotonic()
+        if not granted.wait(self.queue_timeout):
+            with self._lock:
+                waiters = self._waiting.get(user_id)
+                if waiters is not None and granted in waiters:
+                    waiters.remove(granted)
+                    if not waiters:
+                        del self._waiting[user_id]
+                    self._queued -= 1
+                    self._per_user[user_id] -= 1
+                    self._counts['timed_out'] += 1
+                    raise InferenceBusy("The assistant is busy right now. Please try again shortly.")
+            # Granted between the timeout and taking the lock: keep the slot
+        with self._lock:
+            self._counts['admitted'] += 1
+            self._counts['queued'] += 1
+            self._counts['queue_wait_ms'] += int((time.monotonic() - start) * 1000)
+        return Slot(self, user_id)
+
+    def _release(self, user_id):
+        with self._lock:
+            self._per_user[user_id] -= 1
+            if self._per_user[user_id] <= 0:
+                del self._per_user[user_id]
+            self._counts['completed'] += 1
+            if self._waiting:
+                # Hand the slot straight to the next user in rotation
+                next_user, waiters = next(iter(self._waiting.items()))
+                granted = waiters.popleft()
+                if waiters:
+                    self._waiting.move_to_end(next_user)
+                else:
+                    del self._waiting[next_user]
+                self._queued -= 1
+                granted.set()
+            else:
+                self._active -= 1
+
+    @contextmanager
+    def slot(self, user_id=None):
+        slot = self.acquire(user_id)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            queued_total = counts.pop('queued', 0)
+            wait_ms = counts.pop('queue_wait_ms', 0)
+            return dict(counts, active=self._active, queued=self._queued, waiting_users=len(self._waiting),
+                        max_concurrent=self.max_concurrent, max_queue=self.max_queue,
+                        avg_queue_wait_ms=round(wait_ms / queued_total, 1) if queued_total else None)
+
+
+class MicroBatcher:
+    """Runs run_batch(items) -> results over whatever was submitted concurrently."""
+
+    def __init__(self, run_batch, max_batch=BRAIN_LOCAL_BATCH_SIZE, wait_ms=BRAIN_LOCAL_BATCH_WAIT_MS):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.wait_sec = wait_ms / 1000.0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item):
+        job = {'item': item, 'done': False, 'result': None, 'error': None}
+        with self._lock:
+            self._pending.append(job)
+        if self.max_batch > 1:
+            time.sleep(self.wait_sec)  # let prompts arriving together join this batch
+        while not job['done']:
+            with self._run_lock:  # one forward pass at a time; batches form meanwhile
+                if job['done']:
+                    break
+                with self._lock:
+                    batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                self._run(batch)
+        if job['error'] is not None:
+            raise job['error']
+        return job['result']
+
+    def _run(self, batch):
+        try:
+            results = self.run_batch([job['item'] for job in batch])
+            for job, result in zip(batch, results):
+                job['result'] = result
+        except Exception as e:
+            for job in batch:
+                job['error'] = e
+        finally:
+            self.batches += 1
+            self.items += len(batch)
+            for job in batch:
+                job['done'] = True
+
+    def stats(self):
+        return {'batches': self.batches, 'items': self.items,
+                'avg_batch': round(self.items / self.batches, 2) if self.batches else None}
+
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,238 @@
+"""
+item_similarity.py
+------------------
+Item-item collaborative filtering for member dashboard recommendations.
+
+Offline (build(): nightly scheduler job, or
+scripts/migrations/build_item_similarity.py):
+
+- A sparse user x book matrix is built from issues, wishlist and reviews
+  (INTERACTIONS_SQL; repeated interactions are damped with log1p).
+- Book columns are L2-normalized, and cosine similarities are computed
+  block by block as a sparse product. Only each book's top
+  BRAIN_ITEM_SIMILARITY_K neighbours are kept.
+- The result is stored in one .npz file:
+
+      book_ids    n        sorted int32 (row i <-> book_ids[i])
+      neighbors   n x k    int32 rows (-1 = no neighbour)
+      sims        n x k    float16 cosine similarity
+      popularity  n        float32 users who interacted with the book
+      avg_rating  n        float32 mean review rating (0 = unrated)
+      popular     n        int32 rows ordered by popularity, then rating
+
+Online (recommend()): the member's own interactions come from one indexed
+query. Each book in the history contributes its neighbour rows weighted by
+the interaction, then seen books are dropped and the top scores are taken.
+Members without history, or with too few neighbours, are topped up from
+`popular`.
+
+Workers reload the file when it is replaced, which happens atomically.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock
+    fcntl = None
+
+from backend.config.settings import BRAIN_ITEM_SIMILARITY_K
+from backend.repository.db_access import fetch_all
+
+BLOCK_SIZE = 2048  # books per sparse similarity block
+
+# One row per (user, book) with a summed interaction weight:
+# borrowed 1.0 per issue, wishlisted 0.5, reviewed (rating - 2) / 2 (5 stars = 1.5, <= 2 stars = 0)
+INTERACTIONS_SQL = """
+    SELECT user_id, book_id, SUM(weight) AS weight FROM (
+        SELECT user_id, book_id, 1.0 AS weight FROM issues {where}
+        UNION ALL
+        SELECT user_id, book_id, 0.5 AS weight FROM wishlist {where}
+        UNION ALL
+        SELECT user_id, book_id, GREATEST(rating - 2, 0) / 2 AS weight FROM reviews {where}
+    ) interactions
+    GROUP BY user_id, book_id
+"""
+
+
+def user_history(user_id):
+    """{book_id: weight} of everything the user borrowed, wishlisted or reviewed."""
+    rows = fetch_all(INTERACTIONS_SQL.format(where="WHERE user_id = %s"), (user_id, user_id, user_id))
+    return {r['book_id']: float(np.log1p(float(r['weight']))) for r in rows}
+
+
+def compute(user_idx, item_idx, weights, n_users, n_items, k=BRAIN_ITEM_SIMILARITY_K):
+    """
+    Top-k item-item cosine neighbours from interaction triples
+    (row indices into the user and book axes). Returns (neighbors, sims).
+    """
+    from scipy import sparse
+    from sklearn.preprocessing import normalize
+
+    matrix = sparse.csr_matrix((np.asarray(weights, dtype=np.float32), (user_idx, item_idx)),
+                               shape=(n_users, n_items))
+    matrix.sum_duplicates()
+    by_user = normalize(matrix, norm='l2', axis=0).tocsr()
+    by_item = by_user.T.tocsr()
+
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    sims = np.zeros((n_items, k), dtype=np.float16)
+    for lo in range(0, n_items, BLOCK_SIZE):
+        block = (by_item[lo:lo + BLOCK_SIZE] @ by_user).tocsr()
+        for r in range(block.shape[0]):
+            start, end = block.indptr[r], block.indptr[r + 1]
+            idx, data = block.indices[start:end], block.data[start:end]
+            keep = (idx != lo + r) & (data > 0)
+            idx, data = idx[keep], data[keep]
+            if not len(idx):
+                continue
+            top = np.argpartition(-data, k - 1)[:k] if len(idx) > k else np.arange(len(idx))
+            top = top[np.argsort(-data[top])]
+            neighbors[lo + r, :len(top)] = idx[top]
+            sims[lo + r, :len(top)] = data[top]
+    return neighbors, sims
+
+
+class ItemSimilarity:
+    def __init__(self, path="./backend/brain/data/item_similarity", k=BRAIN_ITEM_SIMILARITY_K):
+        self.path = path
+        self.k = k
+        self._model = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    # -------------------------------
+    # BUILD (offline)
+    # -------------------------------
+    def build(self):
+        """Recomputes the similarity store from the database. Returns build stats, or None if a build is running."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(".lock"), "w") as lock:
+            if fcntl:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    print("[ITEM-SIM] Build already running in another process, skipping")
+                    return None
+            return self._build()
+
+    def _build(self):
+        start = time.perf_counter()
+        books = fetch_all("""
+            SELECT b.book_id, COALESCE(AVG(r.rating), 0) AS avg_rating
+            FROM books b
+            LEFT JOIN reviews r ON r.book_id = b.book_id
+            GROUP BY b.book_id
+            ORDER BY b.book_id
+        """)
+        book_ids = np.array([b['book_id'] for b in books], dtype=np.int32)
+        avg_rating = np.array([float(b['avg_rating']) for b in books], dtype=np.float32)
+
+        rows = fetch_all(INTERACTIONS_SQL.format(where=""))
+        users = np.array([r['user_id'] for r in rows], dtype=np.int64)
+        ids = np.array([r['book_id'] for r in rows], dtype=np.int64)
+        weights = np.log1p(np.array([float(r['weight']) for r in rows], dtype=np.float32))
+        items = np.searchsorted(book_ids, ids)
+        # Skip interactions with books deleted since (older tables lack FKs) and zero weights
+        valid = (items < len(book_ids)) & (weights > 0)
+        valid[valid] &= book_ids[items[valid]] == ids[valid]
+        users, items, weights = users[valid], items[valid], weights[valid]
+        user_ids, user_idx = np.unique(users, return_inverse=True)
+
+        neighbors, sims = compute(user_idx, items, weights, len(user_ids), len(book_ids), self.k)
+        # Rows are unique (user, book) pairs, so this counts distinct users per book
+        popularity = np.bincount(items, minlength=len(book_ids)).astype(np.float32)
+        popular = np.lexsort((-avg_rating, -popularity)).astype(np.int32)
+
+        tmp = self._file(f"model.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, book_ids=book_ids, neighbors=neighbors, sims=sims, popularity=popularity,
+                     avg_rating=avg_rating, popular=popular)
+        os.replace(tmp, self._file("model.npz"))
+
+        stats = {'books': len(book_ids), 'users': len(user_ids), 'interactions': int(len(items)),
+                 'with_neighbors': int((neighbors[:, 0] >= 0).sum()), 'k': self.k,
+                 'seconds': round(time.perf_counter() - start, 2)}
+        print(f"[ITEM-SIM] Built {stats}")
+        return stats
+
+    # -------------------------------
+    # SERVE
+    # -------------------------------
+    def _current(self):
+        """The loaded model (reloaded when the file was replaced), or None before the first build."""
+        try:
+            st = os.stat(self._file("model.npz"))
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    with np.load(self._file("model.npz")) as data:
+                        self._model = {name: data[name] for name in data.files}
+                    self._stamp = stamp
+        return self._model
+
+    def is_ready(self):
+        return self._current() is not None
+
+    def recommend(self, history, limit=6, exclude=()):
+        """
+        [{'book_id', 'score', 'avg_rating'}] for a member's history
+        ({book_id: weight}), best first, never including history or exclude.
+        None when no model has been built yet.
+        """
+        model = self._current()
+        if model is None:
+            return None
+        book_ids, n = model['book_ids'], len(model['book_ids'])
+        seen = set(history) | set(exclude)
+
+        picks = []
+        if history and n:
+            ids = np.fromiter(history.keys(), dtype=np.int64, count=len(history))
+            weights = np.fromiter(history.values(), dtype=np.float32, count=len(history))
+            rows = np.searchsorted(book_ids, ids)
+            valid = rows < n
+            valid[valid] &= book_ids[rows[valid]] == ids[valid]
+            rows, weights = rows[valid], weights[valid]
+
+            neighbors = model['neighbors'][rows].ravel()
+            scores = (model['sims'][rows].astype(np.float32) * weights[:, None]).ravel()
+            keep = neighbors >= 0
+            candidates, inverse = np.unique(neighbors[keep], return_inverse=True)
+            totals = np.bincount(inverse, weights=scores[keep])
+            fresh = ~np.isin(book_ids[candidates], np.fromiter(seen, dtype=np.int64, count=len(seen)))
+            candidates, totals = candidates[fresh], totals[fresh]
+            order = np.lexsort((-model['popularity'][candidates], -totals))[:limit]
+            picks = [(int(candidates[i]), float(totals[i])) for i in order]
+
+        # Cold start / sparse neighbourhoods: most popular unseen books
+        if len(picks) < limit:
+            taken = {row for row, _ in picks}
+            for row in model['popular']:
+                if len(picks) >= limit:
+                    break
+                if int(row) not in taken and int(book_ids[row]) not in seen:
+                    picks.append((int(row), 0.0))
+
+        return [{'book_id': int(book_ids[row]), 'score': round(score, 4),
+                 'avg_rating': round(float(model['avg_rating'][row]), 2)} for row, score in picks]
+
+    def stats(self):
+        model = self._current()
+        if model is None:
+            return {'ready': False}
+        return {'ready': True, 'books': len(model['book_ids']), 'k': model['neighbors'].shape[1],
+                'with_neighbors': int((model['neighbors'][:, 0] >= 0).sum())}
+
+
+item_similarity = ItemSimilarity()
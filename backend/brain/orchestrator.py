@@ -1,6 +1,7 @@
 import os
-from typing import List, Dict, Any, Optional
-from huggingface_hub import InferenceClient
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional
 from datetime import datetime
 
 # Initialize environment variables if not already done
@@ -12,7 +13,11 @@ try:
 except ImportError:
     pass
 
+from backend.brain.inference import InferenceBusy, MicroBatcher, inference_executor
 from backend.brain.rag import rag
+from backend.brain.response_cache import chat_response_cache
+from backend.brain.retriever import retriever
+from backend.brain.warmup import WarmUp, run_native, spawn_native
 
 class Orchestrator:
     """
@@ -28,8 +33,14 @@ class Orchestrator:
     
     def __init__(self):
         self.api_token = os.getenv("HF_TOKEN")
+        self.client = None
+        self.model_id = "mistralai/Mistral-7B-Instruct-v0.2"
         self.local_pipeline = None
         self.using_local = False
+        # Concurrent local prompts share one pipeline call (see inference.py)
+        self._batcher = MicroBatcher(self._generate_batch)
+        # The LLM backend is chosen/loaded on first use or by warm_up()
+        self.warmup = WarmUp("AI Brain", self._load)
         
         # System Prompt
         self.system_prompt = """You are the AI Assistant for the Library Database Management System (LDBMS).
@@ -40,17 +51,34 @@ RULES:
 3. Keep responses concise (under 3 sentences where possible).
 """
 
-        # Initialize Brain connection
+    def _load(self):
+        """Initialize Brain connection."""
         if self.api_token:
+            from huggingface_hub import InferenceClient
             print("🧠 AI Brain: Connected to HuggingFace API (Mistral-7B)")
-            # self.client = ... (Initialized on demand or here)
             # using updated simple inference for robustness
             self.client = InferenceClient(token=self.api_token)
-            self.model_id = "mistralai/Mistral-7B-Instruct-v0.2" 
         else:
             print("🧠 AI Brain: No API Token found. Switching to LOCAL MODE.")
             self._init_local_model()
 
+    def warm_up(self):
+        """Loads the LLM backend and the RAG engine on background threads."""
+        self.warmup.start()
+        rag.warm_up()
+
+    def is_ready(self) -> bool:
+        """True once both loaders have finished (a failed RAG only drops the book context)."""
+        return self.warmup.done and rag.warmup.done
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ready': self.is_ready(), 'llm': self.warmup.status(), 'rag': rag.warmup.status(),
+            'embedding_cache': rag.cache_stats(),
+            'response_cache': chat_response_cache.stats(),
+            'inference': dict(inference_executor.stats(), batching=self._batcher.stats()),
+        }
+
     def _init_local_model(self):
         """Initializes a small local model for offline use."""
         try:
@@ -67,6 +95,11 @@ RULES:
                 device_map="auto",
                 max_new_tokens=256
             )
+            # Batched generation pads prompts; decoder-only models need left padding
+            tokenizer = self.local_pipeline.tokenizer
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
             self.using_local = True
             print("✅ Local Brain Ready!")
         except Exception as e:
@@ -74,18 +107,28 @@ RULES:
             print("⚠️ Falling back to Rule-Based responses.")
             self.using_local = False
 
-    def process_message(self, user_message: str, history: List[Dict[str, str]] = None) -> str:
-        """
-        Process a user message and return the AI's response.
-        """
-        if history is None:
-            history = []
+    def _prepare(self, user_message: str, history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Cache lookup and context retrieval shared by process_message and stream_message."""
+        self.warmup.ensure()
+
+        # 0. Answered recently? (same prompt, same recent turns, same catalog)
+        turn = {'cache_context': [f"{m.get('role', 'user')}: {m.get('content', '')}" for m in history[-3:]],
+                'catalog_version': None, 'cached': None}
+        try:
+            turn['catalog_version'] = retriever.catalog_version()
+        except Exception as e:
+            print(f"⚠️ Catalog version unavailable: {e}")
+        if turn['catalog_version']:
+            turn['cached'] = chat_response_cache.get(user_message, turn['catalog_version'], turn['cache_context'])
+            if turn['cached']:
+                return turn
             
-        # 1. Retrieve Context (RAG)
+        # 1. Retrieve Context (hybrid BM25 + vector search)
         print(f"🔍 Searching memory for: {user_message}")
         try:
-            context_docs = rag.search_books(user_message)
-        except:
+            context_docs = retriever.search(user_message, k=3)
+        except Exception as e:
+            print(f"⚠️ Retrieval failed: {e}")
             context_docs = []
         
         context_str = ""
@@ -93,27 +136,103 @@ RULES:
             context_str = "\nCONTEXT BOOKS:\n" + "\n".join(
                 [f"- {d['title']} by {d['author']}" for d in context_docs[:3]]
             )
+        turn['full_user_msg'] = f"{context_str}\n\nUser: {user_message}"
+        return turn
+
+    def _remember(self, user_message: str, turn: Dict[str, Any], response: str):
+        if turn['catalog_version']:
+            chat_response_cache.put(user_message, turn['catalog_version'], response, turn['cache_context'])
+
+    def _uses_local(self) -> bool:
+        return not self.api_token and self.using_local and self.local_pipeline is not None
+
+    def reserve(self, user_id=None):
+        """
+        An inference slot for a request that will run the local model (None
+        when the API answers). Raises InferenceBusy when none is available.
+        """
+        self.warmup.ensure()
+        return inference_executor.acquire(user_id) if self._uses_local() else None
+
+    def process_message(self, user_message: str, history: List[Dict[str, str]] = None, user_id=None) -> str:
+        """
+        Process a user message and return the AI's response.
+        Raises InferenceBusy if the local model has no capacity for it.
+        """
+        if history is None:
+            history = []
+        turn = self._prepare(user_message, history)
+        if turn['cached']:
+            return turn['cached']
             
         # 2. Generate Response
-        full_user_msg = f"{context_str}\n\nUser: {user_message}"
-        
         try:
             if self.api_token:
-                return self._call_api(full_user_msg, history)
+                response = self._call_api(turn['full_user_msg'], history, user_id)
             elif self.using_local and self.local_pipeline:
-                return self._call_local(full_user_msg, history)
+                response = self._call_local(turn['full_user_msg'], history, user_id)
             else:
                 return self._rule_based_fallback(user_message)
+        except InferenceBusy:
+            raise
         except Exception as e:
             print(f"❌ Brain Error: {e}")
             return self._rule_based_fallback(user_message)
 
-    def _call_api(self, message: str, history: List[Dict[str, str]]) -> str:
+        self._remember(user_message, turn, response)
+        return response
+
+    def stream_message(self, user_message: str, history: List[Dict[str, str]] = None,
+                       cancel: Optional[threading.Event] = None, user_id=None, slot=None) -> Iterator[str]:
+        """
+        Like process_message, but yields the response in pieces as the model
+        generates them. Setting `cancel` (or closing the generator) stops
+        generation; a cancelled answer is not cached. `slot` comes from
+        reserve(); without one, local generation waits for a slot itself.
+        """
+        if history is None:
+            history = []
+        cancel = cancel or threading.Event()
+        turn = self._prepare(user_message, history)
+        if turn['cached']:
+            yield turn['cached']
+            return
+
+        pieces = []
+        completed = False
+        try:
+            if self.api_token:
+                source = self._stream_api(turn['full_user_msg'], history, cancel, user_id)
+            elif self.using_local and self.local_pipeline:
+                source = self._stream_local(turn['full_user_msg'], history, cancel, user_id, slot)
+            else:
+                yield self._rule_based_fallback(user_message)
+                return
+            for piece in source:
+                pieces.append(piece)
+                yield piece
+            completed = not cancel.is_set()
+        except Exception as e:
+            print(f"❌ Brain Error: {e}")
+            if not pieces:
+                yield self._rule_based_fallback(user_message)
+            return
+        finally:
+            cancel.set()  # also reached when the client went away (GeneratorExit)
+
+        if completed and pieces:
+            self._remember(user_message, turn, "".join(pieces))
+
+    def _api_messages(self, message: str, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
         messages = [{"role": "system", "content": self.system_prompt}]
         # Simplified history
         for msg in history[-3:]:
              messages.append({"role": msg.get("role", "user"), "content": msg.get("content", "")})
         messages.append({"role": "user", "content": message})
+        return messages
+
+    def _call_api(self, message: str, history: List[Dict[str, str]], user_id=None) -> str:
+        messages = self._api_messages(message, history)
         
         try:
             response = self.client.chat_completion(messages, model=self.model_id, max_tokens=512)
@@ -123,10 +242,36 @@ RULES:
             if not self.local_pipeline: 
                 self._init_local_model()
             if self.local_pipeline:
-                 return self._call_local(message, history)
-            return self._rule_based_fallback(message)
+                 return self._call_local(message, history, user_id)
+            raise  # the caller answers rule-based, and never caches that
 
-    def _call_local(self, message: str, history: List[Dict[str, str]]) -> str:
+    def _stream_api(self, message: str, history: List[Dict[str, str]], cancel: threading.Event,
+                    user_id=None) -> Iterator[str]:
+        try:
+            stream = self.client.chat_completion(
+                self._api_messages(message, history), model=self.model_id, max_tokens=512, stream=True
+            )
+        except Exception as e:
+            print(f"API Error, trying local: {e}")
+            if not self.local_pipeline:
+                self._init_local_model()
+            if not self.local_pipeline:
+                raise  # the caller answers rule-based, and never caches that
+            yield from self._stream_local(message, history, cancel, user_id)
+            return
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    break
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    yield piece
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()  # drops the HTTP connection, so the API stops generating
+
+    def _local_prompt(self, message: str, history: List[Dict[str, str]]) -> str:
         # Construct a simple prompt for TinyLlama
         # TinyLlama Chat format: <|system|>\n{sys}<|user|>\n{query}<|assistant|>
         prompt = f"<|system|>\n{self.system_prompt}</s>\n"
@@ -134,12 +279,87 @@ RULES:
             role = msg.get("role", "user")
             prompt += f"<|{role}|>\n{msg.get('content')}</s>\n"
         prompt += f"<|user|>\n{message}</s>\n<|assistant|>\n"
-        
-        outputs = self.local_pipeline(prompt, max_new_tokens=256, do_sample=True, temperature=0.7)
-        generated_text = outputs[0]['generated_text']
+        return prompt
+
+    def _call_local(self, message: str, history: List[Dict[str, str]], user_id=None) -> str:
+        prompt = self._local_prompt(message, history)
+        with inference_executor.slot(user_id):
+            generated_text = self._batcher.submit(prompt)
         # Extract only the assistant part
         return generated_text.split("<|assistant|>\n")[-1].strip()
 
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        """One pipeline call for all prompts, off the event loop in green mode."""
+        def generate():
+            outputs = self.local_pipeline(prompts, max_new_tokens=256, do_sample=True, temperature=0.7,
+                                          batch_size=len(prompts))
+            return [out[0]['generated_text'] for out in outputs]
+        return run_native(generate)
+
+    def _stream_local(self, message: str, history: List[Dict[str, str]], cancel: threading.Event,
+                      user_id=None, slot=None) -> Iterator[str]:
+        """
+        Runs generate() on a native thread; a streamer collects decoded text
+        and a stopping criterion ends generation once `cancel` is set.
+        The consumer polls, since in green mode the producer is a real thread.
+        Streams are not micro-batched (one streamer per generate call).
+        """
+        own_slot = slot is None
+        if own_slot:
+            slot = inference_executor.acquire(user_id)
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextStreamer
+
+        pieces, state = [], {'done': False, 'error': None}
+
+        class Collector(TextStreamer):
+            def on_finalized_text(self, text, stream_end=False):
+                if text:
+                    pieces.append(text)
+
+        class Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancel.is_set()
+
+        def generate():
+            try:
+                self.local_pipeline(
+                    self._local_prompt(message, history), max_new_tokens=256, do_sample=True, temperature=0.7,
+                    streamer=Collector(self.local_pipeline.tokenizer, skip_prompt=True, skip_special_tokens=True),
+                    stopping_criteria=StoppingCriteriaList([Cancelled()]),
+                )
+            except Exception as e:
+                state['error'] = e
+            finally:
+                state['done'] = True
+
+        try:
+            spawn_native(generate, "brain-generate")
+        except Exception:
+            if own_slot:
+                slot.release()
+            raise
+        sent = 0
+        drained = False
+        try:
+            while True:
+                finished = state['done']
+                while sent < len(pieces):
+                    yield pieces[sent]
+                    sent += 1
+                if finished:
+                    break
+                time.sleep(0.05)
+            drained = True
+        finally:
+            if not drained:
+                cancel.set()  # consumer went away: stop generate() at the next token
+                while not state['done']:
+                    time.sleep(0.05)  # the slot is only free once generate() has returned
+            if own_slot:
+                slot.release()
+        if state['error']:
+            raise state['error']  # stream_message logs it; answers rule-based if nothing was sent
+
     def _rule_based_fallback(self, message: str) -> str:
         """Simple keyword matching when no brain is available."""
         msg = message.lower()
@@ -151,5 +371,5 @@ RULES:
             return "You can set your reading goals in the 'My Goals' section."
         return "I'm currently operating in offline mode. Please check the Catalog for specific book inquiries."
 
-# Singleton instance
+# Singleton instance (cheap; see warm_up)
 brain = Orchestrator()
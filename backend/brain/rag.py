@@ -1,80 +1,172 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+import hashlib
 import os
+
+import numpy as np
 from typing import List, Dict, Any
 
+from backend.brain.embedding_cache import QueryEmbeddingCache, DocumentEmbeddingStore, normalize_query
+from backend.brain.warmup import WarmUp
+from backend.config.settings import BRAIN_ENCODE_BATCH_SIZE, BRAIN_QUERY_CACHE_SIZE, BRAIN_VECTOR_BACKEND
+
+# 'all-MiniLM-L6-v2' is fast, lightweight, and effective for local use.
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+def book_document(title, author, description, category) -> str:
+    """The text a book is embedded as."""
+    return f"{title} by {author or 'Unknown'}. Category: {category or 'General'}. Description: {description or ''}"
+
+
+def content_hash(document: str) -> str:
+    """Changes whenever the document text or the embedding model changes."""
+    return hashlib.sha1(f"{EMBEDDING_MODEL}\n{document}".encode('utf-8')).hexdigest()
+
 class RAGManager:
     """
     Manages Retrieval Augmented Generation (RAG) pipeline.
-    - Stores knowledge in a local Vector Database (ChromaDB)
+    - Stores knowledge in a local vector store (ChromaDB or the NumPy
+      VectorIndex, see BRAIN_VECTOR_BACKEND)
     - Retrieves relevant context for the Orchestrator
     """
     
-    def __init__(self, persistence_path: str = "./backend/brain/data"):
+    def __init__(self, persistence_path: str = "./backend/brain/data", backend: str = BRAIN_VECTOR_BACKEND):
+        """
+        Cheap: only records where the store lives. The vector DB and the
+        embedding model load on first use or via warm_up().
+        """
+        self.persistence_path = persistence_path
+        self.backend = backend
+        self.chroma_client = None
+        self.encoder = None
+        self.book_index = None
+        self.rules_collection = None
+        self.query_cache = QueryEmbeddingCache(BRAIN_QUERY_CACHE_SIZE)
+        self.doc_store = DocumentEmbeddingStore(os.path.join(persistence_path, "embedding_cache"))
+        self.warmup = WarmUp("RAG Engine", self._load)
+
+    def _load(self):
         """
         Initialize the Vector DB and Embedding Model.
         """
+        # Heavy imports (torch, chromadb) are deferred to here
+        from sentence_transformers import SentenceTransformer
+        from backend.brain.vector_index import ChromaIndex, VectorIndex
+
         # Ensure data directory exists
-        os.makedirs(persistence_path, exist_ok=True)
+        os.makedirs(self.persistence_path, exist_ok=True)
         
-        print("🧠 Loading RAG Engine...")
+        print(f"🧠 Loading RAG Engine ({self.backend})...")
         
-        # 1. Initialize Vector DB (ChromaDB)
-        self.chroma_client = chromadb.PersistentClient(path=persistence_path)
+        # 1. Initialize Vector DB
+        if self.backend == "numpy":
+            self.book_index = VectorIndex(os.path.join(self.persistence_path, "vector_index"))
+        else:
+            import chromadb
+            self.chroma_client = chromadb.PersistentClient(path=self.persistence_path)
+            self.book_index = ChromaIndex(self.chroma_client.get_or_create_collection("books"))
+            self.rules_collection = self.chroma_client.get_or_create_collection("rules")
         
         # 2. Initialize Neural Network for Embeddings
-        # 'all-MiniLM-L6-v2' is fast, lightweight, and effective for local use.
-        self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # 3. Get or Create Collections
-        self.book_collection = self.chroma_client.get_or_create_collection("books")
-        self.rules_collection = self.chroma_client.get_or_create_collection("rules")
+        self.encoder = SentenceTransformer(EMBEDDING_MODEL)
         
         print("✅ RAG Engine Ready.")
 
+    def warm_up(self):
+        """Starts loading on a background thread."""
+        self.warmup.start()
+
+    def is_ready(self) -> bool:
+        return self.warmup.ready
+
+    def _require(self):
+        if not self.warmup.ensure():
+            raise RuntimeError(f"RAG engine unavailable: {self.warmup.error}")
+
     def add_book_to_memory(self, book_id: str, title: str, author: str, description: str, category: str):
         """
         Embeds a book and saves it to the vector store.
         """
-        # Create a rich textual representation for embedding
-        text_to_embed = f"{title} by {author}. Category: {category}. Description: {description}"
-        
-        # Add to ChromaDB (it will handle embedding automatically if we didn't use a custom encoder, 
-        # but manual encoding is often more stable across environments).
-        # Actually, let's use the built-in embedding function of Chroma or our own.
-        # For control, we'll embed manually or just pass text if using default.
-        # Let's pass text and let Chroma's default or our SentenceTransformer handle it.
-        # To keep it simple, we'll generate embeddings manually.
-        
-        embedding = self.encoder.encode(text_to_embed).tolist()
-        
-        self.book_collection.upsert(
-            documents=[text_to_embed],
-            embeddings=[embedding],
+        self.upsert_books([{
+            'book_id': book_id, 'title': title, 'author': author,
+            'description': description, 'category': category,
+        }])
+
+    def upsert_books(self, books: List[Dict[str, Any]]) -> int:
+        """
+        Embeds many books in batched encoder passes and writes them in one
+        bulk upsert. Each dict needs book_id, title, author, description and
+        category. The content hash is stored with the vector (see indexer).
+        """
+        self._require()
+        if not books:
+            return 0
+        documents = [book_document(b['title'], b['author'], b['description'], b['category']) for b in books]
+        hashes = [content_hash(doc) for doc in documents]
+        embeddings = self.encode_documents(documents, hashes)
+        self.book_index.upsert(
+            documents=documents,
+            embeddings=embeddings,
             metadatas=[{
-                "book_id": book_id, 
-                "title": title, 
-                "author": author, 
-                "category": category
-            }],
-            ids=[str(book_id)]
+                "book_id": str(b['book_id']),
+                "title": b['title'],
+                "author": b['author'] or "Unknown",
+                "category": b['category'] or "General",
+                "content_hash": h,
+            } for b, h in zip(books, hashes)],
+            ids=[str(b['book_id']) for b in books]
         )
+        return len(books)
+
+    def encode_documents(self, documents: List[str], hashes: List[str]):
+        """Embeddings for documents; only texts not in the on-disk store hit the encoder."""
+        dim = self.encoder.get_sentence_embedding_dimension()
+        found, missing = self.doc_store.get_many(hashes, dim)
+        embeddings = np.zeros((len(documents), dim), dtype=np.float32)
+        for pos, vector in found.items():
+            embeddings[pos] = vector
+        if missing:
+            fresh = self.encoder.encode(
+                [documents[i] for i in missing],
+                batch_size=BRAIN_ENCODE_BATCH_SIZE, show_progress_bar=False, convert_to_numpy=True
+            )
+            embeddings[missing] = fresh
+            self.doc_store.put_many([hashes[i] for i in missing], fresh)
+        return embeddings
+
+    def encode_query(self, query: str):
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.encoder.encode(key, show_progress_bar=False, convert_to_numpy=True)
+            self.query_cache.put(key, vector)
+        return vector
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {'query': self.query_cache.stats(), 'documents': self.doc_store.stats()}
 
-    def search_books(self, query: str, n_results: int = 3):
+    def remove_books(self, book_ids) -> None:
+        self._require()
+        ids = [str(book_id) for book_id in book_ids]
+        if ids:
+            self.book_index.delete(ids)
+
+    def get_book_hashes(self, book_ids=None) -> Dict[int, str]:
         """
-        Semantic search for books based on a user query.
+        {book_id: content_hash} for the given books (default: every stored
+        book); '' for books indexed before hashes were stored.
         """
-        query_embedding = self.encoder.encode(query).tolist()
-        
-        results = self.book_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
-        
-        # Chroma returns lists of lists. Flatten for easier consumption.
-        # results['metadatas'][0] contains the list of metadata dicts
-        return results['metadatas'][0] if results['metadatas'] else []
+        self._require()
+        ids = None if book_ids is None else [str(b) for b in book_ids]
+        return {int(book_id): h for book_id, h in self.book_index.hashes(ids).items()}
+
+    def search_books(self, query: str, n_results: int = 3, categories: List[str] = None):
+        """
+        Semantic search for books based on a user query, optionally only
+        within the given categories. Returns metadata dicts with a cosine
+        similarity 'score', best first.
+        """
+        self._require()
+        return self.book_index.query(self.encode_query(query), n_results, categories=categories)
 
-# Singleton instance
+# Singleton instance (loads lazily)
 rag = RAGManager()
@@ -0,0 +1,123 @@
+"""
+response_cache.py
+-----------------
+Caches LLM answers for repeated AI chat prompts and vibe searches.
+
+An entry is keyed by the normalized prompt (case and whitespace folded),
+any conversation context the answer depended on, and the catalog version
+(retriever.catalog_version), so adding or editing books retires old answers
+without explicit invalidation.
+
+With BRAIN_RESPONSE_CACHE_SIMILARITY > 0, a context-free prompt that misses
+exactly may still hit an entry whose prompt embedding has at least that
+cosine similarity ("cozy mystery" vs "a cozy mystery please"). This only
+happens when the RAG engine is loaded; the query embedding LRU makes the
+second encode free.
+
+Entries expire after BRAIN_RESPONSE_CACHE_TTL_SEC; beyond
+BRAIN_RESPONSE_CACHE_SIZE the least recently used entry is evicted.
+Caches are per worker process.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.brain.embedding_cache import normalize_query
+from backend.config.settings import (
+    BRAIN_RESPONSE_CACHE_TTL_SEC,
+    BRAIN_RESPONSE_CACHE_SIZE,
+    BRAIN_RESPONSE_CACHE_SIMILARITY,
+)
+
+
+class ResponseCache:
+    def __init__(self, name, ttl_sec=BRAIN_RESPONSE_CACHE_TTL_SEC, max_entries=BRAIN_RESPONSE_CACHE_SIZE,
+                 similarity=BRAIN_RESPONSE_CACHE_SIMILARITY):
+        self.name = name
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries = OrderedDict()  # key -> (expires_at, response, unit vector or None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(prompt, version, context):
+        return (normalize_query(prompt), tuple(normalize_query(c) for c in context or ()), version)
+
+    def _embed(self, prompt, context):
+        if self.similarity <= 0 or context:
+            return None
+        from backend.brain.rag import rag
+        if not rag.is_ready():
+            return None
+        try:
+            vector = np.asarray(rag.encode_query(prompt), dtype=np.float32)
+        except Exception:
+            return None
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, prompt, version, context=None):
+        """The cached response, or None. context: strings the answer also depends on."""
+        key = self._key(prompt, version, context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            candidates = [(k, e) for k, e in self._entries.items() if e[2] is not None and k[2] == version and e[0] > now]
+
+        vector = self._embed(prompt, context) if candidates else None
+        if vector is not None:
+            sims = np.stack([e[2] for _, e in candidates]) @ vector
+            best = int(np.argmax(sims))
+            if sims[best] >= self.similarity:
+                with self._lock:
+                    if candidates[best][0] in self._entries:  # may have been evicted meanwhile
+                        self._entries.move_to_end(candidates[best][0])
+                    self.semantic_hits += 1
+                return candidates[best][1][1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, prompt, version, response, context=None):
+        if self.max_entries <= 0 or not response:
+            return
+        key = self._key(prompt, version, context)
+        vector = self._embed(prompt, context)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_sec, response, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.semantic_hits + self.misses
+        return {
+            'name': self.name, 'entries': len(self._entries), 'max_entries': self.max_entries,
+            'ttl_sec': self.ttl_sec, 'similarity': self.similarity,
+            'hits': self.hits, 'semantic_hits': self.semantic_hits, 'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.semantic_hits) / total, 3) if total else None,
+        }
+
+
+chat_response_cache = ResponseCache("ai_chat")
+vibe_response_cache = ResponseCache("vibe_discovery")
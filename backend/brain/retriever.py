@@ -0,0 +1,244 @@
+"""
+retriever.py
+------------
+Hybrid book retrieval shared by the AI librarian, mood recommendations and
+vibe discovery.
+
+- Lexical: BM25 over title, author, category and description. Built once
+  per worker from `books`; each term's posting list stores its final BM25
+  contribution per book, so scoring a query is one vector add per query
+  term plus argpartition.
+- Semantic: the RAG vector store (rag.search_books), used only when this
+  worker's RAG engine is already loaded; otherwise results are lexical only.
+- Fusion: reciprocal rank fusion, sum of 1 / (RRF_K + rank) over the two
+  rankings, so neither score scale has to be calibrated against the other.
+- Sampling: row arrays per category (and per union of categories, memoized)
+  serve random picks for mood/vibe fallbacks without ORDER BY RAND().
+
+Book write paths mark the index stale (see indexer.index_books); it is also
+rebuilt after BRAIN_RETRIEVER_TTL_SEC so changes made by other workers show
+up. Rebuilds run in the background while the old index keeps serving.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from backend.brain.rag import rag
+from backend.config.settings import BRAIN_RETRIEVER_TTL_SEC
+from backend.repository.db_access import fetch_all
+
+K1, B = 1.2, 0.75
+RRF_K = 60
+CANDIDATES = 50  # taken from each ranking before fusion
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset("""
+    a an and are as at be book books by for from i in is it me of on or something some that the this to want
+    with about like looking read reading recommend
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+class LexicalIndex:
+    def __init__(self, books):
+        self.books = books
+        self.by_id = {b['book_id']: i for i, b in enumerate(books)}
+        self.version = self._digest(books)
+        self.categories = np.array([(b['category'] or '').lower() for b in books])
+        self.category_names = defaultdict(set)  # lowercased -> as stored
+        for b in books:
+            if b['category']:
+                self.category_names[b['category'].lower()].add(b['category'])
+        # Candidate pools for sampling: rows per category, plus unions of
+        # categories (one per mood/vibe) memoized on first use
+        self._pools = {None: np.arange(len(books), dtype=np.int32)}
+        for name in self.category_names:
+            self._pools[frozenset([name])] = np.flatnonzero(self.categories == name).astype(np.int32)
+        docs = [
+            tokenize(f"{b['title']} {b['title']} {b['author'] or ''} {b['category'] or ''} {b['description'] or ''}")
+            for b in books
+        ]
+        lengths = np.array([len(d) for d in docs], dtype=np.float32)
+        avg_len = float(lengths.mean()) if len(docs) else 0.0
+
+        postings = defaultdict(list)
+        for doc_id, tokens in enumerate(docs):
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+
+        n = len(docs)
+        self.postings = {}
+        for term, entries in postings.items():
+            ids = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tf = np.fromiter((t for _, t in entries), dtype=np.float32, count=len(entries))
+            idf = np.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = K1 * (1 - B + B * lengths[ids] / max(avg_len, 1e-9))
+            self.postings[term] = (ids, (idf * tf * (K1 + 1) / (tf + norm)).astype(np.float32))
+
+    def pool(self, categories=None):
+        """Rows of the books in any of the given (lowercased) categories."""
+        key = frozenset(categories) if categories else None
+        rows = self._pools.get(key)
+        if rows is None:
+            parts = [self._pools.get(frozenset([c])) for c in key]
+            rows = np.concatenate([p for p in parts if p is not None] or [np.zeros(0, dtype=np.int32)])
+            self._pools[key] = rows
+        return rows
+
+    @staticmethod
+    def _digest(books):
+        """Changes whenever a book is added, removed or its searchable text changes."""
+        h = hashlib.sha1()
+        for b in books:
+            h.update(f"{b['book_id']}\x1f{b['title']}\x1f{b['author']}\x1f{b['category']}\x1f{b['description']}\x1e".encode('utf-8'))
+        return h.hexdigest()[:16]
+
+    def search(self, query, k, mask=None):
+        """[(doc_id, score)] best first."""
+        terms = [t for t in set(tokenize(query)) if t in self.postings]
+        if not terms or not self.books:
+            return []
+        scores = np.zeros(len(self.books), dtype=np.float32)
+        for term in terms:
+            ids, weights = self.postings[term]
+            scores[ids] += weights
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        k = min(k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(d), float(scores[d])) for d in top]
+
+
+class HybridRetriever:
+    def __init__(self, ttl_sec=BRAIN_RETRIEVER_TTL_SEC):
+        self.ttl_sec = ttl_sec
+        self._index = None
+        self._built_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+        self._building = False
+        self.build_seconds = None
+
+    # -------------------------------
+    # BUILD
+    # -------------------------------
+    def _build(self):
+        start = time.perf_counter()
+        books = fetch_all("""
+            SELECT b.book_id, b.title, b.category, b.description, a.name AS author
+            FROM books b
+            LEFT JOIN authors a ON b.author_id = a.author_id
+        """)
+        self._index = LexicalIndex(books)
+        self._built_at = time.monotonic()
+        self.build_seconds = round(time.perf_counter() - start, 3)
+
+    def _rebuild_in_background(self):
+        try:
+            self._build()
+        except Exception as e:
+            print(f"[RETRIEVER] Rebuild failed: {e}")
+        finally:
+            self._building = False
+
+    def _current(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._build()
+            return self._index
+        expired = time.monotonic() - self._built_at > self.ttl_sec
+        if (self._stale or expired) and not self._building:
+            with self._lock:
+                if not self._building:
+                    self._building, self._stale = True, False
+                    threading.Thread(target=self._rebuild_in_background, name="retriever-build", daemon=True).start()
+        return self._index
+
+    def invalidate(self):
+        """Books changed: rebuild on the next search (the old index serves meanwhile)."""
+        self._stale = True
+
+    # -------------------------------
+    # SEARCH
+    # -------------------------------
+    def catalog_version(self):
+        """Digest of the catalog this worker's index was built from (see LexicalIndex._digest)."""
+        return self._current().version
+
+    def categories(self):
+        """Distinct categories as stored (original case)."""
+        index = self._current()
+        return sorted(name for names in index.category_names.values() for name in names)
+
+    def search(self, query, k=5, categories=None):
+        """
+        Top-k books for a free-text query, optionally within categories
+        (case-insensitive). Returns dicts with book_id, title, author,
+        category, score (fused) and the lexical / vector ranks (None if the
+        book was not in that ranking).
+        """
+        index = self._current()
+        wanted = {c.lower() for c in categories} if categories else None
+        mask = np.isin(index.categories, list(wanted)) if wanted else None
+
+        fused = defaultdict(float)
+        ranks = defaultdict(dict)
+        for rank, (doc_id, _) in enumerate(index.search(query, CANDIDATES, mask), start=1):
+            fused[doc_id] += 1.0 / (RRF_K + rank)
+            ranks[doc_id]['lexical_rank'] = rank
+
+        if rag.is_ready():
+            try:
+                stored = sorted(n for c in wanted for n in index.category_names.get(c, ())) if wanted else None
+                hits = [] if stored == [] else rag.search_books(query, n_results=CANDIDATES, categories=stored)
+            except Exception as e:
+                print(f"[RETRIEVER] Vector search failed: {e}")
+                hits = []
+            for rank, hit in enumerate(hits, start=1):
+                doc_id = index.by_id.get(int(hit['book_id']))
+                if doc_id is None:
+                    continue  # deleted since it was embedded
+                fused[doc_id] += 1.0 / (RRF_K + rank)
+                ranks[doc_id]['vector_rank'] = rank
+
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            dict(_as_result(index.books[doc_id]), score=round(score, 5),
+                 lexical_rank=ranks[doc_id].get('lexical_rank'), vector_rank=ranks[doc_id].get('vector_rank'))
+            for doc_id, score in best
+        ]
+
+    def sample(self, k=5, categories=None):
+        """
+        k random books, optionally from the given categories (case-
+        insensitive), drawn in memory from the precomputed pools instead of
+        ORDER BY RAND(). Same dicts as search(), without scores.
+        """
+        index = self._current()
+        rows = index.pool({c.lower() for c in categories} if categories else None)
+        picks = random.sample(range(len(rows)), min(k, len(rows)))
+        return [_as_result(index.books[rows[i]]) for i in picks]
+
+
+def _as_result(book):
+    return {
+        'book_id': book['book_id'], 'title': book['title'],
+        'author': book['author'] or 'Unknown', 'category': book['category'] or 'General',
+    }
+
+
+retriever = HybridRetriever()
@@ -0,0 +1,353 @@
+"""
+vector_index.py
+---------------
+Vector store backends for the RAG book collection (BRAIN_VECTOR_BACKEND):
+
+- chroma: ChromaDB collection (ChromaIndex adapts it to the interface below)
+- numpy:  VectorIndex, a brute-force index that is plenty for catalogs of up
+          to a few hundred thousand books and needs nothing beyond NumPy.
+
+VectorIndex keeps L2-normalized float32 embeddings in a memory-mapped .npy
+file, so a query is one matrix-vector product (cosine similarity) plus
+argpartition for the top k; a category filter is a boolean mask over the
+rows. Every worker maps the same file, so the OS page cache holds a single
+copy.
+
+    <path>/vectors-<gen>.npy   capacity x dim float32 (rows past `count` unused)
+    <path>/index.json          snapshot {"gen", "dim", "count", "ids", "meta", "log"}
+    <path>/<log>               JSON lines appended since the snapshot:
+                               {"gen", "dim", "count", "set": [[row, id, meta]], "removed": [ids]}
+
+Writers hold an exclusive file lock, update rows in place (a full file is
+copied into a file twice the size, the next generation) and append one log
+line describing the rows they changed, so a write costs O(rows written),
+not O(catalog). Once the log outgrows the snapshot it is compacted: a new
+snapshot (pointing at a fresh log) atomically replaces index.json. Readers
+replay only the log lines they have not seen, and reload everything when
+index.json changes. Deletes move the last row into the freed slot, so rows
+0..count-1 are always live.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+MIN_CAPACITY = 1024
+MIN_LOG_COMPACT = 1 << 20  # log bytes always tolerated before compacting
+
+
+class ChromaIndex:
+    """The ChromaDB collection behind the same interface as VectorIndex."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def upsert(self, ids, embeddings, metadatas, documents=None):
+        self.collection.upsert(ids=ids, embeddings=np.asarray(embeddings).tolist(),
+                               metadatas=metadatas, documents=documents)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def count(self):
+        return self.collection.count()
+
+    def hashes(self, ids=None, page_size=5000):
+        if ids is not None:
+            pages = [self.collection.get(ids=ids, include=["metadatas"])] if ids else []
+        else:
+            pages = self._pages(page_size)
+        result = {}
+        for page in pages:
+            for book_id, meta in zip(page['ids'], page['metadatas']):
+                result[book_id] = (meta or {}).get('content_hash', '')
+        return result
+
+    def _pages(self, page_size):
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            yield page
+            if len(page['ids']) < page_size:
+                return
+            offset += page_size
+
+    def query(self, embedding, n_results, categories=None):
+        where = {"category": {"$in": list(categories)}} if categories else None
+        results = self.collection.query(
+            query_embeddings=[np.asarray(embedding).tolist()], n_results=n_results, where=where
+        )
+        if not results['metadatas']:
+            return []
+        # Chroma returns lists of lists (one per query embedding) and L2 distances
+        return [dict(meta, score=round(1 - dist / 2, 4))
+                for meta, dist in zip(results['metadatas'][0], results['distances'][0])]
+
+
+class VectorIndex:
+    def __init__(self, path):
+        self.path = path
+        self.dim = None
+        self._gen = 0
+        self._count = 0
+        self._ids = []
+        self._meta = []
+        self._rows = {}            # id -> row
+        self._matrix = None        # read-only memmap, capacity x dim
+        self._mapped_gen = None
+        self._categories = np.zeros(0, dtype=np.int32)
+        self._category_codes = {}  # lowercased category -> code
+        self._stamp = None         # index.json snapshot the state was loaded from
+        self._log = None           # log file of that snapshot
+        self._log_offset = 0       # bytes of it already applied
+        self._retired = None       # previous generation file, removed after a grow
+        self._lock = threading.Lock()
+
+    # -------------------------------
+    # FILES
+    # -------------------------------
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _vectors_file(self, gen):
+        return self._file(f"vectors-{gen}.npy")
+
+    @contextmanager
+    def _writer(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, open(self._file(".lock"), "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._reload_if_changed()
+                if self._log and os.path.exists(self._file(self._log)) \
+                        and os.path.getsize(self._file(self._log)) > self._log_offset:
+                    # Torn line from a writer that crashed mid-append
+                    os.truncate(self._file(self._log), self._log_offset)
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _reload_if_changed(self):
+        try:
+            st = os.stat(self._file("index.json"))
+        except FileNotFoundError:
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            self._load_snapshot(stamp)
+        if self._log and not self._replay_log():
+            # Compacted away between the two checks: start over
+            self._stamp = None
+            self._reload_if_changed()
+            return
+        if self._mapped_gen != self._gen:
+            self._matrix = np.load(self._vectors_file(self._gen), mmap_mode='r')
+            self._mapped_gen = self._gen
+
+    def _load_snapshot(self, stamp):
+        with open(self._file("index.json")) as f:
+            state = json.load(f)
+        self.dim, self._gen, self._count = state['dim'], state['gen'], state['count']
+        self._ids, self._meta = state['ids'], state['meta']
+        self._rows = {book_id: row for row, book_id in enumerate(self._ids)}
+        self._category_codes = {}
+        self._categories = np.array([self._code(m) for m in self._meta], dtype=np.int32)
+        self._log = state.get('log')
+        self._log_offset = 0
+        self._stamp = stamp
+
+    def _replay_log(self):
+        """Applies log lines appended since the last call. False if the log is gone."""
+        try:
+            with open(self._file(self._log), "rb") as f:
+                f.seek(self._log_offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return False
+        complete = tail.rfind(b"\n") + 1  # a line being written right now waits for the next call
+        for line in tail[:complete].splitlines():
+            self._apply(json.loads(line))
+        self._log_offset += complete
+        return True
+
+    def _code(self, meta):
+        return self._category_codes.setdefault(str(meta.get('category', '')).lower(), len(self._category_codes))
+
+    def _apply(self, record):
+        self.dim, self._gen = record['dim'], record['gen']
+        count = record['count']
+        for book_id in record.get('removed', ()):
+            self._rows.pop(book_id, None)
+        if count > len(self._ids):
+            self._ids.extend([None] * (count - len(self._ids)))
+            self._meta.extend([None] * (count - len(self._meta)))
+        if count > len(self._categories):
+            self._categories = np.resize(self._categories, max(count, 2 * len(self._categories)))
+        for row, book_id, meta in record['set']:
+            self._ids[row], self._meta[row] = book_id, meta
+            self._rows[book_id] = row
+            self._categories[row] = self._code(meta)
+        del self._ids[count:]
+        del self._meta[count:]
+        self._count = count
+
+    def _compact(self):
+        """Writes a snapshot of the current state with a fresh, empty log."""
+        old_log = self._log
+        number = int(old_log.split('-')[1].split('.')[0]) + 1 if old_log else 0
+        new_log = f"index-{number}.log"
+        open(self._file(new_log), "wb").close()
+        tmp = self._file(f"index.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({'dim': self.dim, 'gen': self._gen, 'count': self._count,
+                       'ids': self._ids, 'meta': self._meta, 'log': new_log}, f)
+        os.replace(tmp, self._file("index.json"))
+        st = os.stat(self._file("index.json"))
+        self._stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        self._log, self._log_offset = new_log, 0
+        if old_log:
+            try:
+                os.remove(self._file(old_log))
+            except FileNotFoundError:
+                pass
+
+    def _writable(self, rows_needed):
+        """Writable memmap with room for rows_needed rows (grows into a new generation)."""
+        if self._matrix is not None and rows_needed <= self._matrix.shape[0]:
+            return np.load(self._vectors_file(self._gen), mmap_mode='r+')
+        capacity = max(MIN_CAPACITY, rows_needed, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+        old_gen = self._gen
+        new_gen = old_gen + 1 if self._matrix is not None else 0
+        grown = np.lib.format.open_memmap(self._vectors_file(new_gen), mode='w+', dtype=np.float32,
+                                          shape=(capacity, self.dim))
+        if self._matrix is not None:
+            grown[:self._count] = self._matrix[:self._count]
+            self._retired = self._vectors_file(old_gen)
+        self._gen = new_gen
+        return grown
+
+    def _commit(self, writable, count, changed, removed=()):
+        """Persists rows `changed` ({row: (id, meta)}) and the new count: one log line, or a compaction."""
+        writable.flush()
+        del writable
+        record = {'gen': self._gen, 'dim': self.dim, 'count': count,
+                  'set': [[row, book_id, meta] for row, (book_id, meta) in changed.items() if row < count],
+                  'removed': list(removed)}
+        try:
+            line = (json.dumps(record) + "\n").encode("utf-8")
+            if self._log is None or self._log_offset + len(line) > max(self._stamp[2], MIN_LOG_COMPACT):
+                self._apply(record)
+                self._compact()
+            else:
+                with open(self._file(self._log), "ab") as f:
+                    f.write(line)
+                self._apply(record)
+                self._log_offset += len(line)
+        except Exception:
+            self._stamp = None  # in-memory state is suspect: reload from disk next time
+            raise
+        if self._mapped_gen != self._gen:
+            self._matrix = np.load(self._vectors_file(self._gen), mmap_mode='r')
+            self._mapped_gen = self._gen
+        if self._retired:
+            # Readers that still map the old generation keep their mapping
+            os.remove(self._retired)
+            self._retired = None
+
+    # -------------------------------
+    # WRITE
+    # -------------------------------
+    def upsert(self, ids, embeddings, metadatas, documents=None):
+        if not len(ids):
+            return
+        # Last write wins for ids repeated within one call
+        latest = {book_id: pos for pos, book_id in enumerate(ids)}
+        ids = list(latest)
+        vectors = np.asarray(embeddings, dtype=np.float32)[list(latest.values())]
+        metadatas = [metadatas[pos] for pos in latest.values()]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        with self._writer():
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector index at {self.path} holds dim {self.dim}, got {vectors.shape[1]}")
+            changed = {}
+            new = 0
+            for book_id, meta in zip(ids, metadatas):
+                row = self._rows.get(book_id)
+                if row is None:
+                    row = self._count + new
+                    new += 1
+                changed[row] = (book_id, dict(meta))
+            writable = self._writable(self._count + new)
+            writable[list(changed)] = vectors
+            self._commit(writable, self._count + new, changed)
+
+    def delete(self, ids):
+        with self._writer():
+            doomed = {self._rows[book_id]: book_id for book_id in ids if book_id in self._rows}
+            if not doomed:
+                return
+            writable = self._writable(self._count)
+            changed = {}
+            count = self._count
+            for row in sorted(doomed, reverse=True):
+                last = count - 1
+                if row != last:
+                    writable[row] = writable[last]
+                    changed[row] = changed.pop(last, None) or (self._ids[last], self._meta[last])
+                else:
+                    changed.pop(last, None)
+                count -= 1
+            self._commit(writable, count, changed, removed=doomed.values())
+
+    # -------------------------------
+    # READ
+    # -------------------------------
+    def count(self):
+        with self._lock:
+            self._reload_if_changed()
+            return self._count
+
+    def hashes(self, ids=None):
+        with self._lock:
+            self._reload_if_changed()
+            wanted = self._ids if ids is None else [i for i in ids if i in self._rows]
+            return {i: self._meta[self._rows[i]].get('content_hash', '') for i in wanted}
+
+    def query(self, embedding, n_results, categories=None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._reload_if_changed()
+            count, matrix, meta = self._count, self._matrix, self._meta[:self._count]
+            mask = None
+            if categories:
+                codes = [self._category_codes[c.lower()] for c in categories if c.lower() in self._category_codes]
+                mask = np.isin(self._categories[:count], codes)
+        if not count:
+            return []
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        scores = matrix[:count] @ q
+        if mask is not None:
+            candidates = int(mask.sum())
+            scores = np.where(mask, scores, -np.inf)
+        else:
+            candidates = count
+        k = min(n_results, candidates)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(meta[row], score=round(float(scores[row]), 4)) for row in top]
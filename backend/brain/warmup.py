@@ -0,0 +1,101 @@
+"""
+warmup.py
+---------
+One-time loading of heavy AI resources (vector DB, embedding model, LLM).
+
+States: cold -> loading -> ready | failed. Loading starts either on first
+blocking use (ensure) or in the background (start); request handlers check
+`ready` and answer "warming up" instead of waiting. In gevent/eventlet mode
+the loader runs on a native OS thread, since model loading is CPU-bound and
+would otherwise stall the event loop.
+"""
+
+import threading
+import time
+
+COLD, LOADING, READY, FAILED = 'cold', 'loading', 'ready', 'failed'
+
+
+def spawn_native(fn, name):
+    """Starts fn on a native OS thread (the hub's threadpool in green mode)."""
+    from backend.async_mode import ASYNC_MODE
+    if ASYNC_MODE == 'gevent':
+        from gevent import get_hub
+        return get_hub().threadpool.spawn(fn)
+    if ASYNC_MODE == 'eventlet':
+        import eventlet
+        from eventlet import tpool
+        return eventlet.spawn(tpool.execute, fn)
+    thread = threading.Thread(target=fn, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_native(fn, *args):
+    """Runs CPU-bound fn(*args) to completion, off the event loop in green mode."""
+    from backend.async_mode import ASYNC_MODE
+    if ASYNC_MODE == 'gevent':
+        from gevent import get_hub
+        return get_hub().threadpool.apply(fn, args)
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+    return fn(*args)
+
+
+class WarmUp:
+    """Runs `loader` exactly once and tracks its state."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self.state = COLD
+        self.error = None
+        self.load_seconds = None
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    @property
+    def done(self):
+        return self.state in (READY, FAILED)
+
+    def _claim(self):
+        with self._lock:
+            if self.state != COLD:
+                return False
+            self.state = LOADING
+            return True
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self._loader()
+            self.state = READY
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            print(f"❌ {self.name} failed to load: {e}")
+        finally:
+            self.load_seconds = round(time.perf_counter() - start, 2)
+
+    def start(self):
+        """Begins loading in the background (no-op if already started)."""
+        if self._claim():
+            spawn_native(self._run, f"warmup-{self.name}")
+
+    def ensure(self, timeout=None):
+        """Loads in the calling thread (or waits for the background load). Returns ready."""
+        if self._claim():
+            self._run()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            time.sleep(0.05)  # Polling: the loader may be a native thread in green mode
+        return self.ready
+
+    def status(self):
+        return {'state': self.state, 'error': self.error, 'load_seconds': self.load_seconds}
@@ -0,0 +1,222 @@
+"""
+metrics.py
+----------
+In-process instrumentation for the Socket.IO layer.
+
+- Handler durations per event and IngestionService stage timings go into
+  fixed-bucket histograms (constant memory, cheap to record, p50/p95/p99
+  estimated from the buckets).
+- Event rates come from a ring of per-second counters covering the last
+  SOCKET_METRICS_WINDOW_SEC seconds.
+- The emit queue is the engine.io per-socket outbound packet queue: packets
+  that have been emitted but not yet written to the client.
+
+Numbers are per worker process. snapshot() feeds the admin metrics endpoint;
+a background task prints a one-line summary every SOCKET_METRICS_LOG_SEC.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from backend.config.settings import SOCKET_METRICS_LOG_SEC, SOCKET_METRICS_WINDOW_SEC
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Latency histogram with fixed millisecond buckets."""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else round(self.max_ms, 2)
+        return round(self.max_ms, 2)
+
+    def to_dict(self):
+        buckets = {('le_%g' % b): c for b, c in zip(BUCKETS_MS, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 2),
+            'buckets': buckets,
+        }
+
+
+class SocketMetrics:
+    def __init__(self, window_sec=SOCKET_METRICS_WINDOW_SEC, log_sec=SOCKET_METRICS_LOG_SEC):
+        self.window_sec = window_sec
+        self.log_sec = log_sec
+        self._lock = threading.Lock()
+        self._handlers = {}   # event -> Histogram
+        self._stages = {}     # stage -> Histogram
+        self._errors = Counter()
+        self._totals = Counter()
+        self._seconds = deque()  # (epoch second, Counter of events)
+        self._started_at = time.time()
+        self._started = False
+        self._server = None
+
+    # -------------------------------
+    # RECORDING
+    # -------------------------------
+    def record_handler(self, event, ms, failed=False):
+        now = int(time.time())
+        with self._lock:
+            hist = self._handlers.get(event)
+            if hist is None:
+                hist = self._handlers[event] = Histogram()
+            hist.observe(ms)
+            self._totals[event] += 1
+            if failed:
+                self._errors[event] += 1
+            if not self._seconds or self._seconds[-1][0] != now:
+                self._seconds.append((now, Counter()))
+                while self._seconds[0][0] <= now - self.window_sec:
+                    self._seconds.popleft()
+            self._seconds[-1][1][event] += 1
+
+    def record_stage(self, stage, ms):
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe(ms)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, (time.perf_counter() - start) * 1000)
+
+    # -------------------------------
+    # READING
+    # -------------------------------
+    def events_per_sec(self, now=None):
+        """{event: rate} averaged over the window (or the uptime, if shorter)."""
+        now = int(now or time.time())
+        span = max(1, min(self.window_sec, now - int(self._started_at)))
+        rates = Counter()
+        with self._lock:
+            for sec, counts in self._seconds:
+                if sec > now - span:
+                    rates.update(counts)
+        return {event: round(n / span, 2) for event, n in rates.most_common()}
+
+    def emit_queue(self):
+        """Outbound engine.io packets waiting to be written, across this worker's sockets."""
+        eio = getattr(self._server, 'eio', None)
+        if eio is None:
+            return {'total': 0, 'max': 0, 'sockets': 0}
+        sizes = []
+        for sock in list(eio.sockets.values()):
+            q = getattr(sock, 'queue', None)
+            if q is not None:
+                sizes.append(q.qsize())
+        return {'total': sum(sizes), 'max': max(sizes, default=0), 'sockets': len(sizes)}
+
+    def snapshot(self):
+        with self._lock:
+            handlers = {event: dict(h.to_dict(), errors=self._errors[event]) for event, h in self._handlers.items()}
+            stages = {stage: h.to_dict() for stage, h in self._stages.items()}
+            totals = dict(self._totals)
+        return {
+            'pid': os.getpid(),
+            'uptime_sec': int(time.time() - self._started_at),
+            'window_sec': self.window_sec,
+            'events_per_sec': self.events_per_sec(),
+            'event_totals': totals,
+            'handlers': handlers,
+            'ingestion_stages': stages,
+            'emit_queue': self.emit_queue(),
+        }
+
+    def summary_line(self):
+        snap = self.snapshot()
+        rate = sum(snap['events_per_sec'].values())
+        slowest = sorted(
+            ((e, h['p95_ms']) for e, h in snap['handlers'].items() if h['p95_ms'] is not None),
+            key=lambda item: item[1], reverse=True
+        )[:3]
+        stages = ", ".join(f"{s} {h['p95_ms']}" for s, h in snap['ingestion_stages'].items())
+        q = snap['emit_queue']
+        return (f"[SOCKET METRICS] {rate:.1f} ev/s | p95 ms: "
+                f"{', '.join(f'{e} {p}' for e, p in slowest) or '-'} | "
+                f"ingest p95 ms: {stages or '-'} | "
+                f"emit queue {q['total']} (max {q['max']}) over {q['sockets']} sockets")
+
+    # -------------------------------
+    # BACKGROUND SUMMARY
+    # -------------------------------
+    def ensure_started(self, socketio):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._server = socketio.server
+        if self.log_sec > 0:
+            socketio.start_background_task(self._loop, socketio)
+
+    def _loop(self, socketio):
+        while True:
+            socketio.sleep(self.log_sec)
+            try:
+                if self._totals:
+                    print(self.summary_line(), flush=True)
+            except Exception as e:
+                print(f"[SOCKET METRICS] Summary failed: {e}")
+
+
+socket_metrics = SocketMetrics()
+
+
+def timed_handler(event):
+    """Records duration (and exceptions) of a Socket.IO handler under `event`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                socket_metrics.record_handler(event, (time.perf_counter() - start) * 1000, failed)
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+"""
+pubsub.py
+---------
+Cross-process broadcast layer for Socket.IO.
+
+Flask-SocketIO only fans out to sockets connected to the *current* process.
+To run more than one worker, every emit has to travel through a shared
+message queue so each worker can deliver it to its own sockets.
+
+Supported queue URLs (SOCKETIO_MESSAGE_QUEUE):
+- ""                      -> in-process only (single worker, default)
+- "sqlite:///path/to.db"  -> SQLitePubSubManager (local, no extra services)
+- "redis://..." / "amqp://..." / "kafka://..." / "zmq+tcp://..."
+                          -> handed to Flask-SocketIO's built-in managers
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import socketio
+
+from backend.config.settings import (
+    SOCKETIO_MESSAGE_QUEUE,
+    SOCKETIO_QUEUE_CHANNEL,
+    SOCKETIO_QUEUE_POLL_MS,
+    SOCKETIO_QUEUE_RETENTION_SEC,
+)
+
+SQLITE_PREFIX = "sqlite://"
+
+
+class SQLitePubSubManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager backed by a shared SQLite file.
+
+    Every worker on the host appends messages to a single WAL-mode table and
+    tails it by auto-increment id. It needs no broker process, which makes it
+    a drop-in stand-in for Redis on a single machine (dev boxes, small VMs).
+
+    Table: socketio_queue(id, channel, payload, created_at)
+    """
+    name = 'sqlite'
+
+    def __init__(self, url=None, channel='flask-socketio', write_only=False, logger=None,
+                 poll_interval=None, retention=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.db_path = parse_sqlite_url(url or SOCKETIO_MESSAGE_QUEUE)
+        self.poll_interval = (poll_interval if poll_interval is not None
+                              else SOCKETIO_QUEUE_POLL_MS / 1000.0)
+        self.retention = retention if retention is not None else SOCKETIO_QUEUE_RETENTION_SEC
+        self._local = threading.local()
+        self._last_prune = 0.0
+        self._last_id = None  # last id delivered by the listener
+        self._ensure_schema()
+
+    # -------------------------------
+    # CONNECTION HANDLING
+    # -------------------------------
+    def _connection(self):
+        """One SQLite connection per thread (sqlite3 objects are not thread-safe)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS socketio_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    # -------------------------------
+    # PUB/SUB PRIMITIVES
+    # -------------------------------
+    def _publish(self, data):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO socketio_queue (channel, payload, created_at) VALUES (?, ?, ?)",
+            (self.channel, pickle.dumps(data), now)
+        )
+        # Opportunistic pruning keeps the file small without a separate job
+        if now - self._last_prune > self.retention:
+            self._last_prune = now
+            conn.execute("DELETE FROM socketio_queue WHERE created_at < ?", (now - self.retention,))
+
+    def _listen(self):
+        # python-socketio restarts _listen after an error; resume from the
+        # last delivered id so nothing published meanwhile is lost. Only the
+        # very first start skips the backlog.
+        conn = self._connection()
+        if self._last_id is None:
+            row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM socketio_queue").fetchone()
+            self._last_id = row[0]
+        try:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, payload FROM socketio_queue WHERE id > ? AND channel = ? ORDER BY id",
+                    (self._last_id, self.channel)
+                ).fetchall()
+                for msg_id, payload in rows:
+                    self._last_id = msg_id
+                    yield pickle.loads(payload)
+                if not rows:
+                    self._sleep(self.poll_interval)
+        except sqlite3.Error:
+            # Reconnect on the restart
+            self._local.conn = None
+            conn.close()
+            raise
+
+    def _sleep(self, seconds):
+        # Cooperative sleep so the listener does not block a green worker
+        if self.server is not None:
+            self.server.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+
+def parse_sqlite_url(url):
+    """Converts 'sqlite:///abs/path.db' or 'sqlite://rel/path.db' to a filesystem path."""
+    if not url or not url.startswith(SQLITE_PREFIX):
+        raise ValueError(f"Not a sqlite queue URL: {url!r}")
+    path = url[len(SQLITE_PREFIX):]
+    if path.startswith('/'):
+        return path
+    return os.path.abspath(path)
+
+
+def get_queue_options(url=None, channel=None, write_only=False):
+    """
+    Returns the keyword arguments for SocketIO()/init_app() that enable the
+    configured message queue. Empty dict means single-process fan-out.
+    """
+    url = SOCKETIO_MESSAGE_QUEUE if url is None else url
+    channel = channel or SOCKETIO_QUEUE_CHANNEL
+    if not url:
+        return {}
+    if url.startswith(SQLITE_PREFIX):
+        return {'client_manager': SQLitePubSubManager(url, channel=channel, write_only=write_only)}
+    # Let Flask-SocketIO pick Redis/Kombu/Kafka/ZMQ from the URL scheme
+    return {'message_queue': url, 'channel': channel}
+
+
+def create_external_emitter(url=None, channel=None):
+    """
+    Write-only SocketIO instance for processes that are not serving sockets
+    (scheduler, CLI scripts) but still need to emit to connected clients.
+    """
+    from flask_socketio import SocketIO
+    options = get_queue_options(url, channel, write_only=True)
+    if not options:
+        raise RuntimeError("SOCKETIO_MESSAGE_QUEUE is not configured")
+    emitter = SocketIO()
+    emitter.init_app(None, **options)
+    return emitter
@@ -11,46 +11,67 @@ from backend.services.chat_service import get_or_create_anon_id, delete_message,
 # I need to update chat_service functions or implement them in channel_service.
 # I WILL IMPLEMENT THEM IN channel_service NOW TO BE SAFE.
 
-from backend.repository.db_access import execute, fetch_one
+from backend.repository.db_access import fetch_one
 from backend.services.gateway_service import GatewayService
 from backend.services.ingestion_service import IngestionService
+from backend.services.presence_service import PresenceService, user_room
+from backend.chat.typing_manager import typing_manager
+from backend.utils.rate_limiter import check_rate_limit
+from backend.services import moderation_service
+from backend.services.image_service import avatar_variant
+from backend.chat.wire_format import fanout_room, normalize_wire, encode_history, encode_live, pack
+from backend.chat.metrics import socket_metrics, timed_handler
 
 # --- Helper functions for Edit/Delete in new architecture ---
-def service_edit_message(user_id, message_id, new_content):
-    anon_id = get_or_create_anon_id(user_id)
-    # Check ownership
-    msg = fetch_one("SELECT * FROM chat_messages WHERE message_id = %s", (message_id,))
-    if not msg: return False
-    if msg['anon_id'] != anon_id: return False
-    
-    execute("UPDATE chat_messages SET message_text = %s, is_edited = TRUE WHERE message_id = %s", (new_content, message_id))
-    return True
+# Ownership/moderator checks run inside the UPDATE (see moderation_service)
+def service_edit_message(user_id, message_id, new_content, channel_id):
+    return moderation_service.edit_message(user_id, message_id, channel_id, new_content)
 
-def service_delete_message(user_id, message_id):
-    anon_id = get_or_create_anon_id(user_id)
-    msg = fetch_one("SELECT * FROM chat_messages WHERE message_id = %s", (message_id,))
-    if not msg: return False
-    
-    # Allow self or admin (TODO: Check guild permissions for admin)
-    if msg['anon_id'] != anon_id: return False 
-    
-    execute("UPDATE chat_messages SET is_deleted = TRUE WHERE message_id = %s", (message_id,))
-    return True
+def service_delete_message(user_id, message_id, is_site_admin=False):
+    return moderation_service.delete_message(user_id, message_id, is_site_admin)
 # -----------------------------------------------------------
 
 print("[OK] Loaded backend.chat.socket_service event handlers (Discord Arch)", flush=True)
 
 @socketio.on('connect')
-def handle_connect():
+@timed_handler('connect')
+def handle_connect(auth=None):
     user_id = session.get('user_id')
     if user_id:
         print(f"[SOCKET] User {session.get('name')} (ID: {user_id}) connected.", flush=True)
+        PresenceService.ensure_background_tasks(socketio)
+        socket_metrics.ensure_started(socketio)
+        GatewayService.register_connection(request.sid, user_id)
+        # Personal room for friend presence / direct notifications
+        join_room(user_room(user_id))
 
 @socketio.on('disconnect')
+@timed_handler('disconnect')
 def handle_disconnect():
     print(f"[SOCKET] User disconnected: {request.sid}")
+    GatewayService.deregister_connection(request.sid)
+
+@socketio.on('heartbeat')
+@timed_handler('heartbeat')
+def handle_heartbeat(data=None):
+    """Client keep-alive; sessions without one are swept as zombies."""
+    if not GatewayService.update_heartbeat(request.sid) and session.get('user_id'):
+        # Swept while still alive (e.g. laptop sleep) - re-register
+        GatewayService.register_connection(request.sid, session['user_id'])
+
+@socketio.on('get_online_friends')
+@timed_handler('get_online_friends')
+def handle_get_online_friends(data=None):
+    """Initial presence snapshot; later changes arrive as batched 'presence_update'."""
+    user_id = session.get('user_id')
+    if not user_id: return
+    from backend.services.social_service import get_friends_list
+    online = set(GatewayService.get_online_users())
+    friend_ids = [f['friend_id'] for f in get_friends_list(user_id)]
+    emit('online_friends', {'user_ids': [fid for fid in friend_ids if fid in online]})
 
 @socketio.on('join_channel')
+@timed_handler('join_channel')
 def handle_join_channel(data):
     """User joining a channel (initially called join_room)."""
     # Helper to support both 'room_id' (legacy frontend) and 'channel_id'
@@ -69,13 +90,25 @@ def handle_join_channel(data):
 
     # Join Socket Room (using channel_id as the room name)
     join_room(str(channel_id))
+    # New messages arrive in the format this client asked for ('json' or 'compact')
+    wire = normalize_wire(data.get('wire'))
+    session['wire_format'] = wire
+    join_room(fanout_room(channel_id, wire))
+    if channel.get('is_private'):
+        # Private channels (DMs/groups) also get presence updates for this socket
+        PresenceService.track_channel(request.sid, channel_id)
     
     # Fetch History
     try:
+        my_anon_id = get_or_create_anon_id(user_id)
+        if wire == 'compact':
+            raw_msgs = get_channel_messages(channel_id, format_dates=False)
+            emit('message_history', pack(encode_history(channel_id, raw_msgs, my_anon_id)))
+            return
+
         raw_msgs = get_channel_messages(channel_id)
         # Format for Frontend (Frontend expects specific keys)
         formatted = []
-        my_anon_id = get_or_create_anon_id(user_id)
         
         for m in raw_msgs:
             formatted.append({
@@ -103,6 +136,7 @@ def handle_join_channel(data):
 
 
 @socketio.on('send_message')
+@timed_handler('send_message')
 def handle_message(data):
     user_id = session.get('user_id')
     channel_id = data.get('channel_id') or data.get('room_id')
@@ -135,7 +169,7 @@ def handle_message(data):
     else:
         user_profile = {
             'name': session.get('name'),
-            'pic': session.get('profile_pic', 'default.jpg')
+            'pic': avatar_variant(session.get('profile_pic'))
         }
     
     attachment = data.get('attachment')
@@ -146,35 +180,70 @@ def handle_message(data):
     )
     
     if success:
+        # Sending ends the typing state without waiting for stop_typing/expiry
+        typing_manager.stop_typing(channel_id, user_id)
+
         # Confirm to sender (Optimistic Ack)
         result['sender_type'] = 'me'
-        emit('receive_message', result)
+        if session.get('wire_format') == 'compact':
+            emit('receive_message', pack(encode_live(result, me=True)))
+        else:
+            emit('receive_message', result)
     else:
         # Error (Rate Limit / Validation)
         emit('error', {'message': result})
 
 @socketio.on('edit_message')
+@timed_handler('edit_message')
 def handle_edit(data):
-    if service_edit_message(session['user_id'], data['message_id'], data['new_content']):
-        channel_id = data.get('channel_id') or data.get('room_id')
+    channel_id = data.get('channel_id') or data.get('room_id')
+    if service_edit_message(session['user_id'], data['message_id'], data['new_content'], channel_id):
         emit('message_updated', {
             'message_id': data['message_id'],
             'new_content': data['new_content']
         }, to=str(channel_id))
 
 @socketio.on('delete_message')
+@timed_handler('delete_message')
 def handle_delete(data):
-    if service_delete_message(session['user_id'], data['message_id']):
+    if service_delete_message(session['user_id'], data['message_id'], session.get('role') == 'admin'):
         channel_id = data.get('channel_id') or data.get('room_id')
         emit('message_deleted', {'message_id': data['message_id']}, to=str(channel_id))
 
+@socketio.on('mark_read')
+@timed_handler('mark_read')
+def handle_mark_read(data):
+    """
+    Batched read markers: {'markers': [{'channel_id', 'message_id'}, ...]}.
+    Replies (to every tab of this user) with fresh unread counts.
+    """
+    user_id = session.get('user_id')
+    markers = (data or {}).get('markers') or []
+    if not user_id or not markers: return
+    from backend.services.read_state_service import mark_read_bulk, get_unread_counts
+    try:
+        mark_read_bulk(user_id, markers[:200])
+        channel_ids = {m.get('channel_id') for m in markers[:200] if m.get('channel_id') is not None}
+        emit('unread_counts', {'unread': get_unread_counts(user_id, channel_ids)}, to=user_room(user_id))
+    except Exception as e:
+        print(f"[ERROR] mark_read failed: {e}")
+
 @socketio.on('typing')
+@timed_handler('typing')
 def handle_typing(data):
-    # Architecture: Throttling could be added here via RateLimiter
+    # Aggregated: typing_manager emits one 'typing_update' per channel per flush
     channel_id = data.get('channel_id') or data.get('room_id')
-    emit('typing', {'user': session.get('name')}, to=str(channel_id), include_self=False)
+    user_id = session.get('user_id')
+    if not channel_id or not user_id: return
+    if not check_rate_limit(f"rate:typing:user:{user_id}", policy='chat:typing'):
+        return  # Over-eager clients are simply ignored
+    typing_manager.ensure_started(socketio)
+    typing_manager.start_typing(channel_id, user_id, session.get('name'))
 
 @socketio.on('stop_typing')
+@timed_handler('stop_typing')
 def handle_stop_typing(data):
     channel_id = data.get('channel_id') or data.get('room_id')
-    emit('stop_typing', {}, to=str(channel_id), include_self=False)
+    user_id = session.get('user_id')
+    if not channel_id or not user_id: return
+    typing_manager.stop_typing(channel_id, user_id)
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+from backend.config.settings import TYPING_FLUSH_MS, TYPING_TTL_SEC
+
+
+class TypingManager:
+    """
+    Aggregates typing state per channel and broadcasts it in batches.
+
+    Instead of relaying every 'typing' keystroke to the whole room, each
+    channel keeps a {user -> expiry} map. A single background loop emits one
+    'typing_update' with the full "who is typing" list per *changed* channel
+    at most every TYPING_FLUSH_MS, so emits per channel are bounded no matter
+    how many members type. Typers expire after TYPING_TTL_SEC without a
+    refresh (closed tab, lost stop_typing).
+    """
+
+    def __init__(self, flush_ms=TYPING_FLUSH_MS, ttl=TYPING_TTL_SEC):
+        self.flush_interval = flush_ms / 1000.0
+        self.ttl = ttl
+        # channel_id -> { user_key: (display_name, expires_at) }
+        self._channels = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._started = False
+        # Distinguishes lists from different workers when a message queue is used
+        self.origin = f"{os.getpid()}"
+
+    def start_typing(self, channel_id, user_key, name, now=None):
+        now = now or time.monotonic()
+        cid = str(channel_id)
+        with self._lock:
+            typers = self._channels.setdefault(cid, {})
+            if user_key not in typers:
+                self._dirty.add(cid)  # Refreshes of an existing typer are free
+            typers[user_key] = (name, now + self.ttl)
+
+    def stop_typing(self, channel_id, user_key):
+        cid = str(channel_id)
+        with self._lock:
+            typers = self._channels.get(cid)
+            if typers and typers.pop(user_key, None) is not None:
+                self._dirty.add(cid)
+                if not typers:
+                    del self._channels[cid]
+
+    def collect(self, now=None):
+        """Expires stale typers and returns {channel_id: [names]} for channels that changed."""
+        now = now or time.monotonic()
+        with self._lock:
+            for cid, typers in list(self._channels.items()):
+                stale = [k for k, (_, exp) in typers.items() if exp <= now]
+                for k in stale:
+                    del typers[k]
+                if stale:
+                    self._dirty.add(cid)
+                if not typers:
+                    del self._channels[cid]
+
+            changed = {}
+            for cid in self._dirty:
+                typers = self._channels.get(cid, {})
+                changed[cid] = sorted(name for name, _ in typers.values())
+            self._dirty.clear()
+            return changed
+
+    def flush(self, socketio):
+        changed = self.collect()
+        for cid, names in changed.items():
+            socketio.emit('typing_update', {
+                'channel_id': cid,
+                'users': names,
+                'origin': self.origin
+            }, to=cid)
+        return len(changed)
+
+    def ensure_started(self, socketio):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        socketio.start_background_task(self._loop, socketio)
+
+    def _loop(self, socketio):
+        while True:
+            socketio.sleep(self.flush_interval)
+            try:
+                self.flush(socketio)
+            except Exception as e:
+                print(f"[TYPING] Flush failed: {e}")
+
+
+typing_manager = TypingManager()
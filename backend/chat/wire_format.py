@@ -0,0 +1,139 @@
+"""
+wire_format.py
+--------------
+Optional compact encoding for chat messages on the socket.
+
+Legacy ('json') payloads are one dict per message, each repeating the
+sender profile and a date string. The 'compact' format sends
+
+    {'v': 1, 'channel_id': 7,
+     'senders':  [[sender_id, name, pic], ...],
+     'messages': [[message_id, sender_idx, flags, ts, content, file_url, reply_to_id, nonce], ...]}
+
+with integer epoch-second timestamps and Snowflake nonces, packed with
+MessagePack into a binary Socket.IO frame when msgpack is installed (plain
+JSON tuples otherwise). Clients opt in per connection via join_channel
+{'wire': 'compact'}; field order is fixed by SENDER_FIELDS/MESSAGE_FIELDS.
+"""
+
+import calendar
+import datetime
+
+from backend.utils.snowflake import id_timestamp_ms
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+COMPACT_VERSION = 1
+WIRE_FORMATS = ('json', 'compact')
+
+SENDER_FIELDS = ('sender_id', 'name', 'pic')
+MESSAGE_FIELDS = ('message_id', 'sender', 'flags', 'ts', 'content', 'file_url', 'reply_to_id', 'nonce')
+
+FLAG_ME = 1
+FLAG_ANON = 2
+
+
+def fanout_room(channel_id, wire='json'):
+    """receive_message is delivered per format; every other event still uses str(channel_id)."""
+    return f"{channel_id}:{wire}"
+
+def has_subscribers(socketio, room, namespace='/'):
+    """
+    False only when nobody can be in `room`. Room membership is per process,
+    so with a message queue (other workers' sockets are invisible here) the
+    answer is always True.
+    """
+    import socketio as sio
+    server = getattr(socketio, 'server', None)
+    if server is None or isinstance(server.manager, sio.PubSubManager):
+        return True
+    return bool(server.manager.rooms.get(namespace, {}).get(room))
+
+def normalize_wire(value):
+    return value if value in WIRE_FORMATS else 'json'
+
+def to_epoch(value):
+    """datetime (naive = server local, as stored by MySQL) or ISO string -> epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        return calendar.timegm(value.utctimetuple())
+    return int(value.timestamp())
+
+
+class SenderTable:
+    """Interns (sender_id, name, pic) so each sender is sent once per payload."""
+
+    def __init__(self):
+        self._index = {}
+        self.rows = []
+
+    def ref(self, sender_id, name, pic):
+        key = (sender_id, name, pic)
+        idx = self._index.get(key)
+        if idx is None:
+            idx = self._index[key] = len(self.rows)
+            self.rows.append([sender_id, name, pic])
+        return idx
+
+
+def _message_row(senders, m, flags, ts):
+    return [
+        m['message_id'],
+        senders.ref(m.get('sender_id'), m.get('sender_name'), m.get('sender_pic')),
+        flags,
+        ts,
+        m.get('content'),
+        m.get('file_url'),
+        m.get('reply_to_id'),
+        m.get('nonce'),
+    ]
+
+def encode_history(channel_id, messages, my_anon_id=None):
+    """
+    messages: rows from get_channel_messages(format_dates=False), newest first.
+    Returns the compact dict (oldest first, like 'message_history').
+    """
+    senders = SenderTable()
+    rows = []
+    for m in reversed(messages):
+        flags = 0
+        if my_anon_id is not None and m.get('anon_id') == my_anon_id:
+            flags |= FLAG_ME
+        if m.get('sender_type') == 'anon':
+            flags |= FLAG_ANON
+        rows.append(_message_row(senders, m, flags, to_epoch(m.get('created_at'))))
+    return {'v': COMPACT_VERSION, 'channel_id': channel_id, 'senders': senders.rows, 'messages': rows}
+
+def encode_live(payload, me=False):
+    """Compact form of an IngestionService fan-out payload."""
+    profile = payload.get('user_profile') or {}
+    attachment = payload.get('attachment') or {}
+    flags = (FLAG_ME if me else 0) | (FLAG_ANON if payload.get('sender_type') == 'anon' else 0)
+    nonce = payload.get('nonce')
+    # The Snowflake nonce already carries the send time; no date string to parse
+    ts = id_timestamp_ms(nonce) // 1000 if nonce else to_epoch(payload.get('created_at'))
+    senders = SenderTable()
+    row = _message_row(senders, {
+        'message_id': payload['message_id'],
+        'sender_id': payload.get('sender_id'),
+        'sender_name': profile.get('name'),
+        'sender_pic': profile.get('pic'),
+        'content': payload.get('content'),
+        'file_url': attachment.get('url'),
+        'reply_to_id': payload.get('reply_to_id'),
+        'nonce': nonce,
+    }, flags, ts)
+    return {'v': COMPACT_VERSION, 'channel_id': payload.get('channel_id'), 'senders': senders.rows, 'messages': [row]}
+
+def pack(obj):
+    """bytes (sent as a binary Socket.IO attachment) when msgpack is available."""
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(obj, use_bin_type=True)
+    return obj
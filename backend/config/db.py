@@ -8,10 +8,12 @@ Features:
 - Environment variable validation
 - Secure defaults
 - Comprehensive error handling
+- Green (gevent/eventlet) mode: pure-Python driver and a waiting pool
 """
 
 import os
 import logging
+import threading
 from pathlib import Path
 from typing import Optional, Dict, Any
 import mysql.connector
@@ -32,6 +34,9 @@ REQUIRED_ENV_VARS = ['DB_HOST', 'DB_USER', 'DB_PASSWORD', 'DB_NAME', 'DB_PORT']
 # Database connection pool
 _connection_pool: Optional[pooling.MySQLConnectionPool] = None
 
+# Green mode only: one slot per pooled connection (a gevent/eventlet semaphore once patched)
+_pool_slots: Optional[threading.BoundedSemaphore] = None
+
 def validate_environment() -> None:
     """Warn if some environment variables are missing; do not raise."""
     missing_vars = [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
@@ -40,7 +45,7 @@ def validate_environment() -> None:
 
 def get_connection_config() -> Dict[str, Any]:
     """Get database configuration from environment variables."""
-    return {
+    config = {
         "host": os.getenv("DB_HOST", "127.0.0.1"),
         "user": os.getenv("DB_USER", "app_user"),
         # WARNING: Default password is for development only. 
@@ -57,6 +62,45 @@ def get_connection_config() -> Dict[str, Any]:
         "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
         "pool_reset_session": True,
     }
+    if _is_green():
+        # The C extension blocks the whole process; the pure driver yields on socket I/O
+        config["use_pure"] = True
+    return config
+
+def _is_green() -> bool:
+    from backend.async_mode import is_green
+    return is_green()
+
+
+class _SlotConnection:
+    """
+    Pooled connection that returns its semaphore slot on close().
+
+    mysql-connector raises "pool exhausted" immediately when every connection
+    is in use. That is fine for a few threads, but with thousands of greenlets
+    a burst would turn into errors, so in green mode callers wait (up to
+    DB_POOL_TIMEOUT seconds) for a free slot instead.
+    """
+    def __init__(self, conn, slots):
+        self._conn = conn
+        self._slots = slots
+
+    def close(self):
+        try:
+            self._conn.close()
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+                self._slots = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 def init_connection_pool() -> None:
     """Initialize the database connection pool."""
@@ -77,6 +121,9 @@ def init_connection_pool() -> None:
                 **pool_config,
                 **config
             )
+            if _is_green():
+                global _pool_slots
+                _pool_slots = threading.BoundedSemaphore(pool_config['pool_size'])
             logger.info("Database connection pool initialized successfully")
             
         except Error as e:
@@ -98,6 +145,16 @@ def get_connection():
     if _connection_pool is None:
         init_connection_pool()
     
+    if _pool_slots is not None:
+        if not _pool_slots.acquire(timeout=float(os.getenv("DB_POOL_TIMEOUT", 10))):
+            raise RuntimeError("Failed to get database connection (pool busy)")
+        try:
+            return _SlotConnection(_connection_pool.get_connection(), _pool_slots)
+        except Error as e:
+            _pool_slots.release()
+            logger.error(f"Error getting database connection: {e}")
+            raise RuntimeError("Failed to get database connection") from e
+
     try:
         return _connection_pool.get_connection()
     except Error as e:
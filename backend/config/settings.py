@@ -70,3 +70,188 @@ MAX_DAYS_ALLOWED = 7
 
 # Fine charged per extra day (currency unit decided by system)
 FINE_PER_DAY = 5
+
+# ===============================
+# REALTIME (SOCKET.IO) SETTINGS
+# ===============================
+
+# Cross-process message queue used to fan out Socket.IO emits.
+# Empty = single process. Examples:
+#   sqlite:///tmp/ldbms_socketio.db   (local stand-in, no broker needed)
+#   redis://localhost:6379/0
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+
+# Channel name shared by every worker on the queue
+SOCKETIO_QUEUE_CHANNEL = os.getenv("SOCKETIO_QUEUE_CHANNEL", "flask-socketio")
+
+# SQLite queue only: how often listeners poll for new rows (milliseconds)
+SOCKETIO_QUEUE_POLL_MS = int(os.getenv("SOCKETIO_QUEUE_POLL_MS", 5))
+
+# SQLite queue only: how long delivered messages are kept before pruning (seconds)
+SOCKETIO_QUEUE_RETENTION_SEC = int(os.getenv("SOCKETIO_QUEUE_RETENTION_SEC", 60))
+
+# Presence session store. Empty = in-process; sqlite:///path = shared by workers
+PRESENCE_STORE = os.getenv("PRESENCE_STORE", "")
+
+# Sessions without a heartbeat for this long are treated as zombies (seconds)
+PRESENCE_TIMEOUT_SEC = int(os.getenv("PRESENCE_TIMEOUT_SEC", 90))
+
+# How often the zombie sweeper runs (seconds)
+PRESENCE_SWEEP_SEC = int(os.getenv("PRESENCE_SWEEP_SEC", 30))
+
+# Presence changes are coalesced and broadcast at most this often (milliseconds)
+PRESENCE_FLUSH_MS = int(os.getenv("PRESENCE_FLUSH_MS", 2000))
+
+# Rate limiter bucket store. Empty = per-process; sqlite:///path = shared by workers
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "")
+
+# Per-route policy overrides, e.g. "chat:message=5/2,chat:upload=10/60"
+RATE_LIMIT_POLICIES = os.getenv("RATE_LIMIT_POLICIES", "")
+
+# Number of independent lock stripes for the in-memory limiter
+RATE_LIMIT_STRIPES = int(os.getenv("RATE_LIMIT_STRIPES", 64))
+
+# Hard cap on tracked buckets per process (least recently used are evicted)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+# Typing indicators: at most one "who is typing" broadcast per channel per interval (ms)
+TYPING_FLUSH_MS = int(os.getenv("TYPING_FLUSH_MS", 500))
+
+# Typers without a refresh for this long are dropped (seconds)
+TYPING_TTL_SEC = int(os.getenv("TYPING_TTL_SEC", 6))
+
+# Socket.IO metrics: events/sec are averaged over this window (seconds)
+SOCKET_METRICS_WINDOW_SEC = int(os.getenv("SOCKET_METRICS_WINDOW_SEC", 60))
+
+# How often each worker logs a one-line metrics summary (seconds, 0 = never)
+SOCKET_METRICS_LOG_SEC = int(os.getenv("SOCKET_METRICS_LOG_SEC", 300))
+
+# ===============================
+# CHAT SEARCH SETTINGS
+# ===============================
+
+# SQLite FTS5 index file for chat history search (shared by workers on a host)
+CHAT_SEARCH_INDEX_PATH = os.getenv(
+    "CHAT_SEARCH_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "chat_search.db")
+)
+
+# Background indexer: max operations per transaction / max wait before a flush (ms)
+CHAT_SEARCH_BATCH_SIZE = int(os.getenv("CHAT_SEARCH_BATCH_SIZE", 500))
+CHAT_SEARCH_FLUSH_MS = int(os.getenv("CHAT_SEARCH_FLUSH_MS", 250))
+
+# ===============================
+# UPLOAD SETTINGS
+# ===============================
+
+# Root of user uploads served from /static/uploads
+UPLOAD_ROOT = os.getenv(
+    "UPLOAD_ROOT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "static", "uploads")
+)
+
+# Partial / in-flight uploads (kept outside static/ so they are never served)
+UPLOAD_TEMP_DIR = os.getenv(
+    "UPLOAD_TEMP_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "upload_tmp")
+)
+
+# Largest chat attachment accepted (bytes) and largest single chunk of a resumable upload
+CHAT_UPLOAD_MAX_BYTES = int(os.getenv("CHAT_UPLOAD_MAX_BYTES", 25 * 1024 * 1024))
+CHAT_UPLOAD_CHUNK_BYTES = int(os.getenv("CHAT_UPLOAD_CHUNK_BYTES", 4 * 1024 * 1024))
+
+# ===============================
+# IMAGE PIPELINE
+# ===============================
+
+# WebP quality for generated avatar/thumbnail variants (requires Pillow)
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", 80))
+
+# Cache lifetime for immutable upload URLs (content-addressed blobs, variants, timestamped avatars)
+UPLOAD_CACHE_MAX_AGE = int(os.getenv("UPLOAD_CACHE_MAX_AGE", 365 * 24 * 3600))
+
+# ===============================
+# CHAT RETENTION
+# ===============================
+
+# Default for channels without a row in chat_retention_policies:
+# messages older than this many days move to monthly archive tables.
+# 0 (default) keeps them in place, so archiving is opt-in per channel or here.
+CHAT_RETENTION_DAYS = int(os.getenv("CHAT_RETENTION_DAYS", 0))
+
+# Soft-deleted messages are physically removed after this many days
+CHAT_PURGE_DELETED_AFTER_DAYS = int(os.getenv("CHAT_PURGE_DELETED_AFTER_DAYS", 30))
+
+# Rows per archive/purge/delete transaction and pause between batches (ms),
+# so row locks are held briefly and live chat writes interleave
+CHAT_RETENTION_BATCH_SIZE = int(os.getenv("CHAT_RETENTION_BATCH_SIZE", 1000))
+CHAT_RETENTION_PAUSE_MS = int(os.getenv("CHAT_RETENTION_PAUSE_MS", 50))
+
+# ===============================
+# CHAT MODERATION
+# ===============================
+
+# Most messages one bulk moderation call (by user / id range / pattern) deletes
+CHAT_MODERATION_MAX_ROWS = int(os.getenv("CHAT_MODERATION_MAX_ROWS", 5000))
+
+# ===============================
+# AI ASSISTANT
+# ===============================
+
+# Start loading the RAG engine and LLM in the background when a worker boots.
+# Off: they load on the first /member/ai-chat request, which answers
+# "warming up" (HTTP 503) until loading finishes.
+BRAIN_WARMUP_ON_START = os.getenv("BRAIN_WARMUP_ON_START", "false").lower() in ("1", "true", "yes")
+
+# Catalog embedding index (backend/brain/indexer.py): books per page/bulk
+# upsert, texts per encoder forward pass, and how long write-path updates
+# are coalesced before they are embedded
+BRAIN_INDEX_BATCH_SIZE = int(os.getenv("BRAIN_INDEX_BATCH_SIZE", 512))
+BRAIN_ENCODE_BATCH_SIZE = int(os.getenv("BRAIN_ENCODE_BATCH_SIZE", 64))
+BRAIN_INDEX_FLUSH_MS = int(os.getenv("BRAIN_INDEX_FLUSH_MS", 2000))
+
+# Query embeddings kept in the in-memory LRU (document embeddings are cached
+# on disk under backend/brain/data/embedding_cache, keyed by content hash)
+BRAIN_QUERY_CACHE_SIZE = int(os.getenv("BRAIN_QUERY_CACHE_SIZE", 2048))
+
+# Vector store for book embeddings: 'chroma' (ChromaDB) or 'numpy' (memory-
+# mapped VectorIndex under backend/brain/data/vector_index, no chromadb
+# needed). After switching, fill the new store with
+# scripts/migrations/ingest_books.py (cached embeddings make that cheap).
+BRAIN_VECTOR_BACKEND = os.getenv("BRAIN_VECTOR_BACKEND", "chroma").strip().lower()
+
+# Hybrid (BM25 + vector) retriever: the in-memory BM25 index is rebuilt after
+# book writes in this worker, and at least this often (seconds) to pick up
+# changes made by other workers
+BRAIN_RETRIEVER_TTL_SEC = int(os.getenv("BRAIN_RETRIEVER_TTL_SEC", 600))
+
+# Cached LLM answers for AI chat and vibe discovery (backend/brain/response_cache.py).
+# SIMILARITY > 0 (e.g. 0.93) also serves answers to prompts whose embedding is
+# at least that similar to a cached one; 0 means exact (normalized) matches only.
+BRAIN_RESPONSE_CACHE_TTL_SEC = int(os.getenv("BRAIN_RESPONSE_CACHE_TTL_SEC", 3600))
+BRAIN_RESPONSE_CACHE_SIZE = int(os.getenv("BRAIN_RESPONSE_CACHE_SIZE", 1000))
+BRAIN_RESPONSE_CACHE_SIMILARITY = float(os.getenv("BRAIN_RESPONSE_CACHE_SIMILARITY", 0))
+
+# Local model inference (backend/brain/inference.py): generations running at
+# once per worker, requests allowed to wait, how long they wait (seconds),
+# and requests one user may have running or waiting. Beyond these limits
+# /member/ai-chat answers 429 "busy".
+BRAIN_INFERENCE_CONCURRENCY = int(os.getenv("BRAIN_INFERENCE_CONCURRENCY", 2))
+BRAIN_INFERENCE_QUEUE_SIZE = int(os.getenv("BRAIN_INFERENCE_QUEUE_SIZE", 16))
+BRAIN_INFERENCE_QUEUE_TIMEOUT_SEC = float(os.getenv("BRAIN_INFERENCE_QUEUE_TIMEOUT_SEC", 30))
+BRAIN_INFERENCE_PER_USER = int(os.getenv("BRAIN_INFERENCE_PER_USER", 1))
+
+# Non-streaming local prompts arriving within BATCH_WAIT_MS of each other are
+# generated in one pipeline call of up to BATCH_SIZE prompts (in practice at
+# most BRAIN_INFERENCE_CONCURRENCY, since only admitted prompts are batched)
+BRAIN_LOCAL_BATCH_SIZE = int(os.getenv("BRAIN_LOCAL_BATCH_SIZE", 4))
+BRAIN_LOCAL_BATCH_WAIT_MS = int(os.getenv("BRAIN_LOCAL_BATCH_WAIT_MS", 25))
+
+# Vibe discovery sends the LLM only the books retrieved for the vibe (this
+# many) instead of a slice of the whole catalog
+BRAIN_VIBE_PROMPT_BOOKS = int(os.getenv("BRAIN_VIBE_PROMPT_BOOKS", 20))
+
+# Item-item collaborative filtering for dashboard recommendations
+# (backend/brain/item_similarity.py): most similar books stored per book.
+# Rebuilt nightly; run scripts/migrations/build_item_similarity.py for the first build.
+BRAIN_ITEM_SIMILARITY_K = int(os.getenv("BRAIN_ITEM_SIMILARITY_K", 50))
@@ -21,6 +21,7 @@ from flask import (
 
 from backend.repository.db_access import fetch_one, fetch_all, execute_query
 from backend.utils.decorators import admin_required
+from backend.services.image_service import avatar_variant
 from backend.services.user_service import view_users, add_user
 from backend.services.book_service import view_books_paginated, view_books
 from backend.services.issue_service import issue_book, return_book, send_overdue_reminders
@@ -392,6 +393,8 @@ def admin_delete_book(book_id):
     from backend.repository.db_access import execute
     try:
         execute("DELETE FROM books WHERE book_id = %s", (book_id,))
+        from backend.brain.indexer import unindex_books
+        unindex_books([book_id])
         flash("✅ Book deleted successfully!")
     except Exception as e:
         flash(f"❌ Error deleting book: {e}", "error")
@@ -879,7 +882,7 @@ def admin_get_logs_api():
             formatted.append({
                 'id': l['log_id'],
                 'user': l['user_name'] or 'Unknown',
-                'user_pic': l['profile_pic'],
+                'user_pic': avatar_variant(l['profile_pic']),
                 'action': l['action_type'],
                 'details': l['details'],
                 'channel': l['channel_name'] or 'General',
@@ -920,7 +923,8 @@ def admin_delete_chat(channel_id):
         return {"success": False, "error": "Cannot delete Global Community"}, 403
         
     try:
-        execute("DELETE FROM chat_messages WHERE channel_id = %s", (channel_id,))
+        from backend.services.retention_service import delete_channel_history
+        delete_channel_history(channel_id)
         execute("DELETE FROM dm_participants WHERE channel_id = %s", (channel_id,))
         execute("DELETE FROM chat_invitations WHERE target_channel_id = %s", (channel_id,))
         execute("DELETE FROM channels WHERE channel_id = %s", (channel_id,))
@@ -928,16 +932,37 @@ def admin_delete_chat(channel_id):
     except Exception as e:
         return {"success": False, "error": str(e)}, 500
 
+@admin_bp.route("/admin/api/chat/retention/<int:channel_id>", methods=["GET", "POST"])
+@admin_required
+def admin_chat_retention(channel_id):
+    """
+    GET: effective retention policy for a channel.
+    POST {retain_days, action}: archive/delete messages older than retain_days (0 = keep forever).
+    """
+    from backend.services.retention_service import get_policy, set_policy
+    try:
+        if request.method == "POST":
+            data = request.json or {}
+            set_policy(channel_id, data.get('retain_days', 0), data.get('action', 'archive'))
+        return {"success": True, "policy": get_policy(channel_id)}
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+    except Exception as e:
+        return {"success": False, "error": str(e)}, 500
+
 @admin_bp.route("/admin/api/chat/wipe", methods=["POST"])
 @admin_required
 def admin_wipe_chats():
     """
     DANGER: Wipes all chat data except Global Community (ID 1).
     """
-    from backend.repository.db_access import execute
+    from backend.repository.db_access import execute, fetch_all
+    from backend.services.retention_service import delete_messages_chunked, delete_archived_channel
     try:
-        # 1. Delete messages from non-global channels
-        execute("DELETE FROM chat_messages WHERE channel_id != 1")
+        # 1. Delete messages from non-global channels (batched: one huge DELETE locks the table)
+        delete_messages_chunked("channel_id != %s", (1,))
+        for seg in fetch_all("SELECT DISTINCT channel_id FROM chat_archive_segments WHERE channel_id != 1"):
+            delete_archived_channel(seg['channel_id'])
         
         # 2. Delete invitations
         execute("DELETE FROM chat_invitations")
@@ -962,6 +987,27 @@ def admin_wipe_chats():
 
 
 
+@admin_bp.route("/admin/api/metrics/socketio")
+@admin_required
+def admin_socketio_metrics():
+    """
+    Socket.IO metrics of the worker serving this request: handler duration
+    histograms, events/sec by type, ingestion stage timings, emit queue size.
+    """
+    from backend.chat.metrics import socket_metrics
+    return {"success": True, "metrics": socket_metrics.snapshot()}
+
+@admin_bp.route("/admin/api/metrics/ai")
+@admin_required
+def admin_ai_metrics():
+    """
+    AI assistant state of the worker serving this request: model loading,
+    embedding cache and response cache hit rates.
+    """
+    from backend.brain.orchestrator import brain
+    from backend.brain.response_cache import vibe_response_cache
+    return {"success": True, "metrics": dict(brain.status(), vibe_response_cache=vibe_response_cache.stats())}
+
 @admin_bp.route("/admin/system/health")
 @admin_required
 def admin_health_view():
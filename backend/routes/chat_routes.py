@@ -3,6 +3,8 @@ from backend.middleware.auth import member_required
 from backend.services.guild_service import get_my_guilds, create_guild, get_guild_details
 from backend.services.channel_service import create_channel, get_channel_messages
 from backend.services.social_service import get_friends_list
+from backend.services.image_service import avatar_variant
+from backend.services import moderation_service
 
 chat_bp = Blueprint('chat_bp', __name__)
 
@@ -102,6 +104,16 @@ def get_conversations_route():
             'public_id': 1000000000 + pg['channel_id']
         })
 
+    # 5. Unread badges (counter subtraction, one query for every channel)
+    from backend.services.read_state_service import get_unread_counts
+    all_items = formatted_dms + formatted_public + formatted_groups
+    try:
+        unread = get_unread_counts(user_id, {item['channel_id'] for item in all_items})
+    except Exception:
+        unread = {}  # Read-state tables not set up yet
+    for item in all_items:
+        item['unread'] = unread.get(item['channel_id'], 0)
+
     return jsonify({
         'success': True,
         'conversations': {
@@ -114,13 +126,17 @@ def get_conversations_route():
 @member_required
 def create_dm_route():
     from backend.services.channel_service import create_dm
-    data = request.json
+    data = request.json or {}
     target_id = data.get('target_id')
     
     if not target_id:
         return jsonify({'error': 'Target ID required'}), 400
         
-    cid = create_dm(session['user_id'], target_id)
+    try:
+        cid = create_dm(session['user_id'], target_id)
+    except (ValueError, TypeError) as e:
+        # Self-DM, or a target_id that is not a user id
+        return jsonify({'error': str(e)}), 400
     return jsonify({'success': True, 'channel_id': cid})
 
 
@@ -155,12 +171,37 @@ def route_create_channel():
 @chat_bp.route('/channels/<int:channel_id>/messages', methods=['GET'])
 @member_required
 def route_get_messages(channel_id):
+    # ?before=<message_id> pages back through history, including archived months
+    from backend.services.chat_search_service import can_read_channel
+    if not can_read_channel(session['user_id'], channel_id):
+        return jsonify({'error': 'Access denied'}), 403
+    before_id = request.args.get('before', type=int)
+    limit = min(request.args.get('limit', 50, type=int), 200)
     try:
-        msgs = get_channel_messages(channel_id)
+        msgs = get_channel_messages(channel_id, limit=limit, before_id=before_id)
         return jsonify({'success': True, 'messages': msgs})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@chat_bp.route('/search', methods=['GET'])
+@member_required
+def route_search_messages():
+    """Ranked full-text search over messages in channels the user can read."""
+    from backend.services.chat_search_service import search_messages
+    q = request.args.get('q', '').strip()
+    if len(q) < 2:
+        return jsonify({'error': 'Query too short'}), 400
+    try:
+        results = search_messages(
+            session['user_id'], q,
+            channel_id=request.args.get('channel_id', type=int),
+            limit=min(request.args.get('limit', 20, type=int), 50),
+            offset=max(request.args.get('offset', 0, type=int), 0)
+        )
+        return jsonify({'success': True, 'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @chat_bp.route('/join/<int:channel_id>', methods=['POST'])
 @member_required
 def route_join_channel(channel_id):
@@ -260,39 +301,77 @@ def route_update_channel(channel_id):
 @chat_bp.route('/upload', methods=['POST'])
 @member_required
 def upload_chat_file():
-    """Handle chat file/image uploads."""
+    """Handle chat file/image uploads (single request, content-addressed)."""
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
-    import os
-    import uuid
-    from werkzeug.utils import secure_filename
-    
-    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
-    allowed_exts = ['.jpg', '.jpeg', '.png', '.gif', '.pdf', '.txt', '.csv', '.doc', '.docx']
+    from backend.services.file_service import allowed_file, store_file_storage, IMAGE_EXTENSIONS, UploadTooLarge
+    from backend.services.image_service import process_attachment
     
-    if ext not in allowed_exts:
+    if not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file type.'}), 400
-        
-    unique_name = f"chat_{uuid.uuid4().hex[:8]}{ext}"
-    save_dir = os.path.join(current_app.static_folder, 'uploads', 'chat_files')
-    os.makedirs(save_dir, exist_ok=True)
-    file_path = os.path.join(save_dir, unique_name)
-    file.save(file_path)
     
-    file_url = f"uploads/chat_files/{unique_name}"
+    try:
+        # Streamed to disk while hashing; identical files share one blob
+        blob = store_file_storage(file, session['user_id'])
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     
+    is_image = blob['ext'] in IMAGE_EXTENSIONS
     return jsonify({
         'success': True, 
-        'url': file_url, 
+        'url': blob['path'], 
+        'thumb_url': process_attachment(blob['path']) if is_image else None,
         'filename': file.filename, 
-        'ext': ext,
-        'is_image': ext in ['.jpg', '.jpeg', '.png', '.gif']
+        'ext': f".{blob['ext']}",
+        'is_image': is_image
     })
 
+# --- Resumable (chunked) uploads ---
+def _upload_response(result):
+    result['success'] = True
+    return jsonify(result)
+
+@chat_bp.route('/uploads', methods=['POST'])
+@member_required
+def route_create_upload():
+    """Starts a resumable upload. Sending 'sha256' lets duplicates complete instantly."""
+    from backend.services.upload_service import create_upload, UploadError
+    from backend.utils.rate_limiter import check_rate_limit
+    if not check_rate_limit(f"rate:upload:user:{session['user_id']}", policy='chat:upload'):
+        return jsonify({'error': 'Too many uploads, slow down.'}), 429
+    data = request.json or {}
+    try:
+        return _upload_response(create_upload(session['user_id'], data.get('filename'), data.get('size'), data.get('sha256')))
+    except UploadError as e:
+        return jsonify({'error': str(e), **e.extra}), e.status
+
+@chat_bp.route('/uploads/<upload_id>', methods=['GET'])
+@member_required
+def route_upload_status(upload_id):
+    """Current offset, used by the client to resume after a dropped connection."""
+    from backend.services.upload_service import get_upload_status, UploadError
+    try:
+        return _upload_response(get_upload_status(session['user_id'], upload_id))
+    except UploadError as e:
+        return jsonify({'error': str(e), **e.extra}), e.status
+
+@chat_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@member_required
+def route_upload_chunk(upload_id):
+    """Raw chunk body at ?offset=N; the final chunk returns the stored file."""
+    from backend.services.upload_service import append_chunk, UploadError
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset required'}), 400
+    try:
+        return _upload_response(append_chunk(session['user_id'], upload_id, offset, request.stream))
+    except UploadError as e:
+        return jsonify({'error': str(e), **e.extra}), e.status
+
 @chat_bp.route('/channels/<int:channel_id>', methods=['DELETE'])
 @member_required
 def route_delete_channel(channel_id):
@@ -315,7 +394,10 @@ def route_delete_channel(channel_id):
     if not (is_system_admin or is_channel_creator or is_channel_admin):
         return jsonify({'success': False, 'error': 'Only admins or channel creators can delete channels'}), 403
     
-    execute("DELETE FROM chat_messages WHERE channel_id = %s", (channel_id,))
+    # Batched (short locks); also releases attachment blobs and archived history
+    from backend.services.retention_service import delete_channel_history
+    delete_channel_history(channel_id)
+
     execute("DELETE FROM dm_participants WHERE channel_id = %s", (channel_id,))
     execute("DELETE FROM channels WHERE channel_id = %s", (channel_id,))
     return jsonify({'success': True})
@@ -369,6 +451,52 @@ def route_kick_member(channel_id, target_user_id):
 
     return jsonify({'success': True, 'message': 'Member kicked successfully'})
 
+# --- Bulk Moderation (channel admins, creators, site admins; others only hit their own messages) ---
+def _bulk_moderate(channel_id, action, run):
+    """Shared wrapper: rate limit, run(user_id, is_site_admin, data) -> deleted ids, audit log."""
+    from backend.utils.rate_limiter import check_rate_limit
+    user_id = session['user_id']
+    if not check_rate_limit(f"rate:moderation:user:{user_id}", policy='chat:moderation'):
+        return jsonify({'success': False, 'error': 'Too many moderation requests, slow down.'}), 429
+    try:
+        ids = run(user_id, session.get('role') == 'admin', request.json or {})
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if ids:
+        log_audit_action(channel_id, user_id, action, f"Deleted {len(ids)} messages ({ids[0]}..{ids[-1]})")
+    return jsonify({'success': True, 'deleted': len(ids), 'message_ids': ids})
+
+@chat_bp.route('/channels/<int:channel_id>/moderation/delete-user', methods=['POST'])
+@member_required
+def route_moderation_delete_user(channel_id):
+    """{user_id, since_minutes?}: delete a member's messages in this channel."""
+    def run(user_id, is_site_admin, data):
+        if not data.get('user_id'):
+            raise ValueError("user_id required")
+        return moderation_service.delete_user_messages(
+            user_id, is_site_admin, channel_id, int(data['user_id']), data.get('since_minutes'))
+    return _bulk_moderate(channel_id, "BULK_DELETE_USER", run)
+
+@chat_bp.route('/channels/<int:channel_id>/moderation/delete-range', methods=['POST'])
+@member_required
+def route_moderation_delete_range(channel_id):
+    """{from_id, to_id}: delete every message in an id range (inclusive)."""
+    def run(user_id, is_site_admin, data):
+        if not data.get('from_id') or not data.get('to_id'):
+            raise ValueError("from_id and to_id required")
+        return moderation_service.delete_message_range(
+            user_id, is_site_admin, channel_id, data['from_id'], data['to_id'])
+    return _bulk_moderate(channel_id, "BULK_DELETE_RANGE", run)
+
+@chat_bp.route('/channels/<int:channel_id>/moderation/purge', methods=['POST'])
+@member_required
+def route_moderation_purge(channel_id):
+    """{pattern, regex?}: delete messages containing (or, with regex, matching) a pattern."""
+    def run(user_id, is_site_admin, data):
+        return moderation_service.purge_by_pattern(
+            user_id, is_site_admin, channel_id, data.get('pattern'), bool(data.get('regex')))
+    return _bulk_moderate(channel_id, "BULK_PURGE_PATTERN", run)
+
 # --- Channel Members ---
 @chat_bp.route('/channels/<int:channel_id>/members', methods=['GET'])
 @member_required
@@ -421,7 +549,7 @@ def route_get_channel_members(channel_id):
             members.append({
                 'user_id': p['user_id'],
                 'name': p['name'],
-                'profile_pic': p['profile_pic'] or 'default.jpg',
+                'profile_pic': avatar_variant(p['profile_pic']),
                 'role': p.get('channel_role') or p['role'], # Prefer channel role (admin) if set, else global role
                 'is_owner': p['user_id'] == channel_creator
             })
@@ -439,7 +567,7 @@ def route_get_channel_members(channel_id):
             members.append({
                 'user_id': m['user_id'],
                 'name': m['name'],
-                'profile_pic': m['profile_pic'] or 'default.jpg',
+                'profile_pic': avatar_variant(m['profile_pic']),
                 'role': m['role'], # Guild role
                 'is_owner': m.get('role') == 'owner'
             })
@@ -453,6 +581,12 @@ def route_get_channel_members(channel_id):
                 is_admin = True
                 break
 
+    # Initial presence; the page keeps it current from 'presence_update' events
+    from backend.services.presence_service import PresenceService
+    online = set(PresenceService.get_online_users())
+    for m in members:
+        m['online'] = m['user_id'] in online
+
     return jsonify({'success': True, 'members': members, 'is_owner': is_current_user_owner, 'is_admin': is_admin})
 
 # --- Member Management ---
@@ -557,7 +691,6 @@ def route_update_channel_settings(channel_id):
     channel = fetch_one("SELECT * FROM channels WHERE channel_id = %s", (channel_id,))
     if not channel:
         if channel_id == 1:
-            from backend.repository.db_access import execute
             execute("INSERT IGNORE INTO channels (channel_id, name, type) VALUES (1, 'Global Community', 'public')")
             channel = {'channel_id': 1, 'name': 'Global Community', 'created_by': None, 'is_private': False, 'guild_id': None}
         else:
@@ -748,34 +881,25 @@ def route_upload_file():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
-    import os
-    import uuid
-    from werkzeug.utils import secure_filename
-    
-    ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'zip'}
-    def allowed_file(filename):
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    from backend.services.file_service import save_chat_file, file_extension, IMAGE_EXTENSIONS, UploadTooLarge
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        ext = filename.rsplit('.', 1)[1].lower()
-        unique_name = f"{uuid.uuid4().hex}.{ext}"
-        
-        # Save to static/uploads/chat using Flask's configured static folder
-        save_dir = os.path.join(current_app.static_folder, 'uploads', 'chat')
-        os.makedirs(save_dir, exist_ok=True)
-        
-        save_path = os.path.join(save_dir, unique_name)
-        file.save(save_path)
-        
-        return jsonify({
-            'success': True, 
-            'file_path': f"/static/uploads/chat/{unique_name}", 
-            'filename': filename,
-            'type': 'image' if ext in ['png', 'jpg', 'jpeg', 'gif'] else 'file'
-        })
-        
-    return jsonify({'error': 'File type not allowed'}), 400
+    try:
+        path = save_chat_file(file)
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError:
+        return jsonify({'error': 'File type not allowed'}), 400
+
+    from backend.services.image_service import process_attachment
+    ext = file_extension(file.filename)
+    thumb = process_attachment(path) if ext in IMAGE_EXTENSIONS else None
+    return jsonify({
+        'success': True, 
+        'file_path': f"/static/{path}", 
+        'thumb_path': f"/static/{thumb}" if thumb else None,
+        'filename': file.filename,
+        'type': 'image' if ext in IMAGE_EXTENSIONS else 'file'
+    })
 
 # ==========================================
 # RULES & LOGS IMPLEMENTATION
@@ -843,7 +967,6 @@ def route_update_rules(channel_id):
         if channel_id == 1:
             channel = {'created_by': None}
             # Ensures channel exists so we can update rules
-            from backend.repository.db_access import execute
             execute("INSERT IGNORE INTO channels (channel_id, name, type) VALUES (1, 'Global Community', 'public')")
         else:
             return jsonify({'error': 'Channel not found'}), 404
@@ -727,6 +727,10 @@ def upload_profile_pic():
             # Update session too so layout updates immediately
             session['profile_pic'] = db_path
             
+            # Thumbnail/WebP variants are generated in the background
+            from backend.services.image_service import process_avatar
+            process_avatar(db_path)
+            
             flash("✅ Profile picture updated!", "success")
         except Exception as e:
             flash(f"❌ Upload failed: {str(e)}", "error")
@@ -781,9 +785,22 @@ def member_ai_chat():
         
         if not user_message:
             return jsonify({"error": "Empty message"}), 400
+
+        # Never block a worker on model loading: start it and ask the client to retry
+        if not brain.is_ready():
+            brain.warm_up()
+            return jsonify({
+                "warming_up": True,
+                "response": "The assistant is warming up. Please try again in a few seconds.",
+                "status": brain.status()
+            }), 503, {"Retry-After": "5"}
             
-        # Process with Brain (LLM + RAG)
-        ai_response = brain.process_message(user_message, history)
+        # Process with Brain (LLM + RAG); the local model sheds load when saturated
+        from backend.brain.inference import InferenceBusy
+        try:
+            ai_response = brain.process_message(user_message, history, user_id=session.get("user_id"))
+        except InferenceBusy as e:
+            return _ai_busy_response(e)
         
         return jsonify({
             "response": ai_response,
@@ -798,6 +815,73 @@ def member_ai_chat():
     )
 
 
+def _ai_busy_response(error):
+    return jsonify({
+        "busy": True,
+        "response": str(error),
+        "retry_after": error.retry_after
+    }), 429, {"Retry-After": str(error.retry_after)}
+
+
+@member_bp.route("/ai-chat/stream", methods=["POST"])
+@member_required
+def member_ai_chat_stream():
+    """
+    Same request as POST /member/ai-chat, but the answer arrives as
+    Server-Sent Events while the model generates it:
+        data: {"token": "..."}                    (repeated)
+        event: done\ndata: {"response": "..."}   (full text)
+    If the client disconnects, generation is cancelled.
+    """
+    import threading
+    from flask import Response
+    from backend.brain.inference import InferenceBusy
+    from backend.brain.orchestrator import brain
+
+    data = request.json or {}
+    user_message = data.get("message")
+    history = data.get("history", [])
+    if not user_message:
+        return jsonify({"error": "Empty message"}), 400
+
+    if not brain.is_ready():
+        brain.warm_up()
+        return jsonify({
+            "warming_up": True,
+            "response": "The assistant is warming up. Please try again in a few seconds.",
+            "status": brain.status()
+        }), 503, {"Retry-After": "5"}
+
+    # Queue for the local model before the response starts, so "busy" can still be a 429
+    user_id = session.get("user_id")
+    try:
+        slot = brain.reserve(user_id)
+    except InferenceBusy as e:
+        return _ai_busy_response(e)
+
+    cancel = threading.Event()
+    stream = brain.stream_message(user_message, history, cancel, user_id=user_id, slot=slot)
+
+    def events():
+        pieces = []
+        try:
+            for piece in stream:
+                pieces.append(piece)
+                yield f"data: {json.dumps({'token': piece})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'response': ''.join(pieces)})}\n\n"
+        finally:
+            # Runs when the server closes the response, including after a disconnect
+            cancel.set()
+            stream.close()
+
+    response = Response(events(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    if slot:
+        # Also covers a client that left before the first chunk was pulled
+        response.call_on_close(slot.release)
+    return response
+
+
 @member_bp.route("/waitlist/join", methods=["POST"])
 @member_required
 def join_waitlist_route():
@@ -16,6 +16,19 @@ def start_scheduler():
     from backend.services.report_service import generate_weekly_report
     scheduler.add_job(func=generate_weekly_report, trigger="cron", day_of_week="mon", hour=9, minute=0)
     
+    # Nightly chat retention: archive/delete per channel policy, purge soft-deleted rows
+    from backend.services.retention_service import run_retention
+    scheduler.add_job(func=run_retention, trigger="cron", hour=2, minute=30)
+    
+    # Nightly upload cleanup: unreferenced blobs and abandoned partial uploads
+    from backend.services.file_service import gc_blobs, gc_temp_files
+    scheduler.add_job(func=gc_blobs, trigger="cron", hour=3, minute=0)
+    scheduler.add_job(func=gc_temp_files, trigger="cron", hour=3, minute=15)
+    
+    # Nightly recommendation model: item-item similarities from issues, wishlist and reviews
+    from backend.brain.item_similarity import item_similarity
+    scheduler.add_job(func=item_similarity.build, trigger="cron", hour=3, minute=30)
+    
     scheduler.start()
     print("[SCHEDULER] Started. Automated emails will be sent daily at 10:00 AM.")
     
@@ -4,6 +4,21 @@
 from backend.repository.db_access import fetch_all
 import re
 
+
+def _books_in_order(book_ids):
+    """Full book rows (with author_name) for book_ids, in the given order."""
+    if not book_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(book_ids))
+    rows = fetch_all(f"""
+        SELECT b.*, a.name as author_name
+        FROM books b
+        LEFT JOIN authors a ON b.author_id = a.author_id
+        WHERE b.book_id IN ({placeholders})
+    """, tuple(book_ids))
+    by_id = {r['book_id']: r for r in rows}
+    return [by_id[i] for i in book_ids if i in by_id]
+
 def recommend_books_by_mood(user_text):
     """
     A local, rule-based AI that interprets user mood and recommends books.
@@ -54,35 +69,38 @@ def recommend_books_by_mood(user_text):
             detected_categories.update(categories)
             
     # If no moods detected, check for direct category mentions
+    from backend.brain.retriever import retriever
     if not detected_categories:
-        all_cats = fetch_all("SELECT DISTINCT category FROM books")
-        for c in all_cats:
-            cat_name = c['category'].lower()
+        for category in retriever.categories():
+            cat_name = category.lower()
             if cat_name in user_text:
-                detected_categories.add(c['category'])
+                detected_categories.add(category)
                 detected_moods.append(f"interested in {cat_name}")
 
-    # 3. Query Database
+    # 3. Query the catalog (in-memory index; no per-request scans)
     if not detected_categories:
+        # No mood words: the text may still describe a topic, title or author
+        hits = retriever.search(user_text, k=6)
+        if hits:
+            return {
+                "moods": ["curious"],
+                "message": "Here's what I found in our collection for that:",
+                "books": _books_in_order([h['book_id'] for h in hits])
+            }
         # Fallback: Random "Surprise Me" selection
         return {
             "moods": ["indifferent", "open-minded"],
             "message": "I couldn't quite catch your specific mood, so here are some popular picks from our collection!",
-            "books": fetch_all("SELECT * FROM books ORDER BY RAND() LIMIT 5")
+            "books": _books_in_order([b['book_id'] for b in retriever.sample(5)])
         }
     
-    # Format categories for SQL
-    placeholders = ', '.join(['%s'] * len(detected_categories))
-    query = f"""
-        SELECT b.*, a.name as author_name 
-        FROM books b
-        LEFT JOIN authors a ON b.author_id = a.author_id
-        WHERE LOWER(b.category) IN ({placeholders})
-        ORDER BY RAND()
-        LIMIT 6
-    """
-    
-    books = fetch_all(query, tuple(detected_categories))
+    # Rank books in the detected categories against the user's own words,
+    # topped up with a random draw from the mood's candidate pool
+    picks = [h['book_id'] for h in retriever.search(user_text, k=6, categories=detected_categories)]
+    if len(picks) < 6:
+        extra = [b['book_id'] for b in retriever.sample(12, categories=detected_categories) if b['book_id'] not in picks]
+        picks += extra[:6 - len(picks)]
+    books = _books_in_order(picks)
     
     return {
         "moods": detected_moods,
@@ -47,6 +47,9 @@ def add_book(title, author_id, category, total_copies, pdf_src=None, series_id=N
         (title, author_id, category, total_copies, total_copies, pdf_src, series_id, series_order)
     )
 
+    from backend.brain.indexer import index_books
+    index_books([book_id])
+
     return book_id
 
 
@@ -79,6 +82,9 @@ def update_book(book_id, title, author_id, category, total_copies, series_id=Non
         (title, author_id, category, total_copies, new_available, series_id, series_order, book_id)
     )
 
+    from backend.brain.indexer import index_books
+    index_books([book_id])
+
     return "Book updated successfully"
 
 
@@ -197,6 +203,9 @@ def delete_book(book_id: int):
     if affected == 0:
         return "Book not found"
 
+    from backend.brain.indexer import unindex_books
+    unindex_books([book_id])
+
     # Confirm deletion
     return "Book deleted successfully"
 
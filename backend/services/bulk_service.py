@@ -29,6 +29,7 @@ def import_books_csv(stream):
         reader = csv.DictReader(io.StringIO(data))
         
         imported_count = 0
+        imported_ids = []
         errors = []
         
         for row in reader:
@@ -41,16 +42,20 @@ def import_books_csv(stream):
                 if not title or not author:
                     continue
                 
-                execute(
+                book_id = execute(
                     """
                     INSERT INTO books (title, author, category, copies, available_copies)
                     VALUES (%s, %s, %s, %s, %s)
                     """,
                     (title, author, category, copies, copies)
                 )
+                imported_ids.append(book_id)
                 imported_count += 1
             except Exception as e:
                 errors.append(f"Row {reader.line_num}: {str(e)}")
+
+        from backend.brain.indexer import index_books
+        index_books(imported_ids)
         
         return {
             "success": True, 
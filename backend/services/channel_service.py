@@ -1,5 +1,7 @@
 from backend.repository.db_access import execute, fetch_one, fetch_all, get_connection
 from backend.services.chat_service import get_or_create_anon_id
+from backend.services.read_state_service import bump_channel_counter
+from backend.services.image_service import image_variant, avatar_variant
 
 def create_channel(guild_id, category_id, name, type='text', topic=None, is_private=False, creator_id=None):
     """Creates a new channel in a guild or global."""
@@ -14,8 +16,12 @@ def create_channel(guild_id, category_id, name, type='text', topic=None, is_priv
         
     return cid
 
-def get_channel_messages(channel_id, limit=50):
-    """Fetches messages for a channel with user profile data."""
+def get_channel_messages(channel_id, limit=50, format_dates=True, before_id=None):
+    """
+    Fetches messages for a channel with user profile data, newest first.
+    Paging with before_id continues into the monthly archive tables once the
+    live table runs out (see retention_service).
+    """
     messages = fetch_all("""
         SELECT 
             m.message_id, m.message_text as content, m.file_url, m.sent_at as created_at, m.sender_type,
@@ -24,22 +30,32 @@ def get_channel_messages(channel_id, limit=50):
         FROM chat_messages m
         LEFT JOIN chat_anon_id ca ON m.anon_id = ca.anon_id
         LEFT JOIN users u ON ca.user_id = u.user_id
-        WHERE m.channel_id = %s AND m.is_deleted = FALSE
-        ORDER BY m.sent_at DESC LIMIT %s
-    """, (channel_id, limit))
+        WHERE m.channel_id = %s AND m.is_deleted = FALSE AND (%s IS NULL OR m.message_id < %s)
+        ORDER BY m.message_id DESC LIMIT %s
+    """, (channel_id, before_id, before_id, limit))
+
+    if len(messages) < limit:
+        from backend.services.retention_service import get_archived_messages
+        oldest = messages[-1]['message_id'] if messages else before_id
+        try:
+            messages.extend(get_archived_messages(channel_id, oldest, limit - len(messages)))
+        except Exception as e:
+            print(f"[WARN] Archive read failed: {e}")
     
     # Format dates and handle anonymity for JSON
     for msg in messages:
-        if msg['created_at']:
+        if msg['created_at'] and format_dates:
             msg['created_at'] = msg['created_at'].strftime("%Y-%m-%d %H:%M:%S")
         
         # Structure Attachment
         if msg['file_url']:
             import os
             ext = os.path.splitext(msg['file_url'])[1].lower()
+            is_image = ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']
             msg['attachment'] = {
                 'url': msg['file_url'],
-                'type': 'image' if ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp'] else 'file',
+                'thumb_url': image_variant(msg['file_url'], 'thumb') if is_image else None,
+                'type': 'image' if is_image else 'file',
                 'name': os.path.basename(msg['file_url'])
             }
         else:
@@ -52,6 +68,8 @@ def get_channel_messages(channel_id, limit=50):
             msg['sender_pic'] = 'default.jpg'
             msg['sender_id'] = None # Hide real ID
             msg['sender_type'] = 'anon'
+        else:
+            msg['sender_pic'] = avatar_variant(msg['sender_pic'])
             
     return messages
 
@@ -67,10 +85,25 @@ def save_message(user_id, channel_id, text=None, file_url=None, reply_to_id=None
     if text is None:
         text = ""
 
-    msg_id = execute("""
-        INSERT INTO chat_messages (channel_id, anon_id, message_text, file_url, reply_to_id, sender_type)
-        VALUES (%s, %s, %s, %s, %s, %s)
-    """, (channel_id, anon_id, text, file_url, reply_to_id, sender_type))
+    # The counter bump and the insert commit together, so every message has
+    # its channel_seq and unread counters stay O(1) (see read_state_service)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        seq = bump_channel_counter(cursor, channel_id)
+        cursor.execute("""
+            INSERT INTO chat_messages (channel_id, anon_id, message_text, file_url, reply_to_id, sender_type, channel_seq)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (channel_id, anon_id, text, file_url, reply_to_id, sender_type, seq))
+        msg_id = cursor.lastrowid
+        cursor.execute("UPDATE channel_counters SET last_message_id = %s WHERE channel_id = %s", (msg_id, channel_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
     
     # Return full message object for socket broadcast
     return {
@@ -99,27 +132,58 @@ def get_my_dms(user_id):
         ORDER BY c.created_at DESC
     """, (user_id, user_id))
 
+def dm_pair(user_a, user_b):
+    """Canonical (user_low, user_high) key for a DM between two users."""
+    a, b = int(user_a), int(user_b)
+    return (a, b) if a < b else (b, a)
+
+def get_dm_channel(user_id, target_user_id):
+    """Existing DM channel between two users (primary-key read on dm_pairs) or None."""
+    row = fetch_one(
+        "SELECT channel_id FROM dm_pairs WHERE user_low = %s AND user_high = %s",
+        dm_pair(user_id, target_user_id)
+    )
+    return row['channel_id'] if row else None
+
 def create_dm(user_id, target_user_id):
-    """Creates or Retrieves a DM channel."""
-    # Check if exists
-    # (Complex SQL to find intersection of channel_ids for both users)
-    existing = fetch_one("""
-        SELECT c.channel_id 
-        FROM channels c
-        JOIN dm_participants dp1 ON c.channel_id = dp1.channel_id
-        JOIN dm_participants dp2 ON c.channel_id = dp2.channel_id
-        WHERE c.guild_id IS NULL 
-        AND dp1.user_id = %s 
-        AND dp2.user_id = %s
-    """, (user_id, target_user_id))
-    
-    if existing: return existing['channel_id']
-    
-    # Create
-    cid = execute("INSERT INTO channels (name, type, is_private) VALUES ('DM', 'text', TRUE)")
-    
-    # Add Participants
-    execute("INSERT INTO dm_participants (channel_id, user_id) VALUES (%s, %s)", (cid, user_id))
-    execute("INSERT INTO dm_participants (channel_id, user_id) VALUES (%s, %s)", (cid, target_user_id))
-    
-    return cid
+    """
+    Creates or Retrieves a DM channel.
+    The dm_pairs row is claimed in the same transaction that creates the
+    channel; a concurrent creator hits the duplicate key, rolls back and
+    returns the winner's channel.
+    """
+    low, high = dm_pair(user_id, target_user_id)
+    if low == high:
+        raise ValueError("You cannot DM yourself")
+
+    existing = get_dm_channel(low, high)
+    if existing:
+        return existing
+
+    import mysql.connector
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO channels (name, type, is_private) VALUES ('DM', 'text', TRUE)")
+        cid = cursor.lastrowid
+        # Blocks on the pair key while another creator's transaction is open
+        cursor.execute(
+            "INSERT INTO dm_pairs (user_low, user_high, channel_id) VALUES (%s, %s, %s)",
+            (low, high, cid)
+        )
+        cursor.executemany(
+            "INSERT INTO dm_participants (channel_id, user_id) VALUES (%s, %s)",
+            [(cid, low), (cid, high)]
+        )
+        conn.commit()
+        return cid
+    except mysql.connector.Error as err:
+        conn.rollback()
+        if err.errno != 1062:  # Duplicate entry: lost the race
+            raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return get_dm_channel(low, high)
@@ -0,0 +1,284 @@
+"""
+chat_search_service.py
+----------------------
+Full-text search over chat history.
+
+- Inverted index: SQLite FTS5 file (CHAT_SEARCH_INDEX_PATH), ranked with
+  BM25 and returning snippets. Shared by every worker on the host.
+- Off the hot path: IngestionService only enqueues; a background thread
+  applies index updates in batches. A catch-up sync from MySQL fills any gap
+  (first run, restarts, messages written by other code paths).
+- Results are scoped to channels the user can read and re-validated against
+  MySQL (deleted messages and anonymity rules are applied at read time).
+"""
+
+import html
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from backend.config.settings import (
+    CHAT_SEARCH_INDEX_PATH,
+    CHAT_SEARCH_BATCH_SIZE,
+    CHAT_SEARCH_FLUSH_MS,
+)
+from backend.repository.db_access import fetch_all, fetch_one
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Private markers so snippets can be HTML-escaped before <mark> is added
+_HL_START, _HL_END = "\x02", "\x03"
+
+
+def _plain_text(text):
+    """Messages may carry inline HTML for attachments; index only the words."""
+    return html.unescape(_TAG_RE.sub(" ", text or "")).strip()
+
+
+def build_match_query(raw):
+    """
+    Turns user input into a safe FTS5 query: every word must match,
+    the last word also matches as a prefix (search-as-you-type).
+    """
+    tokens = _TOKEN_RE.findall((raw or "").lower())[:8]
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens[:-1]]
+    terms.append(f'"{tokens[-1]}"*')
+    return " ".join(terms)
+
+
+class ChatSearchIndex:
+    """
+    FTS5 table chat_fts(body, channel_id UNINDEXED) with rowid = message_id.
+    """
+
+    def __init__(self, path=CHAT_SEARCH_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(
+                    body, channel_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+                );
+                CREATE TABLE IF NOT EXISTS chat_fts_meta (
+                    key TEXT PRIMARY KEY, value INTEGER NOT NULL
+                );
+            """)
+            self._local.conn = conn
+        return conn
+
+    # -------------------------------
+    # WRITE SIDE (background)
+    # -------------------------------
+    def enqueue_upsert(self, message_id, channel_id, text):
+        self._ensure_started()
+        self._queue.put(('upsert', int(message_id), int(channel_id), text))
+
+    def enqueue_delete(self, message_ids):
+        self._ensure_started()
+        for mid in message_ids:
+            self._queue.put(('delete', int(mid), None, None))
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="chat-search-indexer", daemon=True).start()
+
+    def _run(self):
+        try:
+            self.sync_from_db()
+        except Exception as e:
+            print(f"[SEARCH] Initial sync failed: {e}")
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + CHAT_SEARCH_FLUSH_MS / 1000.0
+            while len(batch) < CHAT_SEARCH_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self.apply(batch)
+            except Exception as e:
+                print(f"[SEARCH] Index batch failed ({len(batch)} ops): {e}")
+
+    def apply(self, ops):
+        """
+        Applies [(op, message_id, channel_id, text)] in one transaction and
+        moves the last_synced_id high-water mark past the upserted messages.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            high = 0
+            for op, mid, cid, text in ops:
+                conn.execute("DELETE FROM chat_fts WHERE rowid = ?", (mid,))
+                if op == 'upsert':
+                    high = max(high, mid)
+                    body = _plain_text(text)
+                    if body:
+                        conn.execute(
+                            "INSERT INTO chat_fts (rowid, body, channel_id) VALUES (?, ?, ?)",
+                            (mid, body, cid)
+                        )
+            if high:
+                conn.execute("""
+                    INSERT INTO chat_fts_meta (key, value) VALUES ('last_synced_id', ?)
+                    ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+                """, (high,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sync_from_db(self, batch_size=2000):
+        """Indexes messages newer than the stored high-water mark. Returns count."""
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM chat_fts_meta WHERE key = 'last_synced_id'").fetchone()
+        last_id = row[0] if row else 0
+        total = 0
+        while True:
+            rows = fetch_all("""
+                SELECT message_id, channel_id, message_text
+                FROM chat_messages
+                WHERE message_id > %s AND is_deleted = FALSE
+                ORDER BY message_id LIMIT %s
+            """, (last_id, batch_size))
+            if not rows:
+                break
+            self.apply([('upsert', r['message_id'], r['channel_id'], r['message_text']) for r in rows])
+            last_id = rows[-1]['message_id']
+            total += len(rows)
+        if total:
+            print(f"[SEARCH] Synced {total} messages into chat index")
+        return total
+
+    def optimize(self):
+        """Merges FTS segments; cheap to run from a nightly job."""
+        self._conn().execute("INSERT INTO chat_fts (chat_fts) VALUES ('optimize')")
+
+    # -------------------------------
+    # READ SIDE
+    # -------------------------------
+    def query(self, match, channel_ids, limit=20, offset=0):
+        if not match or not channel_ids:
+            return []
+        marks = ", ".join("?" * len(channel_ids))
+        rows = self._conn().execute(f"""
+            SELECT rowid, channel_id,
+                   snippet(chat_fts, 0, ?, ?, '…', 16),
+                   bm25(chat_fts) AS score
+            FROM chat_fts
+            WHERE chat_fts MATCH ? AND channel_id IN ({marks})
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        """, (_HL_START, _HL_END, match, *channel_ids, limit, offset)).fetchall()
+        results = []
+        for mid, cid, snip, score in rows:
+            safe = html.escape(snip).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+            results.append({'message_id': mid, 'channel_id': int(cid), 'snippet': safe, 'score': round(-score, 4)})
+        return results
+
+
+chat_search_index = ChatSearchIndex()
+
+
+# ===============================
+# SERVICE FUNCTIONS
+# ===============================
+
+def index_message(message_id, channel_id, text):
+    """Hot-path hook: O(1) enqueue, indexing happens in the background."""
+    chat_search_index.enqueue_upsert(message_id, channel_id, text)
+
+def unindex_messages(message_ids):
+    chat_search_index.enqueue_delete(message_ids)
+
+def get_searchable_channel_ids(user_id):
+    """Public channels + private channels/DMs the user participates in + guild channels."""
+    rows = fetch_all("""
+        SELECT channel_id FROM channels WHERE guild_id IS NULL AND is_private = FALSE
+        UNION
+        SELECT channel_id FROM dm_participants WHERE user_id = %s
+        UNION
+        SELECT c.channel_id FROM channels c
+        JOIN guild_members gm ON gm.guild_id = c.guild_id
+        WHERE gm.user_id = %s
+    """, (user_id, user_id))
+    return [r['channel_id'] for r in rows]
+
+def can_read_channel(user_id, channel_id):
+    """get_searchable_channel_ids' rule for a single channel."""
+    row = fetch_one("""
+        SELECT 1 AS ok FROM channels c
+        WHERE c.channel_id = %s AND (
+            (c.guild_id IS NULL AND c.is_private = FALSE)
+            OR EXISTS (SELECT 1 FROM dm_participants p WHERE p.channel_id = c.channel_id AND p.user_id = %s)
+            OR EXISTS (SELECT 1 FROM guild_members gm WHERE gm.guild_id = c.guild_id AND gm.user_id = %s)
+        )
+    """, (channel_id, user_id, user_id))
+    return row is not None
+
+def search_messages(user_id, raw_query, channel_id=None, limit=20, offset=0):
+    """
+    Ranked search within the channels the user can read.
+    Returns list of {message_id, channel_id, snippet, score, sent_at, sender_name, sender_id}.
+    """
+    match = build_match_query(raw_query)
+    if not match:
+        return []
+
+    allowed = get_searchable_channel_ids(user_id)
+    if channel_id is not None:
+        allowed = [c for c in allowed if c == int(channel_id)]
+
+    hits = chat_search_index.query(match, allowed, limit=limit, offset=offset)
+    if not hits:
+        return []
+
+    # Hydrate + drop anything deleted since it was indexed
+    marks = ", ".join(["%s"] * len(hits))
+    rows = fetch_all(f"""
+        SELECT m.message_id, m.sent_at, m.sender_type, u.user_id AS sender_id, u.name AS sender_name
+        FROM chat_messages m
+        LEFT JOIN chat_anon_id ca ON m.anon_id = ca.anon_id
+        LEFT JOIN users u ON ca.user_id = u.user_id
+        WHERE m.message_id IN ({marks}) AND m.is_deleted = FALSE
+    """, tuple(h['message_id'] for h in hits))
+    meta = {r['message_id']: r for r in rows}
+
+    results = []
+    for h in hits:
+        m = meta.get(h['message_id'])
+        if not m:
+            continue
+        is_anon = str(m['sender_type']).lower() == 'anon' or m['sender_type'] is None
+        h['sent_at'] = m['sent_at'].strftime("%Y-%m-%d %H:%M:%S") if m['sent_at'] else None
+        h['sender_name'] = 'Anonymous Member' if is_anon else m['sender_name']
+        h['sender_id'] = None if is_anon else m['sender_id']
+        results.append(h)
+    return results
@@ -1,6 +1,6 @@
 import random
 import string
-from backend.repository.db_access import fetch_one, fetch_all, execute
+from backend.repository.db_access import fetch_one, fetch_all, execute, get_connection
 
 def generate_anon_id():
     """Generates a random anonymous ID like 'anon_9fA32X'."""
@@ -266,46 +266,52 @@ def delete_room(user_id, room_id):
 def get_or_create_dm_room(user_id1, user_id2):
     """
     Finds an existing DM room between two users or creates a new one.
+    dm_room_pairs holds one room per unordered user pair: lookup is a point
+    read and the pair row is claimed in the creating transaction.
     """
     if user_id1 == user_id2:
         raise Exception("You cannot DM yourself")
-        
-    anon_id1 = get_or_create_anon_id(user_id1)
-    anon_id2 = get_or_create_anon_id(user_id2)
-    
-    # Try to find existing private room with exactly these two members
-    # We look for a room type 'private' that both users are in.
-    room = fetch_one("""
-        SELECT r.room_id 
-        FROM chat_rooms r
-        JOIN room_members m1 ON r.room_id = m1.room_id
-        JOIN room_members m2 ON r.room_id = m2.room_id
-        WHERE r.room_type = 'private' 
-        AND m1.anon_id = %s 
-        AND m2.anon_id = %s
-        AND (SELECT COUNT(*) FROM room_members rm WHERE rm.room_id = r.room_id) = 2
-    """, (anon_id1, anon_id2))
-    
+
+    pair = (user_id1, user_id2) if user_id1 < user_id2 else (user_id2, user_id1)
+    lookup = "SELECT room_id FROM dm_room_pairs WHERE user_low = %s AND user_high = %s"
+
+    room = fetch_one(lookup, pair)
     if room:
         return room['room_id']
-        
+
+    anon_id1 = get_or_create_anon_id(user_id1)
+    anon_id2 = get_or_create_anon_id(user_id2)
+
+    import mysql.connector
+
     # Create new private room
-    # We'll use a specific naming convention for DMs: "DM: UserA & UserB"
-    # But for privacy, we'll just name it "null" or "Private Chat" and let UI handle display
-    execute(
-        "INSERT INTO chat_rooms (room_name, room_type, created_by) VALUES (%s, %s, %s)",
-        ("Direct Message", "private", user_id1)
-    )
-    
-    room = fetch_one(
-        "SELECT room_id FROM chat_rooms WHERE created_by = %s AND room_type = 'private' ORDER BY created_at DESC LIMIT 1",
-        (user_id1,)
-    )
-    room_id = room['room_id']
-    
-    # Add both users
-    join_room_internal(room_id, anon_id1, role='member')
-    join_room_internal(room_id, anon_id2, role='member')
-    
-    return room_id
+    # For privacy the room is just "Direct Message"; the UI handles display
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO chat_rooms (room_name, room_type, created_by) VALUES (%s, %s, %s)",
+            ("Direct Message", "private", user_id1)
+        )
+        room_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO dm_room_pairs (user_low, user_high, room_id) VALUES (%s, %s, %s)",
+            (*pair, room_id)
+        )
+        # Add both users
+        cursor.executemany(
+            "INSERT INTO room_members (room_id, anon_id, role) VALUES (%s, %s, 'member')",
+            [(room_id, anon_id1), (room_id, anon_id2)]
+        )
+        conn.commit()
+        return room_id
+    except mysql.connector.Error as err:
+        conn.rollback()
+        if err.errno != 1062:  # Duplicate entry: another request created it first
+            raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return fetch_one(lookup, pair)['room_id']
 
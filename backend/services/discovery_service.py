@@ -2,7 +2,50 @@
 import os
 import requests
 from backend.config.config import get_config
-from backend.repository.db_access import fetch_all
+from backend.config.settings import BRAIN_VIBE_PROMPT_BOOKS
+
+# Vibe keywords -> catalog categories
+VIBE_MAPPINGS = {
+    'dark': ['Fiction', 'Mystery', 'Horror', 'Thriller'],
+    'cozy': ['Fiction', 'Romance', 'Self Help'],
+    'inspiring': ['Biography', 'Self Help', 'History'],
+    'educational': ['Science', 'Technology', 'Reference', 'History'],
+    'exciting': ['Fiction', 'Adventure', 'Thriller'],
+    'relaxing': ['Fiction', 'Poetry', 'Romance'],
+    'mysterious': ['Mystery', 'Fiction', 'Thriller'],
+    'happy': ['Fiction', 'Romance', 'Self Help'],
+    'sad': ['Fiction', 'Biography', 'Poetry'],
+    'adventurous': ['Fiction', 'Adventure', 'History'],
+}
+
+
+def _vibe_categories(user_vibe):
+    """Categories suggested by keywords in the vibe (general picks if none match)."""
+    vibe_lower = user_vibe.lower()
+    matched_categories = set()
+    for keyword, categories in VIBE_MAPPINGS.items():
+        if keyword in vibe_lower:
+            matched_categories.update(categories)
+    return matched_categories or {'Fiction', 'Self Help', 'Biography'}
+
+
+def vibe_candidates(user_vibe, limit=BRAIN_VIBE_PROMPT_BOOKS):
+    """
+    Up to `limit` books for a vibe: retrieved within the vibe's categories,
+    then from the whole catalog, topped up with random picks from the
+    categories' precomputed pool.
+    """
+    from backend.brain.retriever import retriever
+    categories = _vibe_categories(user_vibe)
+    books, seen = [], set()
+    for batch in (retriever.search(user_vibe, k=limit, categories=categories),
+                  retriever.search(user_vibe, k=limit),
+                  retriever.sample(limit, categories=categories)):
+        for book in batch:
+            if book['book_id'] not in seen and len(books) < limit:
+                seen.add(book['book_id'])
+                books.append(book)
+    return books
 
 def discover_by_vibe(user_vibe):
     """
@@ -12,12 +55,26 @@ def discover_by_vibe(user_vibe):
     config = get_config()
     gemini_key = config.GEMINI_API_KEY
     hf_token = os.getenv('HF_TOKEN')  # Free Hugging Face API token
-    
-    # Fetch ALL books for semantic mapping (within reasonable limits)
-    books = fetch_all("""
-        SELECT b.title, COALESCE(a.name, 'Unknown') as author, b.category 
-        FROM books b LEFT JOIN authors a ON b.author_id = a.author_id LIMIT 200
-    """)
+
+    # Same vibe against the same catalog: reuse the last LLM answer
+    from backend.brain.response_cache import vibe_response_cache
+    from backend.brain.retriever import retriever
+    catalog_version = None
+    if gemini_key or hf_token:
+        try:
+            catalog_version = retriever.catalog_version()
+            cached = vibe_response_cache.get(user_vibe, catalog_version)
+            if cached:
+                return cached
+        except Exception as e:
+            print(f"⚠️ Vibe cache unavailable: {e}")
+    
+    # Only the books retrieved for this vibe go into the prompt
+    try:
+        books = vibe_candidates(user_vibe)
+    except Exception as e:
+        print(f"⚠️ Retriever Error: {e}")
+        books = []
     book_context = "\n".join([f"- {b['title']} | {b['author']} | {b['category']}" for b in books])
     
     # Method 1: Gemini (if API key provided)
@@ -44,6 +101,8 @@ def discover_by_vibe(user_vibe):
             """
             
             response = model.generate_content(prompt)
+            if catalog_version:
+                vibe_response_cache.put(user_vibe, catalog_version, response.text)
             return response.text
             
         except Exception as e:
@@ -54,6 +113,8 @@ def discover_by_vibe(user_vibe):
         try:
             response = call_huggingface_ai(user_vibe, book_context, hf_token)
             if response:
+                if catalog_version:
+                    vibe_response_cache.put(user_vibe, catalog_version, response)
                 return response
         except Exception as e:
             print(f"⚠️ Hugging Face Error: {e}")
@@ -99,34 +160,21 @@ def local_vibe_matching(user_vibe, books):
     Simple keyword-based matching when no AI API is available.
     Works completely offline!
     """
-    vibe_lower = user_vibe.lower()
-    
-    # Define vibe-to-category mappings
-    vibe_mappings = {
-        'dark': ['Fiction', 'Mystery', 'Horror', 'Thriller'],
-        'cozy': ['Fiction', 'Romance', 'Self Help'],
-        'inspiring': ['Biography', 'Self Help', 'History'],
-        'educational': ['Science', 'Technology', 'Reference', 'History'],
-        'exciting': ['Fiction', 'Adventure', 'Thriller'],
-        'relaxing': ['Fiction', 'Poetry', 'Romance'],
-        'mysterious': ['Mystery', 'Fiction', 'Thriller'],
-        'happy': ['Fiction', 'Romance', 'Self Help'],
-        'sad': ['Fiction', 'Biography', 'Poetry'],
-        'adventurous': ['Fiction', 'Adventure', 'History'],
-    }
+    matched_categories = _vibe_categories(user_vibe)
+    
+    # Rank the whole catalog (not just the prompt candidates) by the vibe text
+    try:
+        from backend.brain.retriever import retriever
+        matching_books = retriever.search(user_vibe, k=5, categories=matched_categories)
+        if not matching_books:
+            matching_books = retriever.search(user_vibe, k=5)
+    except Exception as e:
+        print(f"⚠️ Retriever Error: {e}")
+        matching_books = []
     
-    # Find matching categories based on keywords in user vibe
-    matched_categories = set()
-    for keyword, categories in vibe_mappings.items():
-        if keyword in vibe_lower:
-            matched_categories.update(categories)
-    
-    # If no specific vibe matched, use general fiction
-    if not matched_categories:
-        matched_categories = {'Fiction', 'Self Help', 'Biography'}
-    
-    # Filter books by matched categories
-    matching_books = [b for b in books if b['category'] in matched_categories]
+    if not matching_books:
+        # Filter books by matched categories
+        matching_books = [b for b in books if b['category'] in matched_categories]
     
     # If still no matches, return top 5 books
     if not matching_books:
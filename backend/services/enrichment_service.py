@@ -221,6 +221,10 @@ def enrich_book_metadata(book_id):
             SET author_id = %s, series_id = %s, series_order = %s, cover_url = %s, description = %s
             WHERE book_id = %s
         """, (author_id, series_id, s_order, cover_url, description, book_id))
+
+        # Author and description feed the book's embedding
+        from backend.brain.indexer import index_books
+        index_books([book_id])
         
         return "Success (Open Source)"
         
@@ -1,14 +1,168 @@
 import os
 import uuid
+import hashlib
+import shutil
+import time
 from werkzeug.utils import secure_filename
-from flask import current_app
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'txt'}
+from backend.config.settings import UPLOAD_ROOT, UPLOAD_TEMP_DIR, CHAT_UPLOAD_MAX_BYTES
+from backend.repository.db_access import execute, fetch_one, fetch_all
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf', 'doc', 'docx', 'txt', 'csv', 'zip'}
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# Content-addressed blobs: static/uploads/blobs/ab/cd/<sha256>.<ext>
+BLOB_DIR = os.path.join(UPLOAD_ROOT, 'blobs')
+BLOB_URL_PREFIX = 'uploads/blobs/'
+
+COPY_BUFFER = 64 * 1024
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def file_extension(filename):
+    return secure_filename(filename or '').rsplit('.', 1)[-1].lower() if '.' in (filename or '') else ''
+
+class UploadTooLarge(ValueError):
+    pass
+
+# ===============================
+# BLOB STORE
+# ===============================
+
+def blob_relpath(sha256, ext):
+    """Sharded relative URL path (two levels of 256 dirs keeps listings small)."""
+    return f"{BLOB_URL_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+def _abs_path(relpath):
+    return os.path.join(UPLOAD_ROOT, relpath[len('uploads/'):])
+
+def find_blob(sha256):
+    return fetch_one("SELECT * FROM file_blobs WHERE sha256 = %s", (sha256,))
+
+def find_owned_blob(user_id, sha256):
+    """The blob if user_id has uploaded its bytes before, else None (no existence oracle)."""
+    return fetch_one("""
+        SELECT b.* FROM file_blobs b
+        JOIN file_blob_owners o ON o.sha256 = b.sha256
+        WHERE b.sha256 = %s AND o.user_id = %s
+    """, (sha256, user_id))
+
+def acquire_blob(sha256):
+    """
+    Adds a reference to an existing blob (dedupe hit). Returns the blob row or None.
+    """
+    if not sha256 or len(sha256) != 64:
+        return None
+    updated = execute(
+        "UPDATE file_blobs SET ref_count = ref_count + 1, last_ref_at = NOW() WHERE sha256 = %s",
+        (sha256.lower(),)
+    )
+    if not updated:
+        return None
+    blob = find_blob(sha256.lower())
+    # Row exists but the file vanished (manual cleanup): treat as a miss
+    if blob and not os.path.exists(_abs_path(blob['path'])):
+        release_blob(blob['sha256'])
+        return None
+    return blob
+
+def commit_blob(temp_path, sha256, size, ext, user_id=None):
+    """
+    Moves a fully written temp file into the blob store and records a reference.
+    If the blob already exists the temp file is discarded (dedupe).
+    user_id, who just uploaded the bytes, may dedupe against it later.
+    Returns the blob row.
+    """
+    existing = find_blob(sha256)
+    if existing and os.path.exists(_abs_path(existing['path'])):
+        os.remove(temp_path)
+        relpath = existing['path']
+    else:
+        relpath = existing['path'] if existing else blob_relpath(sha256, ext)
+        final_path = _abs_path(relpath)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # Atomic rename; concurrent identical uploads simply overwrite with same bytes
+        os.replace(temp_path, final_path)
+
+    execute("""
+        INSERT INTO file_blobs (sha256, size, ext, path, ref_count)
+        VALUES (%s, %s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1, last_ref_at = NOW()
+    """, (sha256, size, ext, relpath))
+    if user_id is not None:
+        execute("INSERT IGNORE INTO file_blob_owners (sha256, user_id) VALUES (%s, %s)", (sha256, user_id))
+    return find_blob(sha256)
+
+def release_blob(sha256):
+    """Drops one reference; unreferenced blobs are removed by gc_blobs()."""
+    execute(
+        "UPDATE file_blobs SET ref_count = GREATEST(ref_count - 1, 0), last_ref_at = NOW() WHERE sha256 = %s",
+        (sha256,)
+    )
+
+def release_blobs_for_urls(urls):
+    """Releases blobs referenced by message file_urls (non-blob URLs are ignored)."""
+    for url in urls or []:
+        path = (url or '').lstrip('/')
+        if path.startswith('static/'):
+            path = path[len('static/'):]
+        if path.startswith(BLOB_URL_PREFIX):
+            sha256 = os.path.splitext(os.path.basename(path))[0]
+            release_blob(sha256)
+
+def gc_blobs(grace_hours=24, limit=500):
+    """Deletes blobs that have had no references for grace_hours. Returns count."""
+    rows = fetch_all("""
+        SELECT sha256, path FROM file_blobs
+        WHERE ref_count = 0 AND last_ref_at < NOW() - INTERVAL %s HOUR
+        LIMIT %s
+    """, (grace_hours, limit))
+    for r in rows:
+        try:
+            os.remove(_abs_path(r['path']))
+        except FileNotFoundError:
+            pass
+        execute("DELETE FROM file_blobs WHERE sha256 = %s AND ref_count = 0", (r['sha256'],))
+        execute("DELETE FROM file_blob_owners WHERE sha256 = %s", (r['sha256'],))
+    return len(rows)
+
+def stream_to_temp(stream, temp_path, hasher=None, limit=CHAT_UPLOAD_MAX_BYTES, mode='wb'):
+    """
+    Copies a stream to disk in fixed-size pieces while hashing.
+    Never holds more than COPY_BUFFER bytes in memory. Returns bytes written.
+    """
+    written = 0
+    with open(temp_path, mode) as out:
+        while True:
+            piece = stream.read(COPY_BUFFER)
+            if not piece:
+                break
+            written += len(piece)
+            if limit is not None and written > limit:
+                raise UploadTooLarge(f"File exceeds {limit // (1024 * 1024)} MB limit")
+            if hasher is not None:
+                hasher.update(piece)
+            out.write(piece)
+    return written
+
+def store_file_storage(file, user_id=None):
+    """
+    Stores a werkzeug FileStorage in the blob store (single-request upload).
+    Returns the blob row.
+    """
+    ext = file_extension(file.filename)
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    temp_path = os.path.join(UPLOAD_TEMP_DIR, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    try:
+        size = stream_to_temp(file.stream, temp_path, hasher)
+        return commit_blob(temp_path, hasher.hexdigest(), size, ext, user_id)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
 def save_chat_file(file):
     """
     Saves a file uploaded in chat.
@@ -16,21 +170,29 @@ def save_chat_file(file):
     """
     if not file or file.filename == '':
         return None
-        
+
     if not allowed_file(file.filename):
         raise ValueError("File type not allowed")
-        
-    # Create secure filename with UUID prefix to avoid collisions
-    original_name = secure_filename(file.filename)
-    unique_name = f"{uuid.uuid4().hex[:8]}_{original_name}"
-    
-    # Check upload folder exists
-    upload_folder = os.path.join(current_app.static_folder, 'uploads', 'chat')
-    os.makedirs(upload_folder, exist_ok=True)
-    
-    # Save
-    file_path = os.path.join(upload_folder, unique_name)
-    file.save(file_path)
-    
-    # Return relative path for URL usage
-    return f"uploads/chat/{unique_name}"
+
+    # Content-addressed: identical uploads share one file on disk
+    blob = store_file_storage(file)
+    return blob['path']
+
+def gc_temp_files(max_age_hours=24):
+    """Removes abandoned temp/partial upload files (and their in-memory upload state)."""
+    temp_dir = UPLOAD_TEMP_DIR
+    if not os.path.isdir(temp_dir):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for name in os.listdir(temp_dir):
+        path = os.path.join(temp_dir, name)
+        if os.path.getmtime(path) < cutoff:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+            removed += 1
+    from backend.services.upload_service import forget_stale_uploads
+    forget_stale_uploads()
+    return removed
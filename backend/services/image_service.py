@@ -0,0 +1,164 @@
+"""
+image_service.py
+----------------
+Resized WebP variants for avatars and chat images.
+
+- Variants live at static/uploads/variants/<name>/<original path>.webp, so
+  their URL is derived from the original without a DB lookup.
+- Generation runs on a background thread after upload; until a variant
+  exists (or when Pillow is not installed) the original is served instead.
+- Legacy images get their variants lazily the first time they are requested.
+"""
+
+import os
+import queue
+import threading
+
+from backend.config.settings import UPLOAD_ROOT, IMAGE_WEBP_QUALITY
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# name -> (width, height, crop). crop=True fills the box (avatars), False fits inside it.
+VARIANTS = {
+    'avatar_sm': (64, 64, True),      # chat, leaderboard, member lists (32-48px at 2x)
+    'avatar_md': (256, 256, True),    # profile pages
+    'thumb': (480, 480, False),       # inline chat images
+}
+AVATAR_VARIANTS = ('avatar_sm', 'avatar_md')
+ATTACHMENT_VARIANTS = ('thumb',)
+
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+VARIANT_URL_PREFIX = 'uploads/variants/'
+
+# Variants known to exist on disk (positive-only; a variant never disappears while serving)
+_known = set()
+_KNOWN_MAX = 50000
+
+
+def _is_source(relpath):
+    return bool(relpath) and relpath.startswith('uploads/') and \
+        not relpath.startswith(VARIANT_URL_PREFIX) and \
+        os.path.splitext(relpath)[1].lower() in SOURCE_EXTENSIONS
+
+def _abs_path(relpath):
+    return os.path.join(UPLOAD_ROOT, relpath[len('uploads/'):])
+
+def variant_relpath(relpath, name):
+    """uploads/avatars/u.png -> uploads/variants/avatar_sm/avatars/u.png.webp"""
+    return f"{VARIANT_URL_PREFIX}{name}/{relpath[len('uploads/'):]}.webp"
+
+def render_variant(src_path, dest_path, name):
+    width, height, crop = VARIANTS[name]
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if getattr(img, 'is_animated', False):
+            img.seek(0)  # First frame only; the original stays animated
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        if crop:
+            img = ImageOps.fit(img, (width, height), Image.LANCZOS)
+        else:
+            img.thumbnail((width, height), Image.LANCZOS)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, 'WEBP', quality=IMAGE_WEBP_QUALITY, method=4)
+    os.replace(tmp_path, dest_path)
+
+def generate_variants(relpath, names):
+    """Writes every missing variant of relpath. Returns number generated."""
+    src = _abs_path(relpath)
+    if not os.path.exists(src):
+        return 0
+    generated = 0
+    for name in names:
+        dest_rel = variant_relpath(relpath, name)
+        dest = _abs_path(dest_rel)
+        if os.path.exists(dest):
+            continue
+        render_variant(src, dest, name)
+        generated += 1
+    return generated
+
+
+class ImagePipeline:
+    """Single background worker; duplicate requests for the same image are coalesced."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def enqueue(self, relpath, names):
+        if not PIL_AVAILABLE or not _is_source(relpath):
+            return False
+        key = (relpath, tuple(names))
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, name="image-pipeline", daemon=True).start()
+        self._queue.put(key)
+        return True
+
+    def _run(self):
+        while True:
+            relpath, names = self._queue.get()
+            try:
+                generate_variants(relpath, names)
+            except Exception as e:
+                print(f"[IMAGES] Variant generation failed for {relpath}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard((relpath, names))
+
+    def pending(self):
+        return self._queue.qsize()
+
+
+image_pipeline = ImagePipeline()
+
+
+# ===============================
+# SERVICE FUNCTIONS
+# ===============================
+
+def process_avatar(relpath):
+    return image_pipeline.enqueue(relpath, AVATAR_VARIANTS)
+
+def process_attachment(relpath):
+    """
+    Queues the chat thumbnail and returns its future path (None if it will
+    never exist). Clients fall back to the original until it is written.
+    """
+    if not PIL_AVAILABLE or not _is_source(relpath):
+        return None
+    image_pipeline.enqueue(relpath, ATTACHMENT_VARIANTS)
+    return variant_relpath(relpath, 'thumb')
+
+def image_variant(relpath, name):
+    """
+    Static-relative path to serve for `name`: the variant when it exists,
+    otherwise the original (and the variant is queued for next time).
+    """
+    if not _is_source(relpath):
+        return relpath
+    dest_rel = variant_relpath(relpath, name)
+    if dest_rel in _known:
+        return dest_rel
+    if os.path.exists(_abs_path(dest_rel)):
+        if len(_known) >= _KNOWN_MAX:
+            _known.clear()
+        _known.add(dest_rel)
+        return dest_rel
+    image_pipeline.enqueue(relpath, (name,))
+    return relpath
+
+def avatar_variant(relpath, name='avatar_sm'):
+    """Like image_variant but maps empty values to the default avatar."""
+    return image_variant(relpath, name) if relpath else 'default.jpg'
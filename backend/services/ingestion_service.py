@@ -2,12 +2,15 @@ from backend.utils.snowflake import generate_id
 from backend.utils.rate_limiter import check_rate_limit
 from backend.services.channel_service import save_message
 from backend.services.gateway_service import GatewayService
+from backend.services.chat_search_service import index_message
+from backend.chat.metrics import socket_metrics
 from flask_socketio import emit
 
 class IngestionService:
     """
     Central Pipeline for Message Processing.
     Steps: RateLimit -> Validate -> Persist -> Fan-out
+    Each step is timed into socket_metrics' ingestion stage histograms.
     """
     
     @staticmethod
@@ -20,15 +23,21 @@ class IngestionService:
         # 1. Rate Limiting
         # Key = rate:channel:{cid}:user:{uid}
         rate_key = f"rate:channel:{channel_id}:user:{user_id}"
-        if not check_rate_limit(rate_key):
+        with socket_metrics.stage('rate_limit'):
+            allowed = check_rate_limit(rate_key, policy='chat:message')
+        if not allowed:
              return False, "You are being rate limited."
              
         # 2. Validation (Length, Content)
         # Content can be empty if attachment exists
-        if not content and not attachment:
-             return False, "Message cannot be empty."
-        if content and len(content) > 4000:
-             return False, "Message too long."
+        with socket_metrics.stage('validate'):
+            error = None
+            if not content and not attachment:
+                 error = "Message cannot be empty."
+            elif content and len(content) > 4000:
+                 error = "Message too long."
+        if error:
+            return False, error
              
         # 3. Persistence (DB)
         # Determine sender_type based on profile (set by socket_service)
@@ -38,11 +47,17 @@ class IngestionService:
         
         try:
             # save_message returns dict with message_id, etc.
-            msg_obj = save_message(user_id, channel_id, text=content, file_url=file_url, reply_to_id=reply_to_id, sender_type=sender_type)
+            with socket_metrics.stage('persist'):
+                msg_obj = save_message(user_id, channel_id, text=content, file_url=file_url, reply_to_id=reply_to_id, sender_type=sender_type)
         except Exception as e:
             print(f"❌ DB Insert Failed: {e}")
             return False, "Database Error"
 
+        # Search indexing is queued and applied by a background thread
+        if content:
+            with socket_metrics.stage('index'):
+                index_message(msg_obj['message_id'], channel_id, content)
+
         # 4. Fan-Out (Broadcast)
         # We should ideally fetch the reply_to content for the UI
         reply_to_content = None
@@ -70,7 +85,13 @@ class IngestionService:
         }
         
         from backend import socketio
-        socketio.emit('receive_message', payload, to=str(channel_id), include_self=False)
+        from backend.chat.wire_format import fanout_room, encode_live, pack, has_subscribers
+        with socket_metrics.stage('fanout'):
+            socketio.emit('receive_message', payload, to=fanout_room(channel_id, 'json'), include_self=False)
+            # Opted-in clients: one shared binary frame with no repeated profile/date strings
+            compact_room = fanout_room(channel_id, 'compact')
+            if has_subscribers(socketio, compact_room):
+                socketio.emit('receive_message', pack(encode_live(payload)), to=compact_room, include_self=False)
         
         # Ack to sender with same payload
         payload['sender_type'] = 'me'
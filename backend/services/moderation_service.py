@@ -0,0 +1,152 @@
+"""
+moderation_service.py
+---------------------
+Message edit/delete and bulk moderation as set-based statements.
+
+Permission is part of the UPDATE's WHERE clause instead of being looked up
+first: a row is changed only if the caller wrote it, or is a site admin,
+the channel's creator or a channel admin (dm_participants.role = 'admin').
+So a single delete is one round trip, and a bulk operation is one locking
+SELECT for the ids (clients need them) plus one UPDATE, however many rows.
+
+Bulk operations soft-delete at most CHAT_MODERATION_MAX_ROWS rows per call
+and announce them in one 'messages_deleted' event:
+    {'channel_id': 7, 'message_ids': [...]}
+"""
+
+import re
+
+import mysql.connector
+
+from backend.config.settings import CHAT_MODERATION_MAX_ROWS
+from backend.repository.db_access import execute, get_connection
+from backend.services.chat_search_service import index_message, unindex_messages
+
+MAX_PATTERN_LENGTH = 200
+
+# Caller owns the message, or moderates its channel. Params: see _scope_params
+_SCOPE_SQL = """(
+    %s
+    OR m.anon_id IN (SELECT ca.anon_id FROM chat_anon_id ca WHERE ca.user_id = %s)
+    OR EXISTS (SELECT 1 FROM dm_participants p
+               WHERE p.channel_id = m.channel_id AND p.user_id = %s AND p.role = 'admin')
+    OR EXISTS (SELECT 1 FROM channels c
+               WHERE c.channel_id = m.channel_id AND c.created_by = %s)
+)"""
+
+def _scope_params(user_id, is_site_admin):
+    return (bool(is_site_admin), user_id, user_id, user_id)
+
+def _marks(values):
+    return ", ".join(["%s"] * len(values))
+
+def _like_pattern(text):
+    """Substring match with LIKE wildcards in the user's text escaped."""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+# ===============================
+# SINGLE MESSAGE
+# ===============================
+
+def edit_message(user_id, message_id, channel_id, new_content):
+    """Owner-only edit in one UPDATE. Returns True if the message changed."""
+    changed = execute("""
+        UPDATE chat_messages m
+        SET m.message_text = %s, m.is_edited = TRUE
+        WHERE m.message_id = %s AND m.channel_id = %s AND m.is_deleted = FALSE
+        AND m.anon_id IN (SELECT ca.anon_id FROM chat_anon_id ca WHERE ca.user_id = %s)
+    """, (new_content, message_id, channel_id, user_id))
+    if changed:
+        index_message(message_id, channel_id, new_content)
+    return bool(changed)
+
+def delete_message(user_id, message_id, is_site_admin=False):
+    """Soft-deletes one message if the caller owns it or moderates its channel."""
+    deleted = execute(f"""
+        UPDATE chat_messages m
+        SET m.is_deleted = TRUE
+        WHERE m.message_id = %s AND m.is_deleted = FALSE
+        AND {_SCOPE_SQL}
+    """, (message_id, *_scope_params(user_id, is_site_admin)))
+    if deleted:
+        unindex_messages([message_id])
+    return bool(deleted)
+
+
+# ===============================
+# BULK
+# ===============================
+
+def _bulk_delete(user_id, is_site_admin, channel_id, filter_sql, filter_params, limit=None):
+    """
+    Soft-deletes messages of channel_id matching filter_sql that the caller may
+    moderate. Returns the deleted ids (oldest first) and broadcasts them.
+    """
+    limit = min(limit or CHAT_MODERATION_MAX_ROWS, CHAT_MODERATION_MAX_ROWS)
+    scope = _scope_params(user_id, is_site_admin)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # Lock the matching rows so the UPDATE below changes exactly these ids
+        cursor.execute(f"""
+            SELECT m.message_id FROM chat_messages m
+            WHERE m.channel_id = %s AND m.is_deleted = FALSE
+            AND {filter_sql}
+            AND {_SCOPE_SQL}
+            ORDER BY m.message_id LIMIT %s
+            FOR UPDATE
+        """, (channel_id, *filter_params, *scope, limit))
+        ids = [row[0] for row in cursor.fetchall()]
+        if ids:
+            cursor.execute(f"""
+                UPDATE chat_messages m
+                SET m.is_deleted = TRUE
+                WHERE m.message_id IN ({_marks(ids)}) AND m.channel_id = %s
+                AND {_SCOPE_SQL}
+            """, (*ids, channel_id, *scope))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    if ids:
+        unindex_messages(ids)
+        from backend import socketio
+        socketio.emit('messages_deleted', {'channel_id': channel_id, 'message_ids': ids}, to=str(channel_id))
+    return ids
+
+def delete_user_messages(user_id, is_site_admin, channel_id, target_user_id, since_minutes=None):
+    """Everything target_user_id posted in the channel (optionally only the last N minutes)."""
+    filter_sql = "m.anon_id IN (SELECT t.anon_id FROM chat_anon_id t WHERE t.user_id = %s)"
+    params = [target_user_id]
+    if since_minutes:
+        filter_sql += " AND m.sent_at >= NOW() - INTERVAL %s MINUTE"
+        params.append(int(since_minutes))
+    return _bulk_delete(user_id, is_site_admin, channel_id, filter_sql, params)
+
+def delete_message_range(user_id, is_site_admin, channel_id, from_id, to_id):
+    """Messages with from_id <= message_id <= to_id (ids grow with time)."""
+    low, high = sorted((int(from_id), int(to_id)))
+    return _bulk_delete(user_id, is_site_admin, channel_id, "m.message_id BETWEEN %s AND %s", (low, high))
+
+def purge_by_pattern(user_id, is_site_admin, channel_id, pattern, regex=False):
+    """Messages whose text contains `pattern` (or matches it as a REGEXP)."""
+    if not pattern or len(pattern) > MAX_PATTERN_LENGTH:
+        raise ValueError(f"Pattern must be 1-{MAX_PATTERN_LENGTH} characters")
+    if regex:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern: {e}")
+        try:
+            return _bulk_delete(user_id, is_site_admin, channel_id, "m.message_text REGEXP %s", (pattern,))
+        except mysql.connector.Error as e:
+            # MySQL's regex dialect (ICU) rejects some patterns Python accepts
+            raise ValueError(f"Invalid pattern: {e.msg}")
+    return _bulk_delete(user_id, is_site_admin, channel_id, "m.message_text LIKE %s", (_like_pattern(pattern),))
@@ -0,0 +1,418 @@
+"""
+presence_service.py
+-------------------
+Who is online, across every worker process.
+
+- Sessions live in a pluggable store:
+    InMemoryPresenceStore  -> single process (default)
+    SQLitePresenceStore    -> shared by all workers on one host (PRESENCE_STORE=sqlite:///...)
+- A sweeper expires sessions whose heartbeat went stale (crashed workers,
+  half-open sockets) so get_online_users() stays honest.
+- Presence changes are coalesced and flushed in batches: one
+  'presence_update' per recipient per flush instead of one emit per event.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from backend.config.settings import (
+    PRESENCE_STORE,
+    PRESENCE_TIMEOUT_SEC,
+    PRESENCE_SWEEP_SEC,
+    PRESENCE_FLUSH_MS,
+)
+from backend.utils.snowflake import generate_id
+
+
+# ===============================
+# STORES
+# ===============================
+
+class InMemoryPresenceStore:
+    """
+    Process-local store (the original GatewayService dicts, behind a lock).
+    """
+
+    def __init__(self):
+        # socket_id -> { user_id, session_id, connected_at, last_heartbeat, channels }
+        self._sessions = {}
+        # user_id -> set(socket_ids)
+        self._user_sockets = {}
+        self._lock = threading.Lock()
+
+    def add_session(self, socket_id, user_id, session_id, now):
+        """Returns True if this is the user's first live socket (went online)."""
+        with self._lock:
+            self._sessions[socket_id] = {
+                'user_id': user_id,
+                'session_id': session_id,
+                'connected_at': now,
+                'last_heartbeat': now,
+                'channels': set()
+            }
+            sockets = self._user_sockets.setdefault(user_id, set())
+            sockets.add(socket_id)
+            return len(sockets) == 1
+
+    def remove_session(self, socket_id):
+        """Returns (user_id, went_offline, channels) or None if unknown."""
+        with self._lock:
+            session = self._sessions.pop(socket_id, None)
+            if not session:
+                return None
+            return self._detach(socket_id, session)
+
+    def _detach(self, socket_id, session):
+        uid = session['user_id']
+        sockets = self._user_sockets.get(uid)
+        went_offline = False
+        if sockets is not None:
+            sockets.discard(socket_id)
+            if not sockets:
+                del self._user_sockets[uid]
+                went_offline = True
+        return uid, went_offline, set(session['channels'])
+
+    def touch(self, socket_id, now):
+        with self._lock:
+            session = self._sessions.get(socket_id)
+            if not session:
+                return False
+            session['last_heartbeat'] = now
+            return True
+
+    def add_channel(self, socket_id, channel_id):
+        with self._lock:
+            session = self._sessions.get(socket_id)
+            if session:
+                session['channels'].add(str(channel_id))
+
+    def expire(self, cutoff):
+        """Removes sessions with last_heartbeat < cutoff. Returns [(socket_id, user_id, went_offline, channels)]."""
+        with self._lock:
+            stale = [sid for sid, s in self._sessions.items() if s['last_heartbeat'] < cutoff]
+            expired = []
+            for sid in stale:
+                session = self._sessions.pop(sid)
+                expired.append((sid,) + self._detach(sid, session))
+            return expired
+
+    def online_users(self):
+        with self._lock:
+            return list(self._user_sockets.keys())
+
+    def user_sockets(self, user_id):
+        with self._lock:
+            return set(self._user_sockets.get(user_id, ()))
+
+
+class SQLitePresenceStore:
+    """
+    Shared store for several workers on one host.
+
+    Every mutation runs inside BEGIN IMMEDIATE so "was that the user's last
+    socket?" is answered atomically even when two workers race.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS presence_sessions (
+                socket_id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                session_id INTEGER NOT NULL,
+                connected_at REAL NOT NULL,
+                last_heartbeat REAL NOT NULL,
+                channels TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE INDEX IF NOT EXISTS idx_presence_user ON presence_sessions(user_id);
+            CREATE INDEX IF NOT EXISTS idx_presence_hb ON presence_sessions(last_heartbeat);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _atomic(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _remaining(conn, user_id):
+        return conn.execute(
+            "SELECT COUNT(*) FROM presence_sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()[0]
+
+    def add_session(self, socket_id, user_id, session_id, now):
+        def op(conn):
+            conn.execute("""
+                INSERT OR REPLACE INTO presence_sessions
+                    (socket_id, user_id, session_id, connected_at, last_heartbeat, channels)
+                VALUES (?, ?, ?, ?, ?, '[]')
+            """, (socket_id, user_id, session_id, now, now))
+            return self._remaining(conn, user_id) == 1
+        return self._atomic(op)
+
+    def remove_session(self, socket_id):
+        def op(conn):
+            row = conn.execute(
+                "SELECT user_id, channels FROM presence_sessions WHERE socket_id = ?", (socket_id,)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute("DELETE FROM presence_sessions WHERE socket_id = ?", (socket_id,))
+            return row[0], self._remaining(conn, row[0]) == 0, set(json.loads(row[1]))
+        return self._atomic(op)
+
+    def touch(self, socket_id, now):
+        cur = self._conn().execute(
+            "UPDATE presence_sessions SET last_heartbeat = ? WHERE socket_id = ?", (now, socket_id)
+        )
+        return cur.rowcount > 0
+
+    def add_channel(self, socket_id, channel_id):
+        def op(conn):
+            row = conn.execute(
+                "SELECT channels FROM presence_sessions WHERE socket_id = ?", (socket_id,)
+            ).fetchone()
+            if not row:
+                return
+            channels = set(json.loads(row[0]))
+            channels.add(str(channel_id))
+            conn.execute(
+                "UPDATE presence_sessions SET channels = ? WHERE socket_id = ?",
+                (json.dumps(sorted(channels)), socket_id)
+            )
+        self._atomic(op)
+
+    def expire(self, cutoff):
+        def op(conn):
+            rows = conn.execute(
+                "SELECT socket_id, user_id, channels FROM presence_sessions WHERE last_heartbeat < ?",
+                (cutoff,)
+            ).fetchall()
+            if not rows:
+                return []
+            conn.execute("DELETE FROM presence_sessions WHERE last_heartbeat < ?", (cutoff,))
+            expired = []
+            for sid, uid, channels in rows:
+                expired.append((sid, uid, self._remaining(conn, uid) == 0, set(json.loads(channels))))
+            return expired
+        return self._atomic(op)
+
+    def online_users(self):
+        rows = self._conn().execute("SELECT DISTINCT user_id FROM presence_sessions").fetchall()
+        return [r[0] for r in rows]
+
+    def user_sockets(self, user_id):
+        rows = self._conn().execute(
+            "SELECT socket_id FROM presence_sessions WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        return {r[0] for r in rows}
+
+
+def create_presence_store(url=None):
+    """Builds the store named by PRESENCE_STORE ('' = in-memory, 'sqlite:///path' = shared)."""
+    url = PRESENCE_STORE if url is None else url
+    if not url:
+        return InMemoryPresenceStore()
+    if url.startswith('sqlite://'):
+        path = url[len('sqlite://'):]
+        return SQLitePresenceStore(path if path.startswith('/') else os.path.abspath(path))
+    raise ValueError(f"Unsupported PRESENCE_STORE: {url!r}")
+
+
+presence_store = create_presence_store()
+
+
+# ===============================
+# SERVICE
+# ===============================
+
+def user_room(user_id):
+    """Personal Socket.IO room every socket of a user joins on connect."""
+    return f"user_{user_id}"
+
+
+class PresenceService:
+    """
+    Connection lifecycle + batched presence broadcasts.
+    """
+
+    _pending = {}               # user_id -> {'status': str, 'channels': set()}
+    _pending_lock = threading.Lock()
+    _tasks_started = False
+    _tasks_lock = threading.Lock()
+
+    # -------------------------------
+    # LIFECYCLE
+    # -------------------------------
+    @staticmethod
+    def connect(socket_id, user_id):
+        """Registers a socket. Returns the gateway session id."""
+        session_id = generate_id()
+        went_online = presence_store.add_session(socket_id, user_id, session_id, time.time())
+        if went_online:
+            PresenceService._queue_change(user_id, 'online', set())
+        return session_id
+
+    @staticmethod
+    def disconnect(socket_id):
+        result = presence_store.remove_session(socket_id)
+        if result:
+            user_id, went_offline, channels = result
+            if went_offline:
+                PresenceService._queue_change(user_id, 'offline', channels)
+        return result
+
+    @staticmethod
+    def heartbeat(socket_id):
+        return presence_store.touch(socket_id, time.time())
+
+    @staticmethod
+    def track_channel(socket_id, channel_id):
+        """Remember a private channel so offline notices reach its room too."""
+        presence_store.add_channel(socket_id, channel_id)
+
+    @staticmethod
+    def get_online_users():
+        return presence_store.online_users()
+
+    @staticmethod
+    def is_online(user_id):
+        return bool(presence_store.user_sockets(user_id))
+
+    # -------------------------------
+    # BACKGROUND TASKS
+    # -------------------------------
+    @staticmethod
+    def ensure_background_tasks(socketio):
+        """Starts the sweeper and flusher once per process."""
+        if PresenceService._tasks_started:
+            return
+        with PresenceService._tasks_lock:
+            if PresenceService._tasks_started:
+                return
+            PresenceService._tasks_started = True
+        socketio.start_background_task(PresenceService._sweep_loop, socketio)
+        socketio.start_background_task(PresenceService._flush_loop, socketio)
+
+    @staticmethod
+    def sweep(socketio=None, now=None):
+        """Expires zombie sessions. Returns how many were removed."""
+        cutoff = (now or time.time()) - PRESENCE_TIMEOUT_SEC
+        expired = presence_store.expire(cutoff)
+        for socket_id, user_id, went_offline, channels in expired:
+            if went_offline:
+                PresenceService._queue_change(user_id, 'offline', channels)
+            if socketio is not None:
+                try:
+                    socketio.server.disconnect(socket_id)
+                except Exception:
+                    pass  # Socket already gone or owned by a dead worker
+        if expired:
+            print(f"[PRESENCE] Swept {len(expired)} stale session(s)")
+        return len(expired)
+
+    @staticmethod
+    def _sweep_loop(socketio):
+        while True:
+            socketio.sleep(PRESENCE_SWEEP_SEC)
+            try:
+                PresenceService.sweep(socketio)
+            except Exception as e:
+                print(f"[PRESENCE] Sweep failed: {e}")
+
+    @staticmethod
+    def _flush_loop(socketio):
+        while True:
+            socketio.sleep(PRESENCE_FLUSH_MS / 1000.0)
+            try:
+                PresenceService.flush(socketio)
+            except Exception as e:
+                print(f"[PRESENCE] Flush failed: {e}")
+
+    # -------------------------------
+    # BATCHED BROADCASTS
+    # -------------------------------
+    @staticmethod
+    def _queue_change(user_id, status, channels):
+        with PresenceService._pending_lock:
+            entry = PresenceService._pending.setdefault(user_id, {'status': status, 'channels': set()})
+            entry['status'] = status  # Latest state wins (online→offline flaps coalesce)
+            entry['channels'] |= channels
+
+    @staticmethod
+    def flush(socketio):
+        """
+        Emits all queued presence changes:
+        - one 'presence_update' per online friend (to their personal room)
+        - one 'presence_update' per private channel touched
+        """
+        with PresenceService._pending_lock:
+            pending = PresenceService._pending
+            PresenceService._pending = {}
+        if not pending:
+            return 0
+
+        changes = {uid: {'user_id': uid, 'status': p['status']} for uid, p in pending.items()}
+
+        # Friends of every changed user in one query
+        per_recipient = {}
+        for user_id, friend_id in _friend_pairs(list(changes.keys())):
+            per_recipient.setdefault(friend_id, []).append(changes[user_id])
+
+        online = set(presence_store.online_users())
+        emits = 0
+        for recipient, batch in per_recipient.items():
+            if recipient in online:
+                socketio.emit('presence_update', {'changes': batch}, to=user_room(recipient))
+                emits += 1
+
+        per_channel = {}
+        for uid, p in pending.items():
+            for cid in p['channels']:
+                per_channel.setdefault(cid, []).append(changes[uid])
+        for cid, batch in per_channel.items():
+            socketio.emit('presence_update', {'channel_id': cid, 'changes': batch}, to=str(cid))
+            emits += 1
+        return emits
+
+
+def _friend_pairs(user_ids):
+    """Returns [(user_id, friend_id)] for all accepted friendships of user_ids."""
+    if not user_ids:
+        return []
+    from backend.repository.db_access import fetch_all
+    marks = ", ".join(["%s"] * len(user_ids))
+    rows = fetch_all(f"""
+        SELECT sender_id, receiver_id FROM friend_requests
+        WHERE status = 'accepted' AND (sender_id IN ({marks}) OR receiver_id IN ({marks}))
+    """, tuple(user_ids) * 2)
+    wanted = set(user_ids)
+    pairs = []
+    for r in rows:
+        if r['sender_id'] in wanted:
+            pairs.append((r['sender_id'], r['receiver_id']))
+        if r['receiver_id'] in wanted:
+            pairs.append((r['receiver_id'], r['sender_id']))
+    return pairs
@@ -0,0 +1,99 @@
+from backend.repository.db_access import execute, fetch_all
+
+# -------------------------------------------------------------
+# Unread tracking
+# -------------------------------------------------------------
+# channel_counters is bumped on every insert, and each read marker stores
+# the counter value it corresponds to, so:
+#     unread = message_count - read_count
+# No COUNT(*) over chat_messages on the read path.
+#
+# message_count is cumulative (deletes and archival never lower it), so each
+# message keeps the value it was given (chat_messages.channel_seq) and a
+# partial read snapshots that, not a count of the rows still in the table.
+
+def bump_channel_counter(cursor, channel_id):
+    """
+    Takes the channel's next channel_seq on `cursor`, inside the caller's
+    open transaction. The counter row stays locked until commit, so sends to
+    one channel get their message ids in the same order as their seqs.
+    """
+    # LAST_INSERT_ID(expr) hands this connection the counter value it produced
+    cursor.execute("""
+        INSERT INTO channel_counters (channel_id, message_count, last_message_id)
+        VALUES (%s, LAST_INSERT_ID(1), 0)
+        ON DUPLICATE KEY UPDATE message_count = LAST_INSERT_ID(message_count + 1)
+    """, (channel_id,))
+    return cursor.lastrowid
+
+def mark_read_bulk(user_id, markers):
+    """
+    Moves read markers forward for many channels in one statement.
+
+    markers: iterable of {'channel_id': int, 'message_id': int}
+    Markers never move backwards. When no visible message follows the marker
+    (deleted ones may), the counter is snapshotted directly; otherwise the
+    channel_seq of the newest message at or before the marker is (one
+    indexed probe each).
+    Returns the number of markers applied.
+    """
+    latest = {}
+    for m in markers or []:
+        try:
+            cid, mid = int(m['channel_id']), int(m['message_id'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        latest[cid] = max(mid, latest.get(cid, 0))
+    if not latest:
+        return 0
+
+    rows_sql = " UNION ALL ".join(["SELECT %s AS cid, %s AS mid"] * len(latest))
+    params = [user_id]
+    for cid, mid in latest.items():
+        params.extend([cid, mid])
+
+    # Note: ON DUPLICATE KEY assignments run left to right, so read_count is
+    # decided against the *old* last_read_message_id. Re-reading the same
+    # message may still raise read_count (messages after it were deleted).
+    execute(f"""
+        INSERT INTO channel_read_state (user_id, channel_id, last_read_message_id, read_count)
+        SELECT %s, c.channel_id,
+               LEAST(x.mid, c.last_message_id),
+               CASE WHEN NOT EXISTS (SELECT 1 FROM chat_messages m
+                                     WHERE m.channel_id = c.channel_id AND m.message_id > x.mid
+                                       AND m.is_deleted = FALSE)
+                    THEN c.message_count
+                    ELSE COALESCE((SELECT m.channel_seq FROM chat_messages m
+                                   WHERE m.channel_id = c.channel_id AND m.message_id <= x.mid
+                                     AND m.channel_seq IS NOT NULL
+                                   ORDER BY m.message_id DESC LIMIT 1), 0)
+               END
+        FROM ({rows_sql}) x
+        JOIN channel_counters c ON c.channel_id = x.cid
+        ON DUPLICATE KEY UPDATE
+            read_count = IF(VALUES(last_read_message_id) >= last_read_message_id,
+                            GREATEST(read_count, VALUES(read_count)), read_count),
+            last_read_message_id = GREATEST(last_read_message_id, VALUES(last_read_message_id))
+    """, tuple(params))
+    return len(latest)
+
+def mark_read(user_id, channel_id, message_id):
+    return mark_read_bulk(user_id, [{'channel_id': channel_id, 'message_id': message_id}])
+
+def get_unread_counts(user_id, channel_ids):
+    """Returns {channel_id: unread} for the given channels (single indexed join)."""
+    channel_ids = [int(c) for c in channel_ids]
+    if not channel_ids:
+        return {}
+    marks = ", ".join(["%s"] * len(channel_ids))
+    rows = fetch_all(f"""
+        SELECT c.channel_id,
+               GREATEST(CAST(c.message_count AS SIGNED) - CAST(COALESCE(r.read_count, 0) AS SIGNED), 0) AS unread
+        FROM channel_counters c
+        LEFT JOIN channel_read_state r ON r.channel_id = c.channel_id AND r.user_id = %s
+        WHERE c.channel_id IN ({marks})
+    """, (user_id, *channel_ids))
+    counts = {cid: 0 for cid in channel_ids}
+    for r in rows:
+        counts[r['channel_id']] = int(r['unread'])
+    return counts
@@ -2,6 +2,44 @@
 from backend.repository.db_access import fetch_all, fetch_one
 
 def get_smart_recommendations(user_id, limit=6):
+    """
+    Suggests books based on what similar readers borrowed, wishlisted and
+    rated highly (precomputed item-item similarities, see
+    backend/brain/item_similarity.py). Falls back to category-based SQL
+    until the similarity store has been built.
+    """
+    try:
+        from backend.brain.item_similarity import item_similarity, user_history
+        history = user_history(user_id)
+        # Extra candidates: unavailable books are dropped below
+        picks = item_similarity.recommend(history, limit=limit * 3)
+    except Exception as e:
+        print(f"⚠️ Item similarity unavailable: {e}")
+        picks = None
+    if picks is None:
+        return _category_recommendations(user_id, limit)
+    if not picks:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(picks))
+    rows = fetch_all(f"""
+        SELECT b.book_id, b.title, a.name AS author, b.category, b.cover_url, b.description
+        FROM books b
+        LEFT JOIN authors a ON b.author_id = a.author_id
+        WHERE b.book_id IN ({placeholders}) AND b.available_copies > 0
+    """, tuple(p['book_id'] for p in picks))
+    by_id = {r['book_id']: r for r in rows}
+    results = []
+    for pick in picks:
+        book = by_id.get(pick['book_id'])
+        if book:
+            results.append(dict(book, avg_rating=pick['avg_rating']))
+            if len(results) >= limit:
+                break
+    return results
+
+
+def _category_recommendations(user_id, limit=6):
     """
     Suggests books based on user's borrowing history.
     1. Finds top categories borrowed by user.
@@ -0,0 +1,293 @@
+"""
+retention_service.py
+--------------------
+Chat retention, archival and batched deletes.
+
+- Policy: chat_retention_policies overrides per channel; other channels use
+  CHAT_RETENTION_DAYS with action 'archive'. retain_days = 0 keeps everything,
+  which is the default, so nothing is archived until a policy opts in.
+- Archive: old rows move to monthly tables chat_messages_archive_YYYYMM (by
+  sent_at). chat_archive_segments records each channel's message-id range per
+  month so history paging (get_archived_messages) only reads the tables it needs.
+- Every bulk removal (retention, soft-delete purge, channel delete, admin wipe)
+  runs in CHAT_RETENTION_BATCH_SIZE-row transactions with a short pause in
+  between, so row locks stay short and live chat writes interleave. Blob
+  references and search index entries are released as rows go.
+"""
+
+import re
+import time
+from collections import defaultdict
+
+from backend.config.db import get_connection
+from backend.config.settings import (
+    CHAT_RETENTION_DAYS,
+    CHAT_PURGE_DELETED_AFTER_DAYS,
+    CHAT_RETENTION_BATCH_SIZE,
+    CHAT_RETENTION_PAUSE_MS,
+)
+from backend.repository.db_access import execute, fetch_all, fetch_one
+
+ARCHIVE_PREFIX = 'chat_messages_archive_'
+RETENTION_ACTIONS = ('archive', 'delete')
+
+_MONTH_RE = re.compile(r"^\d{6}$")
+_known_tables = set()
+
+
+def _pause():
+    time.sleep(CHAT_RETENTION_PAUSE_MS / 1000.0)
+
+def _marks(values):
+    return ", ".join(["%s"] * len(values))
+
+def archive_table(month):
+    """'202401' -> chat_messages_archive_202401 (month is validated: it is interpolated into SQL)."""
+    if not _MONTH_RE.match(month):
+        raise ValueError(f"Invalid archive month: {month!r}")
+    return f"{ARCHIVE_PREFIX}{month}"
+
+def ensure_archive_table(month):
+    table = archive_table(month)
+    if table not in _known_tables:
+        # LIKE copies columns and indexes but not foreign keys
+        execute(f"CREATE TABLE IF NOT EXISTS {table} LIKE chat_messages")
+        _known_tables.add(table)
+    return table
+
+def _release_side_effects(rows):
+    from backend.services.file_service import release_blobs_for_urls
+    from backend.services.chat_search_service import unindex_messages
+    release_blobs_for_urls([r['file_url'] for r in rows if r.get('file_url')])
+    unindex_messages([r['message_id'] for r in rows])
+
+
+# ===============================
+# POLICIES
+# ===============================
+
+def get_policy(channel_id):
+    row = fetch_one("SELECT retain_days, action FROM chat_retention_policies WHERE channel_id = %s", (channel_id,))
+    return row or {'retain_days': CHAT_RETENTION_DAYS, 'action': 'archive'}
+
+def set_policy(channel_id, retain_days, action='archive'):
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"action must be one of {RETENTION_ACTIONS}")
+    execute("""
+        INSERT INTO chat_retention_policies (channel_id, retain_days, action)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE retain_days = VALUES(retain_days), action = VALUES(action)
+    """, (channel_id, max(0, int(retain_days)), action))
+
+def get_effective_policies():
+    """[{channel_id, retain_days, action}] for every channel (override or default)."""
+    return fetch_all("""
+        SELECT c.channel_id,
+               COALESCE(p.retain_days, %s) AS retain_days,
+               COALESCE(p.action, 'archive') AS action
+        FROM channels c
+        LEFT JOIN chat_retention_policies p ON p.channel_id = c.channel_id
+    """, (CHAT_RETENTION_DAYS,))
+
+
+# ===============================
+# BATCHED DELETE
+# ===============================
+
+def delete_messages_chunked(where_sql, params=(), batch_size=CHAT_RETENTION_BATCH_SIZE):
+    """
+    Deletes chat_messages matching where_sql in primary-key batches.
+    Replaces single large DELETEs that lock the table. Returns rows deleted.
+    """
+    total = 0
+    while True:
+        rows = fetch_all(f"""
+            SELECT message_id, file_url FROM chat_messages
+            WHERE {where_sql}
+            ORDER BY message_id LIMIT %s
+        """, (*params, batch_size))
+        if not rows:
+            break
+        ids = [r['message_id'] for r in rows]
+        execute(f"DELETE FROM chat_messages WHERE message_id IN ({_marks(ids)})", ids)
+        _release_side_effects(rows)
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+        _pause()
+    return total
+
+def delete_archived_channel(channel_id, batch_size=CHAT_RETENTION_BATCH_SIZE):
+    """Removes a channel's rows from every archive table it has segments in."""
+    from backend.services.file_service import release_blobs_for_urls
+    total = 0
+    for seg in fetch_all("SELECT archive_month FROM chat_archive_segments WHERE channel_id = %s", (channel_id,)):
+        table = archive_table(seg['archive_month'])
+        while True:
+            rows = fetch_all(
+                f"SELECT message_id, file_url FROM {table} WHERE channel_id = %s ORDER BY message_id LIMIT %s",
+                (channel_id, batch_size)
+            )
+            if not rows:
+                break
+            ids = [r['message_id'] for r in rows]
+            execute(f"DELETE FROM {table} WHERE message_id IN ({_marks(ids)})", ids)
+            release_blobs_for_urls([r['file_url'] for r in rows if r['file_url']])
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+            _pause()
+    execute("DELETE FROM chat_archive_segments WHERE channel_id = %s", (channel_id,))
+    return total
+
+def delete_channel_history(channel_id):
+    """All live and archived messages of one channel, in batches."""
+    return delete_messages_chunked("channel_id = %s", (channel_id,)) + delete_archived_channel(channel_id)
+
+def purge_deleted_messages(older_than_days=CHAT_PURGE_DELETED_AFTER_DAYS, batch_size=CHAT_RETENTION_BATCH_SIZE):
+    """Physically removes soft-deleted messages older than older_than_days."""
+    purged = delete_messages_chunked(
+        "is_deleted = TRUE AND sent_at < NOW() - INTERVAL %s DAY", (older_than_days,), batch_size
+    )
+    if purged:
+        print(f"[RETENTION] Purged {purged} soft-deleted messages")
+    return purged
+
+
+# ===============================
+# ARCHIVE
+# ===============================
+
+def _archive_batch(rows):
+    """
+    Moves rows (dicts with message_id, channel_id, sent_at, is_deleted, file_url)
+    in one transaction. Returns the soft-deleted rows that were dropped instead.
+    """
+    by_month = defaultdict(list)
+    doomed = []
+    for r in rows:
+        if r['is_deleted']:
+            doomed.append(r)  # Soft-deleted rows are not worth archiving
+        else:
+            by_month[r['sent_at'].strftime('%Y%m')].append(r['message_id'])
+
+    # DDL commits implicitly, so create tables before the transaction starts
+    tables = {month: ensure_archive_table(month) for month in by_month}
+    channel_id = rows[0]['channel_id']
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for month, ids in by_month.items():
+            cursor.execute(
+                f"INSERT IGNORE INTO {tables[month]} SELECT * FROM chat_messages WHERE message_id IN ({_marks(ids)})",
+                ids
+            )
+            cursor.execute("""
+                INSERT INTO chat_archive_segments (channel_id, archive_month, min_message_id, max_message_id, message_count)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    min_message_id = LEAST(min_message_id, VALUES(min_message_id)),
+                    max_message_id = GREATEST(max_message_id, VALUES(max_message_id)),
+                    message_count = message_count + VALUES(message_count)
+            """, (channel_id, month, min(ids), max(ids), len(ids)))
+        all_ids = [r['message_id'] for r in rows]
+        cursor.execute(f"DELETE FROM chat_messages WHERE message_id IN ({_marks(all_ids)})", all_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return doomed
+
+def archive_channel(channel_id, retain_days, batch_size=CHAT_RETENTION_BATCH_SIZE):
+    """
+    Archives messages older than retain_days, oldest first.
+    Walks the (channel_id, message_id) index; ids grow with time, so the scan
+    stops at the first message inside the retention window.
+    """
+    from backend.services.file_service import release_blobs_for_urls
+    from backend.services.chat_search_service import unindex_messages
+    total = 0
+    while True:
+        rows = fetch_all("""
+            SELECT message_id, channel_id, sent_at, is_deleted, file_url,
+                   sent_at < NOW() - INTERVAL %s DAY AS expired
+            FROM chat_messages
+            WHERE channel_id = %s
+            ORDER BY message_id LIMIT %s
+        """, (retain_days, channel_id, batch_size))
+        expired = []
+        for r in rows:
+            if not r['expired']:
+                break
+            expired.append(r)
+        if not expired:
+            break
+        doomed = _archive_batch(expired)
+        # Archived attachments stay referenced; only dropped rows release theirs
+        release_blobs_for_urls([r['file_url'] for r in doomed if r['file_url']])
+        # Search hydrates from the live table only
+        unindex_messages([r['message_id'] for r in expired])
+        total += len(expired)
+        if len(expired) < batch_size:
+            break
+        _pause()
+    return total
+
+def run_retention():
+    """Nightly job: apply every channel's policy, then purge old soft-deleted rows."""
+    archived = deleted = 0
+    for p in get_effective_policies():
+        if not p['retain_days']:
+            continue
+        try:
+            if p['action'] == 'delete':
+                deleted += delete_messages_chunked(
+                    "channel_id = %s AND sent_at < NOW() - INTERVAL %s DAY", (p['channel_id'], p['retain_days'])
+                )
+            else:
+                archived += archive_channel(p['channel_id'], p['retain_days'])
+        except Exception as e:
+            print(f"[RETENTION] Channel {p['channel_id']} failed: {e}")
+    purged = purge_deleted_messages()
+    if archived or deleted:
+        print(f"[RETENTION] Archived {archived}, deleted {deleted} messages")
+    return {'archived': archived, 'deleted': deleted, 'purged': purged}
+
+
+# ===============================
+# READ (history paging)
+# ===============================
+
+def get_archived_messages(channel_id, before_id=None, limit=50):
+    """
+    Archived messages for a channel, newest first, with message_id < before_id.
+    Same columns as channel_service.get_channel_messages.
+    """
+    segments = fetch_all("""
+        SELECT archive_month FROM chat_archive_segments
+        WHERE channel_id = %s AND (%s IS NULL OR min_message_id < %s)
+        ORDER BY max_message_id DESC
+    """, (channel_id, before_id, before_id))
+
+    messages = []
+    for seg in segments:
+        table = archive_table(seg['archive_month'])
+        rows = fetch_all(f"""
+            SELECT
+                m.message_id, m.message_text as content, m.file_url, m.sent_at as created_at, m.sender_type,
+                u.user_id as sender_id, u.name as sender_name, u.profile_pic as sender_pic,
+                ca.anon_id
+            FROM {table} m
+            LEFT JOIN chat_anon_id ca ON m.anon_id = ca.anon_id
+            LEFT JOIN users u ON ca.user_id = u.user_id
+            WHERE m.channel_id = %s AND (%s IS NULL OR m.message_id < %s)
+            ORDER BY m.message_id DESC LIMIT %s
+        """, (channel_id, before_id, before_id, limit - len(messages)))
+        messages.extend(rows)
+        if len(messages) >= limit:
+            break
+    return messages
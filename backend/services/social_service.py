@@ -1,5 +1,6 @@
 from backend.repository.db_access import execute, fetch_all, fetch_one
 from backend.services.chat_service import get_or_create_dm_room
+from backend.services.image_service import avatar_variant
 
 def send_friend_request(sender_id, search_query):
     """Sends a friend request from one user to another. search_query can be user_id or anon_id."""
@@ -52,12 +53,15 @@ def send_friend_request(sender_id, search_query):
 
 def get_pending_requests(user_id):
     """Gets all pending friend requests for a user."""
-    return fetch_all("""
+    rows = fetch_all("""
         SELECT f.id, f.sender_id, u.name as sender_name, u.profile_pic as sender_pic
         FROM friend_requests f
         JOIN users u ON f.sender_id = u.user_id
         WHERE f.receiver_id = %s AND f.status = 'pending'
     """, (user_id,))
+    for r in rows:
+        r['sender_pic'] = avatar_variant(r['sender_pic'])
+    return rows
 
 def get_friends_list(user_id):
     """Gets the list of friends for a user."""
@@ -117,7 +121,7 @@ def get_leaderboard(limit=50):
     from datetime import datetime
     year = datetime.now().year
     
-    return fetch_all("""
+    rows = fetch_all("""
         SELECT 
             u.user_id, u.name, u.profile_pic, u.tier,
             COALESCE(rg.current_books, 0) as books_read,
@@ -128,6 +132,10 @@ def get_leaderboard(limit=50):
         ORDER BY books_read DESC, goal_books DESC
         LIMIT %s
     """, (year, limit))
+    # 48px avatars: serve the small WebP variant, not the full upload
+    for r in rows:
+        r['profile_pic'] = avatar_variant(r['profile_pic'])
+    return rows
 
 def get_public_profile(target_user_id, viewer_id):
     """
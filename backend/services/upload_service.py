@@ -0,0 +1,188 @@
+"""
+upload_service.py
+-----------------
+Chunked, resumable chat uploads on top of the content-addressed blob store.
+
+Flow:
+1. create_upload(filename, size, sha256?)  -> a hit on a blob this user uploaded
+                                              before completes instantly,
+                                              otherwise returns an upload_id
+2. append_chunk(upload_id, offset, stream) -> streamed to <id>.part while hashing
+3. last chunk                               -> blob committed, part removed;
+                                              <id>.json keeps the result for
+                                              retries until gc_temp_files
+A dropped connection is resumed with get_upload_status() (returns the offset).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from backend.config.settings import UPLOAD_TEMP_DIR, CHAT_UPLOAD_MAX_BYTES, CHAT_UPLOAD_CHUNK_BYTES
+from backend.services.file_service import (
+    allowed_file, file_extension, acquire_blob, commit_blob, find_blob, find_owned_blob, stream_to_temp,
+    UploadTooLarge, IMAGE_EXTENSIONS, COPY_BUFFER
+)
+from backend.services.image_service import process_attachment
+
+# upload_id -> (hasher, offset_hashed). Lost on restart / other worker: rebuilt from disk.
+# Entries of abandoned uploads are dropped by forget_stale_uploads().
+_hashers = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def _paths(upload_id):
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError("Invalid upload id", 404)
+    base = os.path.join(UPLOAD_TEMP_DIR, upload_id)
+    return base + '.json', base + '.part'
+
+def _lock_for(upload_id):
+    with _registry_lock:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+def _load_meta(user_id, upload_id):
+    meta_path, part_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise UploadError("Upload not found or expired", 404)
+    if meta['user_id'] != user_id:
+        raise UploadError("Upload not found or expired", 404)
+    return meta, part_path
+
+def forget_stale_uploads():
+    """Drops in-memory state of uploads whose temp files are gone (see gc_temp_files)."""
+    with _registry_lock:
+        for upload_id in set(_hashers) | set(_locks):
+            if os.path.exists(_paths(upload_id)[0]):
+                continue
+            _hashers.pop(upload_id, None)
+            lock = _locks.get(upload_id)
+            if lock and not lock.locked():
+                del _locks[upload_id]
+
+def _completed(blob, filename, deduplicated):
+    ext = blob['ext']
+    is_image = ext in IMAGE_EXTENSIONS
+    return {
+        'complete': True,
+        'url': blob['path'],
+        'thumb_url': process_attachment(blob['path']) if is_image else None,
+        'filename': filename,
+        'ext': f".{ext}",
+        'is_image': is_image,
+        'sha256': blob['sha256'],
+        'size': blob['size'],
+        'deduplicated': deduplicated
+    }
+
+def create_upload(user_id, filename, size, sha256=None):
+    if not filename or not allowed_file(filename):
+        raise UploadError("Invalid file type.")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("File size required")
+    if size <= 0 or size > CHAT_UPLOAD_MAX_BYTES:
+        raise UploadError(f"File must be between 1 byte and {CHAT_UPLOAD_MAX_BYTES // (1024 * 1024)} MB", 413)
+
+    # Same bytes already uploaded by this user -> done, no transfer needed.
+    # Only the user's own blobs count: anyone else would learn whether a file
+    # with that hash exists on the server.
+    if sha256:
+        owned = find_owned_blob(user_id, sha256.lower())
+        if owned and owned['size'] == size:
+            blob = acquire_blob(owned['sha256'])
+            if blob:
+                return _completed(blob, filename, deduplicated=True)
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = _paths(upload_id)
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    with open(meta_path, 'w') as f:
+        json.dump({'user_id': user_id, 'filename': filename, 'size': size, 'ext': file_extension(filename)}, f)
+    open(part_path, 'wb').close()
+    return {'complete': False, 'upload_id': upload_id, 'offset': 0, 'chunk_size': CHAT_UPLOAD_CHUNK_BYTES}
+
+def _finished(meta):
+    """The completed response of an upload that was already finalized."""
+    blob = find_blob(meta['sha256'])
+    if not blob:
+        raise UploadError("Upload not found or expired", 404)
+    return _completed(blob, meta['filename'], deduplicated=meta['deduplicated'])
+
+def get_upload_status(user_id, upload_id):
+    meta, part_path = _load_meta(user_id, upload_id)
+    if meta.get('sha256'):
+        return _finished(meta)
+    return {'complete': False, 'upload_id': upload_id, 'offset': os.path.getsize(part_path), 'size': meta['size']}
+
+def _hasher_at(upload_id, part_path, offset):
+    """Incremental hasher positioned at `offset`, rebuilt from the part file if needed."""
+    cached = _hashers.get(upload_id)
+    if cached and cached[1] == offset:
+        return cached[0]
+    hasher = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        remaining = offset
+        while remaining:
+            piece = f.read(min(COPY_BUFFER, remaining))
+            if not piece:
+                break
+            hasher.update(piece)
+            remaining -= len(piece)
+    return hasher
+
+def append_chunk(user_id, upload_id, offset, stream):
+    """Appends one chunk at `offset`; finalizes on the last byte."""
+    _paths(upload_id)
+    with _lock_for(upload_id):
+        # Loaded under the lock: a retried last chunk may have waited for the
+        # first attempt to finalize (part moved into the blob store)
+        meta, part_path = _load_meta(user_id, upload_id)
+        if meta.get('sha256'):
+            return _finished(meta)
+        try:
+            current = os.path.getsize(part_path)
+        except FileNotFoundError:
+            raise UploadError("Upload not found or expired", 404)
+        if offset != current:
+            # Client and server disagree (retry after partial write): tell it where to resume
+            raise UploadError("Offset mismatch", 409, offset=current)
+
+        hasher = _hasher_at(upload_id, part_path, current)
+        limit = min(CHAT_UPLOAD_CHUNK_BYTES, meta['size'] - current)
+        try:
+            written = stream_to_temp(stream, part_path, hasher, limit=limit, mode='ab')
+        except UploadTooLarge:
+            # Roll back the oversized chunk so the upload can resume cleanly
+            with open(part_path, 'r+b') as f:
+                f.truncate(current)
+            _hashers.pop(upload_id, None)
+            raise UploadError("Chunk too large", 413, offset=current)
+
+        offset = current + written
+        if offset < meta['size']:
+            _hashers[upload_id] = (hasher, offset)
+            return {'complete': False, 'upload_id': upload_id, 'offset': offset}
+
+        _hashers.pop(upload_id, None)
+        digest = hasher.hexdigest()
+        existed = find_blob(digest) is not None
+        blob = commit_blob(part_path, digest, offset, meta['ext'], user_id)
+        meta.update(sha256=digest, deduplicated=existed)
+        with open(_paths(upload_id)[0], 'w') as f:
+            json.dump(meta, f)
+    return _completed(blob, meta['filename'], deduplicated=existed)
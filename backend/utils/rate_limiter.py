@@ -1,42 +1,200 @@
-import time
+import os
+import sqlite3
 import threading
-from collections import defaultdict
+import time
+import zlib
+from collections import OrderedDict
 
-class RateLimiter:
+from backend.config.settings import (
+    RATE_LIMIT_POLICIES,
+    RATE_LIMIT_STORE,
+    RATE_LIMIT_STRIPES,
+    RATE_LIMIT_MAX_KEYS,
+)
+
+
+class RateLimitPolicy:
     """
-    In-Memory Rate Limiter using Token Bucket / Sliding Window.
+    Token bucket parameters: `rate` requests per `per` seconds (burst = rate).
     """
+    __slots__ = ('rate', 'per', 'refill_per_sec')
+
+    def __init__(self, rate, per):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.refill_per_sec = self.rate / self.per
+
+    def __repr__(self):
+        return f"RateLimitPolicy({self.rate:g}/{self.per:g}s)"
+
+
+# Built-in policies; RATE_LIMIT_POLICIES ("name=rate/per,...") overrides/extends them
+DEFAULT_POLICIES = {
+    'default': RateLimitPolicy(5, 2.0),
+    'chat:message': RateLimitPolicy(5, 2.0),
+    'chat:typing': RateLimitPolicy(10, 5.0),
+    'chat:upload': RateLimitPolicy(10, 60.0),
+    'chat:moderation': RateLimitPolicy(20, 60.0),
+}
+
+
+def parse_policies(spec):
+    """Parses 'chat:message=5/2,chat:upload=10/60' into {name: RateLimitPolicy}."""
+    policies = {}
+    for item in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, value = item.partition("=")
+        rate, _, per = value.partition("/")
+        policies[name.strip()] = RateLimitPolicy(float(rate), float(per or 1))
+    return policies
+
+
+class _Stripe:
+    __slots__ = ('lock', 'buckets')
+
     def __init__(self):
-        # Key -> (tokens, last_refill)
-        self.buckets = defaultdict(lambda: (5, time.time())) 
         self.lock = threading.Lock()
-        
-        # Rate: 5 requests per 2 seconds
-        self.rate = 5
-        self.per = 2.0 
-
-    def check(self, key):
-        with self.lock:
-            now = time.time()
-            tokens, last_refill = self.buckets[key]
-            
-            # Refill
-            elapsed = now - last_refill
-            refill = int(elapsed * (self.rate / self.per))
-            
-            if refill > 0:
-                tokens = min(self.rate, tokens + refill)
-                last_refill = now
-            
-            # Consume
-            if tokens >= 1:
-                self.buckets[key] = (tokens - 1, last_refill)
-                return True
+        # key -> [tokens, last_refill]; insertion order == recency (LRU)
+        self.buckets = OrderedDict()
+
+
+class RateLimiter:
+    """
+    In-Memory Rate Limiter using Token Bucket.
+
+    - Lock striping: keys hash onto N independent stripes, so unrelated
+      users/channels never contend on the same lock.
+    - Bounded memory: a bucket that has been idle long enough to refill
+      completely is indistinguishable from a new one and is evicted; each
+      stripe is also capped (LRU) at max_keys / stripes entries.
+    """
+    def __init__(self, policies=None, stripes=RATE_LIMIT_STRIPES, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.policies = dict(DEFAULT_POLICIES)
+        self.policies.update(policies or {})
+        self.stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self.max_per_stripe = max(1, max_keys // len(self.stripes))
+        # Conservative idle horizon: the slowest policy refills fully within its `per`
+        self._max_per = max(p.per for p in self.policies.values())
+
+    def _stripe(self, key):
+        return self.stripes[zlib.crc32(key.encode()) % len(self.stripes)]
+
+    def policy(self, name):
+        return self.policies.get(name) or self.policies['default']
+
+    def check(self, key, policy='default'):
+        pol = self.policy(policy)
+        stripe = self._stripe(key)
+        now = time.monotonic()
+        with stripe.lock:
+            buckets = stripe.buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = [pol.rate, now]
+                buckets[key] = bucket
             else:
-                self.buckets[key] = (tokens, last_refill)
-                return False
+                buckets.move_to_end(key)
+                # Refill (fractional tokens carry over)
+                bucket[0] = min(pol.rate, bucket[0] + (now - bucket[1]) * pol.refill_per_sec)
+                bucket[1] = now
+
+            allowed = bucket[0] >= 1
+            if allowed:
+                bucket[0] -= 1
+
+            self._evict(buckets, now)
+            return allowed
+
+    def _evict(self, buckets, now):
+        """Drops least-recently-used buckets that are idle or over the cap."""
+        while buckets:
+            oldest_key = next(iter(buckets))
+            if len(buckets) > self.max_per_stripe:
+                buckets.popitem(last=False)
+                continue
+            if now - buckets[oldest_key][1] > self._max_per:
+                buckets.popitem(last=False)
+                continue
+            break
+
+    def size(self):
+        return sum(len(s.buckets) for s in self.stripes)
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    Shared-store variant: buckets live in one SQLite file so limits hold
+    across all workers on the host. Each check is a single short
+    BEGIN IMMEDIATE transaction.
+    """
+    def __init__(self, path, policies=None, **kwargs):
+        super().__init__(policies, **kwargs)
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                bucket_key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                last_refill REAL NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def check(self, key, policy='default'):
+        pol = self.policy(policy)
+        now = time.time()  # wall clock: shared between processes
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, last_refill FROM rate_buckets WHERE bucket_key = ?", (key,)
+            ).fetchone()
+            tokens = pol.rate if row is None else min(pol.rate, row[0] + (now - row[1]) * pol.refill_per_sec)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (bucket_key, tokens, last_refill) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            # Idle buckets are full again; deleting them is lossless
+            if now - self._last_purge > self._max_per:
+                self._last_purge = now
+                conn.execute("DELETE FROM rate_buckets WHERE last_refill < ?", (now - self._max_per,))
+            conn.execute("COMMIT")
+            return allowed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def size(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+
+def create_rate_limiter(url=None, **kwargs):
+    """'' = per-process striped limiter; 'sqlite:///path' = shared across workers."""
+    url = RATE_LIMIT_STORE if url is None else url
+    policies = parse_policies(RATE_LIMIT_POLICIES)
+    if not url:
+        return RateLimiter(policies, **kwargs)
+    if url.startswith('sqlite://'):
+        path = url[len('sqlite://'):]
+        return SQLiteRateLimiter(path if path.startswith('/') else os.path.abspath(path), policies, **kwargs)
+    raise ValueError(f"Unsupported RATE_LIMIT_STORE: {url!r}")
+
 
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter()
 
-def check_rate_limit(key):
-    return rate_limiter.check(key)
+def check_rate_limit(key, policy='default'):
+    return rate_limiter.check(key, policy)
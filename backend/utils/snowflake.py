@@ -56,3 +56,7 @@ snowflake = SnowflakeGenerator(machine_id=1)
 
 def generate_id():
     return snowflake.next_id()
+
+def id_timestamp_ms(snowflake_id):
+    """Creation time (epoch ms) embedded in an ID from this generator."""
+    return (snowflake_id >> snowflake.timestamp_shift) + snowflake.epoch
@@ -0,0 +1,35 @@
+"""
+gunicorn.conf.py
+----------------
+Loaded automatically by `gunicorn run:app` (see Procfile).
+
+SOCKETIO_ASYNC_MODE selects the worker type:
+- threading (default): gthread worker, GUNICORN_THREADS concurrent requests/sockets
+- gevent:   gevent-websocket worker, GUNICORN_WORKER_CONNECTIONS greenlets
+- eventlet: eventlet worker, GUNICORN_WORKER_CONNECTIONS greenlets
+
+Socket.IO polling needs sticky sessions, so keep one worker per port unless a
+load balancer provides them and SOCKETIO_MESSAGE_QUEUE is set.
+"""
+
+import os
+
+async_mode = os.environ.setdefault("SOCKETIO_ASYNC_MODE", "threading").strip().lower()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+
+if async_mode == "gevent":
+    worker_class = "geventwebsocket.gunicorn.workers.GeventWebSocketWorker"
+    worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 2000))
+elif async_mode == "eventlet":
+    worker_class = "eventlet"
+    worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 2000))
+else:
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 100))
+
+# Long-lived WebSockets: a quiet connection is not a hung worker
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,114 @@
+"""
+Benchmark: AI brain startup cost, lazy import vs loaded models.
+
+Each measurement runs in a fresh interpreter:
+
+- import:  `from backend.brain.orchestrator import brain` (what every worker
+           pays when a route module touches the brain; models stay unloaded)
+- warm:    import + brain.warm_up(), timed until both the LLM backend and
+           the RAG engine report ready (what every worker paid at import
+           before loading became lazy)
+- query:   warm + one brain.process_message(--query)
+
+Reports wall time and RSS per stage (median over --repeat runs). Without
+chromadb / sentence-transformers / transformers installed the warm stage
+measures the failed load and the brain falls back to rule-based answers.
+
+Usage:
+    python scripts/benchmarks/bench_brain_startup.py --repeat 3
+    python scripts/benchmarks/bench_brain_startup.py --stages import warm --json results.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Add project root to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+STAGES = ("import", "warm", "query")
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def child(stage, query):
+    """Runs one stage in this (fresh) process and prints a JSON result line."""
+    result = {"stage": stage}
+    start = time.perf_counter()
+    from backend.brain.orchestrator import brain
+    result["import_secs"] = round(time.perf_counter() - start, 3)
+
+    if stage in ("warm", "query"):
+        brain.warm_up()
+        while not brain.is_ready():
+            time.sleep(0.01)
+        result["ready_secs"] = round(time.perf_counter() - start, 3)
+        result["status"] = brain.status()
+
+    if stage == "query":
+        q_start = time.perf_counter()
+        brain.process_message(query)
+        result["query_secs"] = round(time.perf_counter() - q_start, 3)
+
+    result["total_secs"] = round(time.perf_counter() - start, 3)
+    result["rss_mb"] = rss_mb()
+    print(json.dumps(result), flush=True)
+
+
+def run_stage(stage, query):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", stage, "--query", query],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"{stage} run failed: {out.stderr.strip()[-500:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--query", default="Recommend a mystery novel")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.query)
+        return
+
+    results = {}
+    for stage in args.stages:
+        runs = [run_stage(stage, args.query) for _ in range(args.repeat)]
+        summary = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("import_secs", "ready_secs", "query_secs", "total_secs", "rss_mb")
+            if all(r.get(key) is not None for r in runs)
+        }
+        summary["status"] = runs[-1].get("status")
+        results[stage] = summary
+        print(f"{stage:>7}: " + ", ".join(f"{k} {v}" for k, v in summary.items() if k != "status"), flush=True)
+        if summary.get("status"):
+            print(f"         llm {summary['status']['llm']['state']}, rag {summary['status']['rag']['state']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
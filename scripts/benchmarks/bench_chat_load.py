@@ -0,0 +1,466 @@
+"""
+Load generator: many simulated chat members against a running server.
+
+Each simulated client goes through the real flow:
+
+1. POST /login (form login, session cookie)
+2. Socket.IO connect with that cookie, 'join_channel' (waits for 'message_history')
+3. 'send_message' at --rate per second for --duration seconds
+
+Every message carries its send time, so the script measures
+- ack latency:      sender's own 'receive_message' (IngestionService round trip)
+- delivery latency: fan-out to the other members of the channel
+- errors:           'error' events by message (rate limited, validation, DB)
+
+Clients are spread over --channels channels and --procs client processes
+(one asyncio loop each). Results go to stdout and, with --json, to a file
+that also records the config and git revision, for tracking regressions.
+With --admin-email the server's /admin/api/metrics/socketio snapshot is
+attached too.
+
+There is no embedded database: the server uses the DB configured in .env.
+--seed creates the load-test users and channels there (use a scratch DB);
+--start-server launches `gunicorn -c gunicorn.conf.py run:app` on --port
+with the same environment. The default chat:message limit (5 per 2 s per
+user and channel) applies unless --server-env RATE_LIMIT_POLICIES=... is given.
+
+Needs aiohttp (python-socketio's asyncio client) on the client side.
+
+Usage:
+    python scripts/benchmarks/bench_chat_load.py --seed --clients 2000 --channels 20
+    python scripts/benchmarks/bench_chat_load.py --start-server --mode gevent --clients 2000 --channels 20 \\
+        --rate 0.2 --duration 60 --procs 4 --json results/chat_load.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+# Add project root to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+USER_EMAIL = "loadtest_{}@load.test"
+CHANNEL_NAME = "loadtest-{}"
+SAMPLE_CAP = 200000  # Latency samples kept per process (reservoir)
+
+
+# -------------------------------
+# SEEDING
+# -------------------------------
+def seed(clients, channels, password):
+    """Creates (or resets) load-test users and public channels. Returns channel ids."""
+    from backend.repository.db_access import execute, fetch_all, fetch_one
+    from backend.services.channel_service import create_channel
+    from backend.utils.security import hash_password
+
+    p_hash = hash_password(password)  # One bcrypt hash shared by every load-test user
+    existing = {r['email'] for r in fetch_all("SELECT email FROM users WHERE email LIKE %s", ("loadtest_%@load.test",))}
+    created = 0
+    for i in range(clients):
+        email = USER_EMAIL.format(i)
+        if email in existing:
+            execute("UPDATE users SET password_hash = %s, must_change_password = 0 WHERE email = %s", (p_hash, email))
+        else:
+            execute(
+                "INSERT INTO users (name, email, password_hash, role, must_change_password) VALUES (%s, %s, %s, 'member', 0)",
+                (f"Load Tester {i}", email, p_hash)
+            )
+            created += 1
+
+    channel_ids = []
+    for k in range(channels):
+        row = fetch_one("SELECT channel_id FROM channels WHERE name = %s AND guild_id IS NULL", (CHANNEL_NAME.format(k),))
+        channel_ids.append(row['channel_id'] if row else create_channel(None, None, CHANNEL_NAME.format(k)))
+    print(f"Seeded {clients} users ({created} new) and channels {channel_ids}")
+    return channel_ids
+
+
+def lookup_channels(channels):
+    from backend.repository.db_access import fetch_all
+    names = [CHANNEL_NAME.format(k) for k in range(channels)]
+    rows = fetch_all(
+        f"SELECT channel_id FROM channels WHERE guild_id IS NULL AND name IN ({', '.join(['%s'] * len(names))}) ORDER BY channel_id",
+        names
+    )
+    return [r['channel_id'] for r in rows]
+
+
+# -------------------------------
+# SERVER
+# -------------------------------
+def start_server(port, mode, extra_env):
+    env = dict(os.environ, PORT=str(port), SOCKETIO_ASYNC_MODE=mode)
+    env.update(extra_env)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "run:app"], cwd=ROOT, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("server did not start within 60s")
+
+
+# -------------------------------
+# CLIENT
+# -------------------------------
+class Samples:
+    """Reservoir sample of latencies (seconds) plus an exact count."""
+
+    def __init__(self, cap=SAMPLE_CAP):
+        self.cap = cap
+        self.count = 0
+        self.values = []
+
+    def add(self, value):
+        self.count += 1
+        if len(self.values) < self.cap:
+            self.values.append(value)
+        else:
+            j = random.randrange(self.count)
+            if j < self.cap:
+                self.values[j] = value
+
+
+def parse_stamp(content):
+    """'lt <client> <seq> <epoch>' -> (client, seq, epoch) or None for foreign messages."""
+    if not content or not content.startswith("lt "):
+        return None
+    try:
+        _, client, seq, sent = content.split(" ", 3)
+        return int(client), int(seq), float(sent)
+    except ValueError:
+        return None
+
+
+def decode_messages(data):
+    """receive_message payload (JSON dict or compact wire frame) -> [(content, is_me)]."""
+    if isinstance(data, dict):
+        return [(data.get('content'), data.get('sender_type') == 'me')]
+    from backend.chat.wire_format import FLAG_ME, MESSAGE_FIELDS
+    import msgpack
+    frame = msgpack.unpackb(data, raw=False)
+    content_idx, flags_idx = MESSAGE_FIELDS.index('content'), MESSAGE_FIELDS.index('flags')
+    return [(row[content_idx], bool(row[flags_idx] & FLAG_ME)) for row in frame['messages']]
+
+
+class Stats:
+    def __init__(self):
+        self.login = Samples()
+        self.join = Samples()
+        self.ack = Samples()
+        self.delivery = Samples()
+        self.failures = Counter()       # stage -> count
+        self.errors = Counter()         # server 'error' message -> count
+        self.sent = 0
+        self.settled = 0                # clients that joined or failed setup
+        self.acked_by_channel = Counter()
+        self.joined_by_channel = Counter()
+
+
+async def run_client(idx, args, channel_id, stats, start_event, clock):
+    import aiohttp
+    import socketio
+
+    t0 = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.post(f"{args.url}/login", allow_redirects=False,
+                                 data={"email": USER_EMAIL.format(idx), "password": args.password}) as resp:
+                if resp.status != 302:
+                    raise RuntimeError(f"login returned HTTP {resp.status}")
+                cookie = "; ".join(f"{k}={v.value}" for k, v in resp.cookies.items())
+    except Exception:
+        stats.failures['login'] += 1
+        stats.settled += 1
+        return None
+    stats.login.add(time.perf_counter() - t0)
+
+    sio = socketio.AsyncClient(reconnection=False)
+    history = asyncio.Event()
+    pending = {}  # seq -> sent perf_counter
+
+    @sio.on('message_history')
+    async def on_history(data):
+        history.set()
+
+    @sio.on('receive_message')
+    async def on_message(data):
+        now = time.time()
+        for content, is_me in decode_messages(data):
+            stamp = parse_stamp(content)
+            if stamp is None:
+                continue
+            sender, seq, sent = stamp
+            if is_me and sender == idx:
+                started = pending.pop(seq, None)
+                if started is not None:
+                    stats.ack.add(time.perf_counter() - started)
+                    stats.acked_by_channel[channel_id] += 1
+            elif sender != idx:
+                stats.delivery.add(now - sent)
+
+    @sio.on('error')
+    async def on_error(data):
+        stats.errors[(data or {}).get('message', 'unknown')] += 1
+
+    t0 = time.perf_counter()
+    try:
+        await sio.connect(args.url, headers={"Cookie": cookie}, transports=[args.transport], wait_timeout=30)
+        await sio.emit('join_channel', {'channel_id': channel_id, 'wire': args.wire})
+        await asyncio.wait_for(history.wait(), timeout=30)
+    except Exception:
+        stats.failures['join'] += 1
+        stats.settled += 1
+        await sio.disconnect()
+        return None
+    stats.join.add(time.perf_counter() - t0)
+    stats.joined_by_channel[channel_id] += 1
+    stats.settled += 1
+
+    await start_event.wait()
+    await asyncio.sleep(random.random() / args.rate)
+    seq = 0
+    while time.time() < clock['stop_at']:
+        seq += 1
+        pending[seq] = time.perf_counter()
+        try:
+            await sio.emit('send_message', {'channel_id': channel_id, 'message': f"lt {idx} {seq} {time.time():.6f}"})
+            stats.sent += 1
+        except Exception:
+            stats.failures['send'] += 1
+        # Poisson arrivals at --rate per client
+        await asyncio.sleep(random.expovariate(args.rate))
+    return sio
+
+
+async def run_slice(indices, args, channel_ids, ready, go, start_at):
+    stats = Stats()
+    start_event = asyncio.Event()
+    clock = {}
+    loop = asyncio.get_running_loop()
+
+    # Logins/joins in waves so the connect storm does not overlap the measurement
+    clients = []
+    for i in range(0, len(indices), args.wave):
+        clients.extend(
+            asyncio.ensure_future(run_client(idx, args, channel_ids[idx % len(channel_ids)], stats, start_event, clock))
+            for idx in indices[i:i + args.wave]
+        )
+        await asyncio.sleep(args.wave_pause)
+    while stats.settled < len(indices):
+        await asyncio.sleep(0.2)
+    ready.put(os.getpid())
+
+    # Common start across processes
+    await loop.run_in_executor(None, go.wait)
+    clock['stop_at'] = start_at.value + args.duration
+    start_event.set()
+
+    sockets = [s for s in await asyncio.gather(*clients) if s is not None]
+    await asyncio.sleep(args.drain)  # Late deliveries
+    await asyncio.gather(*(s.disconnect() for s in sockets), return_exceptions=True)
+    return stats
+
+
+def client_process(indices, args, channel_ids, ready, go, start_at, out):
+    raise_fd_limit()
+    stats = asyncio.run(run_slice(indices, args, channel_ids, ready, go, start_at))
+    out.put({
+        'login': stats.login.values, 'login_n': stats.login.count,
+        'join': stats.join.values, 'join_n': stats.join.count,
+        'ack': stats.ack.values, 'ack_n': stats.ack.count,
+        'delivery': stats.delivery.values, 'delivery_n': stats.delivery.count,
+        'failures': dict(stats.failures),
+        'errors': dict(stats.errors),
+        'sent': stats.sent,
+        'acked_by_channel': dict(stats.acked_by_channel),
+        'joined_by_channel': dict(stats.joined_by_channel),
+    })
+
+
+# -------------------------------
+# REPORTING
+# -------------------------------
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def latency_summary(values, count):
+    values = sorted(values)
+
+    def pct(p):
+        if not values:
+            return None
+        return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 2)
+
+    return {'count': count, 'p50_ms': pct(50), 'p90_ms': pct(90), 'p95_ms': pct(95),
+            'p99_ms': pct(99), 'max_ms': round(values[-1] * 1000, 2) if values else None}
+
+
+def fetch_server_metrics(args):
+    """Socket.IO metrics snapshot from the admin endpoint (None without admin credentials)."""
+    if not args.admin_email:
+        return None
+    import requests
+    with requests.Session() as http:
+        http.post(f"{args.url}/login", data={"email": args.admin_email, "password": args.admin_password},
+                  allow_redirects=False, timeout=10)
+        resp = http.get(f"{args.url}/admin/api/metrics/socketio", timeout=10)
+        if resp.status_code != 200:
+            return {'error': f"HTTP {resp.status_code}"}
+        return resp.json().get('metrics')
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def merge(parts, args, started, elapsed):
+    merged = defaultdict(list)
+    counts = Counter()
+    failures, errors = Counter(), Counter()
+    acked, joined = Counter(), Counter()
+    sent = 0
+    for p in parts:
+        for key in ('login', 'join', 'ack', 'delivery'):
+            merged[key].extend(p[key])
+            counts[key] += p[f'{key}_n']
+        failures.update(p['failures'])
+        errors.update(p['errors'])
+        acked.update(p['acked_by_channel'])
+        joined.update(p['joined_by_channel'])
+        sent += p['sent']
+
+    # Every acked message should reach every other joined member of its channel
+    expected = sum(n * max(0, joined[cid] - 1) for cid, n in acked.items())
+    rejected = sum(errors.values())
+    return {
+        'config': {k: v for k, v in vars(args).items() if 'password' not in k},
+        'git_revision': git_revision(),
+        'started_at': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        'clients': {
+            'requested': args.clients,
+            'joined': sum(joined.values()),
+            'failures': dict(failures),
+        },
+        'login': latency_summary(merged['login'], counts['login']),
+        'join': latency_summary(merged['join'], counts['join']),
+        'messages': {
+            'sent': sent,
+            'acked': counts['ack'],
+            'rejected': rejected,
+            'error_rate': round(rejected / sent, 4) if sent else None,
+            'errors': dict(errors.most_common()),
+            'ingest_per_sec': round(counts['ack'] / elapsed, 1),
+        },
+        'ack_latency': latency_summary(merged['ack'], counts['ack']),
+        'delivery': dict(
+            latency_summary(merged['delivery'], counts['delivery']),
+            expected=expected,
+            ratio=round(counts['delivery'] / expected, 4) if expected else None,
+            per_sec=round(counts['delivery'] / elapsed, 1),
+        ),
+    }
+
+
+def print_report(r):
+    m, a, d = r['messages'], r['ack_latency'], r['delivery']
+    print(f"clients: {r['clients']['joined']}/{r['clients']['requested']} joined, failures {r['clients']['failures']}")
+    print(f"login p50 {r['login']['p50_ms']} ms, join p50 {r['join']['p50_ms']} p99 {r['join']['p99_ms']} ms")
+    print(f"messages: {m['sent']} sent, {m['acked']} acked ({m['ingest_per_sec']}/s), "
+          f"{m['rejected']} rejected ({m['error_rate']}) {m['errors']}")
+    print(f"ack latency:      p50 {a['p50_ms']} p95 {a['p95_ms']} p99 {a['p99_ms']} max {a['max_ms']} ms")
+    print(f"delivery latency: p50 {d['p50_ms']} p95 {d['p95_ms']} p99 {d['p99_ms']} max {d['max_ms']} ms, "
+          f"{d['count']}/{d['expected']} delivered ({d['per_sec']}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server base URL (default http://127.0.0.1:<port>)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=0.2, help="messages per client per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="sending phase seconds")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait for late deliveries")
+    parser.add_argument("--procs", type=int, default=1, help="client processes")
+    parser.add_argument("--wave", type=int, default=50, help="clients started per wave (per process)")
+    parser.add_argument("--wave-pause", type=float, default=0.2, help="seconds between waves")
+    parser.add_argument("--wire", default="json", choices=["json", "compact"])
+    parser.add_argument("--transport", default="websocket", choices=["websocket", "polling"])
+    parser.add_argument("--password", default="LoadTest@123")
+    parser.add_argument("--seed", action="store_true", help="create users/channels in the configured DB, then exit")
+    parser.add_argument("--start-server", action="store_true", help="run gunicorn on --port for the duration")
+    parser.add_argument("--mode", default="gevent", choices=["threading", "gevent", "eventlet"])
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--admin-email", help="fetch /admin/api/metrics/socketio after the run")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+    args.url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+
+    if args.seed:
+        seed(args.clients, args.channels, args.password)
+        return
+
+    channel_ids = lookup_channels(args.channels)
+    if not channel_ids:
+        sys.exit("No load-test channels found; run with --seed first.")
+
+    raise_fd_limit()
+    server = start_server(args.port, args.mode, dict(kv.split("=", 1) for kv in args.server_env)) if args.start_server else None
+    try:
+        ready, out = multiprocessing.Queue(), multiprocessing.Queue()
+        go, start_at = multiprocessing.Event(), multiprocessing.Value('d', 0.0)
+        procs = [
+            multiprocessing.Process(target=client_process, daemon=True,
+                                    args=(list(range(p, args.clients, args.procs)), args, channel_ids, ready, go, start_at, out))
+            for p in range(args.procs)
+        ]
+        for p in procs:
+            p.start()
+        for _ in procs:
+            ready.get()
+        print(f"{args.clients} clients set up; sending for {args.duration}s", flush=True)
+        start_at.value = time.time()
+        go.set()
+
+        parts = [out.get() for _ in procs]
+        for p in procs:
+            p.join(timeout=10)
+
+        results = merge(parts, args, start_at.value, args.duration)
+        results['server_metrics'] = fetch_server_metrics(args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print_report(results)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: rate limiter checks per second across threads.
+
+Compares a single-lock limiter (stripes=1, the old behaviour) with the
+striped limiter, and optionally the shared SQLite store, over a key space
+shaped like chat traffic (rate:channel:{cid}:user:{uid}).
+
+Usage:
+    python scripts/benchmarks/bench_rate_limiter.py --threads 1 4 8 --checks 200000
+    python scripts/benchmarks/bench_rate_limiter.py --sqlite
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.utils.rate_limiter import RateLimiter, SQLiteRateLimiter
+
+
+def run(limiter, threads, checks, keys):
+    per_thread = checks // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        local_keys = [rnd.choice(keys) for _ in range(1024)]
+        barrier.wait()
+        for i in range(per_thread):
+            limiter.check(local_keys[i & 1023], 'chat:message')
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--checks', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--channels', type=int, default=50)
+    parser.add_argument('--sqlite', action='store_true', help='also benchmark the shared SQLite store')
+    args = parser.parse_args()
+
+    keys = [f"rate:channel:{random.randint(1, args.channels)}:user:{u}" for u in range(args.users)]
+    variants = [
+        ('single lock', lambda: RateLimiter(stripes=1)),
+        ('striped x64', lambda: RateLimiter(stripes=64)),
+    ]
+    if args.sqlite:
+        path = os.path.join(tempfile.mkdtemp(), 'rate.db')
+        variants.append(('sqlite shared', lambda: SQLiteRateLimiter(path)))
+
+    print(f"🚦 Rate limiter benchmark: {args.checks} checks, {len(keys)} keys")
+    print(f"{'variant':<15}" + "".join(f"{t:>10} thr" for t in args.threads))
+    for name, factory in variants:
+        row = f"{name:<15}"
+        for threads in args.threads:
+            checks = args.checks if 'sqlite' not in name else min(args.checks, 20000)
+            row += f"{run(factory(), threads, checks, keys):>14,.0f}"
+        print(row + "  checks/sec")
+
+    # Memory bound check: far more keys than the cap
+    limiter = RateLimiter(max_keys=10000)
+    for i in range(100000):
+        limiter.check(f"rate:channel:1:user:{i}")
+    print(f"\n🧠 100k distinct keys with max_keys=10000 -> {limiter.size()} buckets retained")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark: Socket.IO connection capacity, threading vs gevent/eventlet.
+
+For each async mode a bare Socket.IO echo server runs in a subprocess with
+that mode's server (werkzeug threaded / gevent-websocket / eventlet.wsgi).
+An asyncio client then
+
+1. idle:   opens --clients WebSocket connections in waves and records how many
+           succeed, connect time, and server RSS / OS thread count;
+2. active: every client sends acknowledged 'echo' events at --rate per second
+           for --duration seconds; reports throughput and RTT percentiles.
+
+Needs the client extras (aiohttp) and, per mode, gevent + gevent-websocket or
+eventlet installed.
+
+Usage:
+    python scripts/benchmarks/bench_socketio_connections.py --modes threading gevent --clients 200 1000
+    python scripts/benchmarks/bench_socketio_connections.py --modes gevent --clients 5000 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+# Add project root to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# -------------------------------
+# SERVER (subprocess)
+# -------------------------------
+def serve(mode, port):
+    raise_fd_limit()
+    os.environ["SOCKETIO_ASYNC_MODE"] = mode
+    from backend.async_mode import monkey_patch
+    monkey_patch()  # green modes patch the stdlib first, as the app does
+    import socketio
+
+    sio = socketio.Server(async_mode=mode, cors_allowed_origins="*")
+    app = socketio.WSGIApp(sio)
+
+    @sio.on("echo")
+    def echo(sid, data):
+        return data
+
+    if mode == "gevent":
+        from gevent import pywsgi
+        from geventwebsocket.handler import WebSocketHandler
+        pywsgi.WSGIServer(("127.0.0.1", port), app, handler_class=WebSocketHandler, log=None).serve_forever()
+    elif mode == "eventlet":
+        import eventlet
+        import eventlet.wsgi
+        eventlet.wsgi.server(eventlet.listen(("127.0.0.1", port), backlog=4096), app, log_output=False)
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", port, app, threaded=True)
+        server.socket.listen(4096)
+        server.serve_forever()
+
+
+def proc_stats(pid):
+    stats = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("Threads:"):
+                    stats["threads"] = int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return stats
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 2)
+
+
+# -------------------------------
+# CLIENT
+# -------------------------------
+async def run_load(url, clients, rate, duration, wave, transport, pid):
+    import socketio
+
+    connected = []
+    failures = 0
+    start = time.perf_counter()
+
+    async def connect_one():
+        nonlocal failures
+        sio = socketio.AsyncClient(reconnection=False)
+        try:
+            await sio.connect(url, transports=[transport], wait_timeout=10)
+            connected.append(sio)
+        except Exception:
+            failures += 1
+
+    for i in range(0, clients, wave):
+        await asyncio.gather(*(connect_one() for _ in range(min(wave, clients - i))))
+    connect_secs = time.perf_counter() - start
+
+    await asyncio.sleep(2)
+    idle = proc_stats(pid)
+
+    rtts, errors = [], 0
+    stop_at = time.perf_counter() + duration
+
+    async def chatter(sio):
+        nonlocal errors
+        await asyncio.sleep(random.random() / rate)
+        while time.perf_counter() < stop_at:
+            sent = time.perf_counter()
+            try:
+                await sio.call("echo", {"t": sent, "body": "x" * 64}, timeout=10)
+                rtts.append(time.perf_counter() - sent)
+            except Exception:
+                errors += 1
+            await asyncio.sleep(max(0.0, 1.0 / rate - (time.perf_counter() - sent)))
+
+    active_start = time.perf_counter()
+    await asyncio.gather(*(chatter(s) for s in connected))
+    active_secs = time.perf_counter() - active_start
+    active = proc_stats(pid)
+
+    await asyncio.gather(*(s.disconnect() for s in connected), return_exceptions=True)
+
+    return {
+        "clients": clients,
+        "connected": len(connected),
+        "connect_failures": failures,
+        "connect_secs": round(connect_secs, 2),
+        "idle_rss_mb": idle.get("rss_mb"),
+        "idle_threads": idle.get("threads"),
+        "active_rss_mb": active.get("rss_mb"),
+        "active_threads": active.get("threads"),
+        "echo_per_sec": round(len(rtts) / active_secs, 1) if active_secs else 0,
+        "echo_errors": errors,
+        "rtt_p50_ms": percentile(rtts, 50),
+        "rtt_p95_ms": percentile(rtts, 95),
+        "rtt_p99_ms": percentile(rtts, 99),
+    }
+
+
+def bench_mode(mode, args):
+    port = free_port()
+    env = dict(os.environ, SOCKETIO_ASYNC_MODE=mode, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port)], env=env)
+    try:
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"{mode} server exited (missing dependency?)")
+                time.sleep(0.2)
+        results = []
+        for n in args.clients:
+            r = asyncio.run(run_load(f"http://127.0.0.1:{port}", n, args.rate, args.duration, args.wave, args.transport, server.pid))
+            r["mode"] = mode
+            results.append(r)
+            print(f"{mode:>9} {n:>6} clients: {r['connected']:>6} connected ({r['connect_secs']}s), "
+                  f"idle {r['idle_rss_mb']} MB/{r['idle_threads']} thr, "
+                  f"active {r['echo_per_sec']} echo/s p50 {r['rtt_p50_ms']} p99 {r['rtt_p99_ms']} ms, "
+                  f"{r['echo_errors']} errors", flush=True)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["threading", "gevent"], choices=["threading", "gevent", "eventlet"])
+    parser.add_argument("--clients", nargs="+", type=int, default=[200, 1000])
+    parser.add_argument("--rate", type=float, default=1.0, help="echo events per client per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="active phase seconds")
+    parser.add_argument("--wave", type=int, default=100, help="concurrent connection attempts")
+    parser.add_argument("--transport", default="websocket", choices=["websocket", "polling"])
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    raise_fd_limit()
+    results = []
+    for mode in args.modes:
+        try:
+            results.extend(bench_mode(mode, args))
+        except Exception as e:
+            print(f"{mode}: skipped ({e})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: cross-process Socket.IO fan-out latency.
+
+Starts N worker processes, each running its own Socket.IO server attached to
+the shared message queue, spreads C clients across them round-robin, then
+publishes M timestamped messages from a separate write-only emitter (the same
+path IngestionService takes when a message lands on another worker).
+
+Each client records (receive_time - publish_time); the script reports
+delivery ratio and latency percentiles.
+
+Usage:
+    python scripts/benchmarks/bench_socketio_fanout.py --workers 4 --clients 40 --messages 200
+    python scripts/benchmarks/bench_socketio_fanout.py --queue redis://localhost:6379/0
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import socketio
+
+ROOM = 'bench'
+
+
+def run_worker(port, queue_url, ready):
+    """One 'gunicorn worker': a Socket.IO server bound to the shared queue."""
+    import logging
+    from werkzeug.serving import make_server
+    from backend.chat.pubsub import get_queue_options
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    sio = socketio.Server(async_mode='threading', **_server_queue_options(get_queue_options(queue_url)))
+
+    @sio.on('join')
+    def join(sid, data):
+        sio.enter_room(sid, ROOM)
+        return True
+
+    server = make_server('127.0.0.1', port, socketio.WSGIApp(sio), threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+def _server_queue_options(options):
+    """Plain python-socketio wants a client_manager instead of a URL."""
+    if 'client_manager' in options or not options:
+        return options
+    url = options['message_queue']
+    if url.startswith(('redis://', 'rediss://')):
+        return {'client_manager': socketio.RedisManager(url, channel=options['channel'])}
+    return {'client_manager': socketio.KombuManager(url, channel=options['channel'])}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.01, help='seconds between published messages')
+    parser.add_argument('--base-port', type=int, default=5600)
+    parser.add_argument('--queue', default=None, help='queue URL (default: temporary sqlite file)')
+    args = parser.parse_args()
+
+    queue_url = args.queue or f"sqlite://{os.path.join(tempfile.mkdtemp(), 'bench_queue.db')}"
+    print(f"🚀 Fan-out benchmark: {args.workers} workers, {args.clients} clients, "
+          f"{args.messages} messages via {queue_url}")
+
+    # 1. Spawn workers
+    procs = []
+    for i in range(args.workers):
+        ready = multiprocessing.Event()
+        p = multiprocessing.Process(target=run_worker, args=(args.base_port + i, queue_url, ready), daemon=True)
+        p.start()
+        ready.wait(10)
+        procs.append(p)
+    time.sleep(0.5)
+
+    # 2. Connect clients round-robin
+    latencies = []
+    lat_lock = threading.Lock()
+    clients = []
+    for i in range(args.clients):
+        client = socketio.Client()
+
+        @client.on('tick')
+        def on_tick(data):
+            delta = time.time() - data['sent']
+            with lat_lock:
+                latencies.append(delta)
+
+        port = args.base_port + (i % args.workers)
+        client.connect(f'http://127.0.0.1:{port}')
+        client.call('join', {}, timeout=10)
+        clients.append(client)
+    print(f"✅ {len(clients)} clients connected and joined '{ROOM}'")
+
+    # 3. Publish from a write-only emitter (separate host_id from every worker)
+    from backend.chat.pubsub import get_queue_options
+    emitter = _server_queue_options(get_queue_options(queue_url, write_only=True))['client_manager']
+
+    start = time.time()
+    for seq in range(args.messages):
+        emitter.emit('tick', {'seq': seq, 'sent': time.time()}, namespace='/', room=ROOM)
+        time.sleep(args.interval)
+
+    # 4. Wait for deliveries to drain
+    expected = args.messages * args.clients
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        with lat_lock:
+            if len(latencies) >= expected:
+                break
+        time.sleep(0.05)
+    elapsed = time.time() - start
+
+    with lat_lock:
+        got = list(latencies)
+
+    print("\n📊 Results")
+    print(f"   delivered : {len(got)}/{expected} ({100.0 * len(got) / max(expected, 1):.1f}%)")
+    print(f"   throughput: {len(got) / elapsed:.0f} deliveries/sec")
+    for pct in (50, 95, 99):
+        print(f"   p{pct:<9}: {percentile(got, pct) * 1000:.2f} ms")
+    print(f"   max       : {max(got) * 1000 if got else 0:.2f} ms")
+
+    for client in clients:
+        client.disconnect()
+    for p in procs:
+        p.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: book vector search, ChromaDB vs the NumPy VectorIndex.
+
+Each backend runs in a fresh interpreter on the same synthetic catalog
+(--books random unit vectors of --dim, spread over --categories
+categories) stored in a temporary directory:
+
+- build:   bulk upserts of --batch rows
+- query:   --queries top-k searches (latency p50/p95/p99 in ms)
+- filter:  the same searches restricted to two categories
+- rss:     resident memory after building and querying
+
+Usage:
+    python scripts/benchmarks/bench_vector_index.py --books 100000
+    python scripts/benchmarks/bench_vector_index.py --backends numpy --json results.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add project root to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+BACKENDS = ("chroma", "numpy")
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda p: round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+    return {"p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99)}
+
+
+def open_index(backend, path):
+    from backend.brain.vector_index import ChromaIndex, VectorIndex
+    if backend == "numpy":
+        return VectorIndex(path)
+    import chromadb
+    client = chromadb.PersistentClient(path=path)
+    return ChromaIndex(client.get_or_create_collection("books"))
+
+
+def child(backend, args):
+    import numpy as np
+
+    rng = np.random.default_rng(args.seed)
+    path = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    result = {"backend": backend, "books": args.books, "dim": args.dim}
+    try:
+        start = time.perf_counter()
+        index = open_index(backend, path)
+        result["open_secs"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        for offset in range(0, args.books, args.batch):
+            n = min(args.batch, args.books - offset)
+            vectors = rng.normal(size=(n, args.dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            ids = [str(offset + i) for i in range(n)]
+            metas = [{"book_id": i, "category": f"cat{int(i) % args.categories}", "content_hash": ""} for i in ids]
+            index.upsert(ids, vectors, metas)
+        result["build_secs"] = round(time.perf_counter() - start, 3)
+
+        queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+        for name, categories in (("query", None), ("filter", ["cat0", "cat1"])):
+            samples = []
+            for q in queries:
+                t = time.perf_counter()
+                index.query(q, args.k, categories=categories)
+                samples.append((time.perf_counter() - t) * 1000)
+            result[name] = percentiles(samples)
+        result["rss_mb"] = rss_mb()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps(result), flush=True)
+
+
+def run_backend(backend, argv):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", backend, *argv],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"backend": backend, "error": out.stderr.strip()[-300:]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeds into 384 dims")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args)
+        return
+
+    argv = ["--books", str(args.books), "--dim", str(args.dim), "--categories", str(args.categories),
+            "--batch", str(args.batch), "--queries", str(args.queries), "--k", str(args.k), "--seed", str(args.seed)]
+    results = {}
+    for backend in args.backends:
+        r = results[backend] = run_backend(backend, argv)
+        if "error" in r:
+            print(f"{backend:>7}: failed: {r['error']}", flush=True)
+            continue
+        print(f"{backend:>7}: build {r['build_secs']}s, query p50 {r['query']['p50_ms']} ms "
+              f"p95 {r['query']['p95_ms']} ms, filtered p50 {r['filter']['p50_ms']} ms, rss {r['rss_mb']} MB",
+              flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
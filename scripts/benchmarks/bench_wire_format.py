@@ -0,0 +1,155 @@
+"""
+Benchmark: chat payload size and encode cost, legacy JSON vs compact wire format.
+
+Builds synthetic traffic shaped like the real payloads (IngestionService
+fan-out and the 50-message join_channel history, a handful of senders) and
+encodes each one exactly as python-socketio puts it on the wire. Reports
+bytes per message and server CPU per broadcast (payload build + packet
+encode; this happens once per emit regardless of room size).
+
+Usage:
+    python scripts/benchmarks/bench_wire_format.py --messages 20000 --senders 8
+    python scripts/benchmarks/bench_wire_format.py --json results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from socketio import packet
+
+from backend.chat.wire_format import encode_history, encode_live, pack, MSGPACK_AVAILABLE
+from backend.utils.snowflake import generate_id
+
+WORDS = "the a book chapter read club tonight anyone finished library fantasy loved ending next week author".split()
+
+
+def wire_bytes(event, data):
+    """Bytes python-socketio sends for emit(event, data) (text frame + binary attachments)."""
+    encoded = packet.Packet(packet.EVENT, data=[event, data]).encode()
+    parts = encoded if isinstance(encoded, list) else [encoded]
+    return sum(len(p.encode() if isinstance(p, str) else p) for p in parts)
+
+
+def make_senders(n):
+    return [(i + 100, f"Reader {i}", f"uploads/variants/avatar_sm/avatars/user_{i + 100}_1700000000.png.webp") for i in range(n)]
+
+
+def make_live(rnd, senders, channel_id, message_id):
+    sender_id, name, pic = rnd.choice(senders)
+    return {
+        'message_id': message_id,
+        'content': " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 18))),
+        'channel_id': channel_id,
+        'sender_id': sender_id,
+        'sender_type': 'user',
+        'user_profile': {'name': name, 'pic': pic},
+        'anon_id': None,
+        'nonce': generate_id(),
+        'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'attachment': None,
+        'reply_to_id': None,
+    }
+
+
+def make_history_rows(rnd, senders, count):
+    now = datetime.datetime.now()
+    rows = []
+    for i in range(count):
+        sender_id, name, pic = rnd.choice(senders)
+        rows.append({
+            'message_id': 10000 - i,
+            'content': " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 18))),
+            'file_url': None,
+            'created_at': now - datetime.timedelta(minutes=i),
+            'sender_type': 'user',
+            'sender_id': sender_id,
+            'sender_name': name,
+            'sender_pic': pic,
+            'anon_id': sender_id,
+        })
+    return rows
+
+
+def legacy_history(rows, my_anon_id):
+    """Same dicts socket_service.handle_join_channel builds for JSON clients."""
+    formatted = []
+    for m in rows:
+        formatted.append({
+            'message_id': m['message_id'],
+            'content': m['content'],
+            'created_at': m['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+            'sender_id': m['sender_id'],
+            'sender_type': 'me' if m['anon_id'] == my_anon_id else 'other',
+            'file_url': m['file_url'],
+            'user_profile': {'name': m['sender_name'] or 'Unknown', 'pic': m['sender_pic']},
+            'sender_name': m['sender_name']
+        })
+    return {'messages': formatted[::-1]}
+
+
+def time_per_call(fn, items):
+    start = time.process_time()
+    for item in items:
+        fn(item)
+    return (time.process_time() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000, help="live broadcasts to encode")
+    parser.add_argument("--senders", type=int, default=8)
+    parser.add_argument("--history", type=int, default=50, help="messages per history payload")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    senders = make_senders(args.senders)
+    live = [make_live(rnd, senders, 7, 5000 + i) for i in range(args.messages)]
+    history = make_history_rows(rnd, senders, args.history)
+    histories = [history] * max(1, args.messages // args.history)
+
+    legacy_live = lambda p: wire_bytes('receive_message', p)
+    compact_live = lambda p: wire_bytes('receive_message', pack(encode_live(p)))
+    legacy_hist = lambda rows: wire_bytes('message_history', legacy_history(rows, senders[0][0]))
+    compact_hist = lambda rows: wire_bytes('message_history', pack(encode_history(7, rows, senders[0][0])))
+
+    results = {
+        'serializer': 'msgpack' if MSGPACK_AVAILABLE else 'json-tuples (msgpack not installed)',
+        'messages': args.messages,
+        'senders': args.senders,
+        'fanout': {
+            'json_bytes_per_msg': sum(map(legacy_live, live)) / len(live),
+            'compact_bytes_per_msg': sum(map(compact_live, live)) / len(live),
+            'json_cpu_us_per_broadcast': time_per_call(legacy_live, live),
+            'compact_cpu_us_per_broadcast': time_per_call(compact_live, live),
+        },
+        'history': {
+            'json_bytes_per_msg': legacy_hist(history) / len(history),
+            'compact_bytes_per_msg': compact_hist(history) / len(history),
+            'json_cpu_us_per_payload': time_per_call(legacy_hist, histories),
+            'compact_cpu_us_per_payload': time_per_call(compact_hist, histories),
+        },
+    }
+
+    print(f"serializer: {results['serializer']}  ({args.senders} senders)")
+    for name, r in (('fan-out', results['fanout']), (f"history x{args.history}", results['history'])):
+        json_b, compact_b = r['json_bytes_per_msg'], r['compact_bytes_per_msg']
+        cpu = [v for k, v in r.items() if 'cpu' in k]
+        print(f"{name:>12}: {json_b:7.1f} -> {compact_b:7.1f} bytes/msg ({100 * (1 - compact_b / json_b):4.1f}% smaller), "
+              f"cpu {cpu[0]:7.1f} -> {cpu[1]:7.1f} us")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
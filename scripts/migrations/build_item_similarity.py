@@ -0,0 +1,36 @@
+"""
+Builds the item-item similarity store behind member dashboard
+recommendations (backend/brain/item_similarity.py) from issues, wishlist
+and reviews.
+
+The scheduler rebuilds it nightly; run this once after deploying, or after
+a large import, so recommendations don't wait for the next night.
+
+Usage:
+    python scripts/migrations/build_item_similarity.py
+"""
+
+import argparse
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.brain.item_similarity import item_similarity
+
+
+def build_item_similarity():
+    print("🔗 Computing item-item similarities from borrowing, wishlist and review history...")
+    stats = item_similarity.build()
+    if stats is None:
+        print("⚠️ Another build is running; nothing to do.")
+        return None
+    print(f"\n✅ Built in {stats['seconds']}s: {stats['books']} books ({stats['with_neighbors']} with neighbours), "
+          f"{stats['users']} members, {stats['interactions']} interactions.")
+    return stats
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    build_item_similarity()
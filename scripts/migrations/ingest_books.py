@@ -1,39 +1,42 @@
+"""
+Syncs the AI librarian's vector store with the `books` table.
+
+Only books whose embedded text (title, author, category, description)
+changed since the last run are re-embedded; vectors of deleted books are
+removed. Safe to run repeatedly, e.g. nightly.
+
+Usage:
+    python scripts/migrations/ingest_books.py
+    python scripts/migrations/ingest_books.py --rebuild --batch-size 1024
+"""
+
+import argparse
 import sys
 import os
 
 # Add project root to path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from backend.brain.rag import rag
-from backend.repository.db_access import fetch_all
-
-def ingest_books():
-    print("📚 Fetching books from SQL Database...")
-    
-    # 1. Fetch books with author names
-    # Note: 'description' column is missing in schema, so we omit it.
-    query = """
-        SELECT b.book_id, b.title, b.category, a.name as author_name
-        FROM books b
-        LEFT JOIN authors a ON b.author_id = a.author_id
-    """
-    books = fetch_all(query)
-    
-    print(f"📖 Found {len(books)} books. Starting embedding process...")
-    
-    # 2. Embed and Store
-    for i, book in enumerate(books):
-        print(f"   Processing [{i+1}/{len(books)}]: {book['title']}")
-        
-        rag.add_book_to_memory(
-            book_id=str(book['book_id']),
-            title=book['title'],
-            author=book['author_name'] or "Unknown",
-            description="", # Description not available in DB
-            category=book['category'] or "General"
-        )
-        
-    print("\n✅ Ingestion Complete! The AI now knows about your library inventory.")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.brain.indexer import sync_catalog
+from backend.config.settings import BRAIN_INDEX_BATCH_SIZE
+
+
+def ingest_books(batch_size=BRAIN_INDEX_BATCH_SIZE, rebuild=False):
+    print("📚 Syncing books from SQL Database into the vector store...")
+
+    def progress(stats):
+        print(f"   Scanned {stats['scanned']} books, embedded {stats['embedded']}", flush=True)
+
+    stats = sync_catalog(batch_size=batch_size, rebuild=rebuild, progress=progress)
+
+    print(f"\n✅ Ingestion Complete in {stats['seconds']}s: {stats['embedded']} embedded, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed.")
+    return stats
+
 
 if __name__ == "__main__":
-    ingest_books()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=BRAIN_INDEX_BATCH_SIZE, help="books per page / bulk upsert")
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every book, ignoring stored hashes")
+    args = parser.parse_args()
+    ingest_books(batch_size=args.batch_size, rebuild=args.rebuild)
@@ -0,0 +1,59 @@
+"""
+Creates chat retention/archival tables.
+
+- chat_retention_policies: per-channel override (retain_days, action 'archive' | 'delete')
+- chat_archive_segments: which monthly archive table holds which message range
+  of a channel, so history paging only touches the tables it needs
+- idx_chat_channel_msg: (channel_id, message_id) index used by history paging
+  and by the batched archive/purge scans
+
+Archive tables themselves (chat_messages_archive_YYYYMM) are created on demand.
+"""
+import sys
+import os
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.repository.db_access import execute_query, fetch_one
+
+def setup_chat_retention():
+    print("Setting up chat retention...")
+    try:
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS chat_retention_policies (
+            channel_id INT PRIMARY KEY,
+            retain_days INT NOT NULL DEFAULT 0,
+            action ENUM('archive', 'delete') NOT NULL DEFAULT 'archive',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            CONSTRAINT fk_retention_channel FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        )
+        """)
+        print("✅ Table 'chat_retention_policies' ready.")
+
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS chat_archive_segments (
+            channel_id INT NOT NULL,
+            archive_month CHAR(6) NOT NULL,
+            min_message_id BIGINT NOT NULL,
+            max_message_id BIGINT NOT NULL,
+            message_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (channel_id, archive_month),
+            INDEX idx_segment_range (channel_id, max_message_id)
+        )
+        """)
+        print("✅ Table 'chat_archive_segments' ready.")
+
+        exists = fetch_one("""
+            SELECT 1 AS found FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'chat_messages'
+              AND index_name = 'idx_chat_channel_msg'
+        """)
+        if not exists:
+            execute_query("CREATE INDEX idx_chat_channel_msg ON chat_messages (channel_id, message_id)")
+        print("✅ Index 'idx_chat_channel_msg' ready.")
+    except Exception as e:
+        print(f"❌ Error setting up chat retention: {e}")
+
+if __name__ == "__main__":
+    setup_chat_retention()
@@ -0,0 +1,76 @@
+"""
+Creates the canonical DM pair tables and backfills them from existing DMs.
+
+- dm_pairs: one DM channel per unordered user pair (user_low < user_high)
+- dm_room_pairs: the same key for legacy chat_rooms private rooms
+
+Lookup is a primary-key point read; creation claims the pair row inside the
+creating transaction, so two concurrent requests cannot create two DMs.
+"""
+import sys
+import os
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.repository.db_access import execute_query
+
+def setup_dm_pairs():
+    print("Setting up DM pair index...")
+    try:
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS dm_pairs (
+            user_low INT NOT NULL,
+            user_high INT NOT NULL,
+            channel_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_low, user_high),
+            UNIQUE KEY uq_dm_pair_channel (channel_id),
+            CONSTRAINT fk_dm_pair_channel FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        )
+        """)
+        print("✅ Table 'dm_pairs' ready.")
+
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS dm_room_pairs (
+            user_low INT NOT NULL,
+            user_high INT NOT NULL,
+            room_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_low, user_high),
+            UNIQUE KEY uq_dm_pair_room (room_id),
+            CONSTRAINT fk_dm_pair_room FOREIGN KEY (room_id) REFERENCES chat_rooms(room_id) ON DELETE CASCADE
+        )
+        """)
+        print("✅ Table 'dm_room_pairs' ready.")
+
+        # Backfill: oldest DM channel wins when a pair already has duplicates
+        execute_query("""
+        INSERT IGNORE INTO dm_pairs (user_low, user_high, channel_id)
+        SELECT p1.user_id, p2.user_id, MIN(c.channel_id)
+        FROM channels c
+        JOIN dm_participants p1 ON p1.channel_id = c.channel_id
+        JOIN dm_participants p2 ON p2.channel_id = c.channel_id AND p1.user_id < p2.user_id
+        WHERE c.guild_id IS NULL AND c.name = 'DM'
+        GROUP BY p1.user_id, p2.user_id
+        """)
+        print("✅ Backfilled DM channel pairs.")
+
+        execute_query("""
+        INSERT IGNORE INTO dm_room_pairs (user_low, user_high, room_id)
+        SELECT LEAST(a1.user_id, a2.user_id), GREATEST(a1.user_id, a2.user_id), MIN(r.room_id)
+        FROM chat_rooms r
+        JOIN room_members m1 ON m1.room_id = r.room_id
+        JOIN room_members m2 ON m2.room_id = r.room_id AND m1.anon_id < m2.anon_id
+        JOIN chat_anon_id a1 ON a1.anon_id = m1.anon_id
+        JOIN chat_anon_id a2 ON a2.anon_id = m2.anon_id
+        WHERE r.room_type = 'private'
+        AND r.room_id IN (SELECT room_id FROM room_members GROUP BY room_id HAVING COUNT(*) = 2)
+        GROUP BY LEAST(a1.user_id, a2.user_id), GREATEST(a1.user_id, a2.user_id)
+        """)
+        print("✅ Backfilled legacy DM room pairs.")
+    except Exception as e:
+        print(f"❌ Error setting up DM pairs: {e}")
+
+if __name__ == "__main__":
+    setup_dm_pairs()
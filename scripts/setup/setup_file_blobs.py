@@ -0,0 +1,47 @@
+"""
+Creates the content-addressed blob table used by chat uploads.
+
+- file_blobs: one row per unique file (SHA-256), with a reference count.
+  Files live at static/uploads/blobs/<ab>/<cd>/<sha256>.<ext>; blobs whose
+  ref_count stays at 0 are removed by the scheduled gc job.
+- file_blob_owners: users who uploaded a blob's bytes; only they may skip
+  the transfer by announcing its hash.
+"""
+import sys
+import os
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.repository.db_access import execute_query
+
+def setup_file_blobs():
+    print("Setting up file blob store...")
+    try:
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS file_blobs (
+            sha256 CHAR(64) PRIMARY KEY,
+            size BIGINT NOT NULL,
+            ext VARCHAR(16) NOT NULL,
+            path VARCHAR(255) NOT NULL,
+            ref_count INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_ref_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_blob_gc (ref_count, last_ref_at)
+        )
+        """)
+        print("✅ Table 'file_blobs' ready.")
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS file_blob_owners (
+            sha256 CHAR(64) NOT NULL,
+            user_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sha256, user_id)
+        )
+        """)
+        print("✅ Table 'file_blob_owners' ready.")
+    except Exception as e:
+        print(f"❌ Error setting up file blobs: {e}")
+
+if __name__ == "__main__":
+    setup_file_blobs()
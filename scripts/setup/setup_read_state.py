@@ -0,0 +1,88 @@
+"""
+Creates chat unread-tracking tables and backfills per-channel counters.
+
+- channel_counters: message_count / last_message_id per channel, maintained on insert
+- channel_read_state: each user's read marker per channel (+ counter snapshot)
+- chat_messages.channel_seq: the counter value each message was given
+  (also added to existing chat_messages_archive_* tables, which mirror it)
+
+Unread = channel_counters.message_count - channel_read_state.read_count
+"""
+import sys
+import os
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.repository.db_access import execute_query, fetch_all, fetch_one
+
+def setup_read_state():
+    print("Setting up chat read state...")
+    try:
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS channel_counters (
+            channel_id INT PRIMARY KEY,
+            message_count BIGINT NOT NULL DEFAULT 0,
+            last_message_id BIGINT NOT NULL DEFAULT 0,
+            CONSTRAINT fk_counter_channel FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        )
+        """)
+        print("✅ Table 'channel_counters' ready.")
+
+        execute_query("""
+        CREATE TABLE IF NOT EXISTS channel_read_state (
+            user_id INT NOT NULL,
+            channel_id INT NOT NULL,
+            last_read_message_id BIGINT NOT NULL DEFAULT 0,
+            read_count BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, channel_id),
+            CONSTRAINT fk_read_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            CONSTRAINT fk_read_channel FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        )
+        """)
+        print("✅ Table 'channel_read_state' ready.")
+
+        exists = fetch_one("""
+            SELECT 1 AS found FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'chat_messages' AND column_name = 'channel_seq'
+        """)
+        if not exists:
+            execute_query("ALTER TABLE chat_messages ADD COLUMN channel_seq BIGINT NULL")
+            # Number existing history once, in id order per channel
+            execute_query("""
+            UPDATE chat_messages m
+            JOIN (SELECT message_id, ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY message_id) AS seq
+                  FROM chat_messages) s ON s.message_id = m.message_id
+            SET m.channel_seq = s.seq
+            """)
+        # Archive tables are created LIKE chat_messages and filled with SELECT *
+        archives = fetch_all("""
+            SELECT t.table_name AS name FROM information_schema.tables t
+            WHERE t.table_schema = DATABASE() AND t.table_name REGEXP '^chat_messages_archive_[0-9]{6}$'
+              AND NOT EXISTS (SELECT 1 FROM information_schema.columns c
+                              WHERE c.table_schema = t.table_schema AND c.table_name = t.table_name
+                                AND c.column_name = 'channel_seq')
+        """)
+        for table in archives:
+            execute_query(f"ALTER TABLE `{table['name']}` ADD COLUMN channel_seq BIGINT NULL")
+        print("✅ Column 'chat_messages.channel_seq' ready.")
+
+        # Backfill counters from existing history (one grouped scan). Counters
+        # only grow: rerunning after deletes/archival must not lower them.
+        execute_query("""
+        INSERT INTO channel_counters (channel_id, message_count, last_message_id)
+        SELECT m.channel_id, COALESCE(MAX(m.channel_seq), COUNT(*)), MAX(m.message_id)
+        FROM chat_messages m
+        JOIN channels c ON c.channel_id = m.channel_id
+        GROUP BY m.channel_id
+        ON DUPLICATE KEY UPDATE
+            message_count = GREATEST(message_count, VALUES(message_count)),
+            last_message_id = GREATEST(last_message_id, VALUES(last_message_id))
+        """)
+        print("✅ Backfilled channel counters.")
+    except Exception as e:
+        print(f"❌ Error setting up read state: {e}")
+
+if __name__ == "__main__":
+    setup_read_state()